@@ -1,8 +1,14 @@
 from .binary_sensor import EO4HABinarySensor
+from .changes import ChangeDetector
 from .common import EO4HAEEPNotSupportedError, EO4HAError
+from .entity import NO_STATUS, EO4HAEntity, ParseResult
 from .gateway import EnOceanGateway
 from .light import EO4HALight
+from .link_quality import LinkQualitySummary, LinkQualityTracker
+from .metering import MeteringPipeline, MeterStatistics
 from .number import EO4HANumber
+from .pool import GatewayPool
+from .polling import PollScheduler
 from .select import EO4HASelect
 from .sensor import (
     EO4HAHumiditySensor,
@@ -13,6 +19,7 @@ from .sensor import (
     EO4HATemperatureSensor,
     EO4HAWindowHandleSensor
 )
+from .snapshot import SnapshotEntry, StateSnapshot
 from .switch import EO4HASwitch
 from .valve import EO4HAValve
 
@@ -0,0 +1,235 @@
+""" Tracking of the confirmations of the commands sent to D2-01 actuators. """
+
+import asyncio
+import concurrent.futures
+import logging
+import time
+from bisect import bisect_left
+from typing import Any, Callable, NamedTuple
+
+from enocean.protocol.constants import RORG
+from enocean.protocol.packet import Packet
+
+from .channel_groups import ALL_CHANNELS, CMD_SET_OUTPUT
+from .common import dev_id_to_int
+
+LOGGER = logging.getLogger('enocean.ha.acks')
+
+# D2-01 CMD 4: Actuator Status Response, which confirms CMD 1
+CMD_STATUS_RESPONSE = 0x4
+
+# seconds to wait for the status telegram after the first transmission
+DEFAULT_ACK_TIMEOUT = 1.0
+DEFAULT_RETRIES = 2
+# factor of the timeout for every further transmission
+DEFAULT_BACKOFF = 2.0
+# upper bounds of the latency histogram buckets in seconds, the last bucket is unbounded
+LATENCY_BUCKETS = (0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+
+class CommandResult(NamedTuple):
+    """ Outcome of a command, which expects a status telegram """
+    confirmed: bool
+    # number of transmissions
+    attempts: int
+    # seconds between the last transmission and the status telegram
+    latency: float | None
+    # output value (OV) reported by the actuator
+    value: int | None
+
+
+class LatencyHistogram:
+    """ Round trip times of the commands of a device """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, latency: float) -> None:
+        self.counts[bisect_left(self.buckets, latency)] += 1
+        self.count += 1
+        self.total += latency
+        self.maximum = max(self.maximum, latency)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "buckets": {
+                **{f"<={bound}": count for bound, count in zip(self.buckets, self.counts)},
+                f">{self.buckets[-1]}": self.counts[-1],
+            },
+            "count": self.count,
+            "mean": self.mean,
+            "max": self.maximum,
+        }
+
+
+class _PendingCommand:
+    __slots__ = ("futures", "resend", "attempts", "sent_at", "timer")
+
+    def __init__(self, future: concurrent.futures.Future, resend: Callable[[], None]):
+        self.futures = [future]
+        self.resend = resend
+        self.attempts = 0
+        self.sent_at: float | None = None
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class AckTracker:
+    """ Waits for the status telegram (CMD 4) of an actuator after a set output command (CMD 1).
+
+        There is one pending command per device and channel. A newer command
+        for the same channel takes over the futures of the older one.
+        The timeout starts, when the packet is handed to the dongle
+        (transmitted()), and is multiplied by backoff for every retry.
+        After retries unanswered retries, the futures get an unconfirmed
+        CommandResult.
+
+        The gateway hands all received telegrams to received().
+        All methods, except expects_ack(), must be run in the event loop.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, timeout: float = DEFAULT_ACK_TIMEOUT,
+                 retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF,
+                 clock: Callable[[], float] = time.monotonic):
+        self._loop = loop
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._clock = clock
+        self._pending: dict[tuple[int, int], _PendingCommand] = {}
+        self._histograms: dict[int, LatencyHistogram] = {}
+        self.confirmed = 0
+        self.retried = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @staticmethod
+    def expects_ack(rorg: int, rorg_func: int, command: int, kwargs: dict[str, Any]) -> bool:
+        """ Return True, if the command of send_command() is answered by a status telegram """
+        return (
+            rorg == RORG.VLD and rorg_func == 0x01 and command == CMD_SET_OUTPUT
+            and kwargs.get('destination') is not None and kwargs.get('IO') is not None
+        )
+
+    def track(self, dev_id: list[int], channel: int, future: concurrent.futures.Future,
+              resend: Callable[[], None]) -> None:
+        """ Wait for the confirmation of a command, resend() queues the command again """
+        key = (dev_id_to_int(dev_id), channel)
+        pending = _PendingCommand(future, resend)
+        superseded = self._pending.get(key)
+        if superseded is not None:
+            if superseded.timer is not None:
+                superseded.timer.cancel()
+            pending.futures[:0] = superseded.futures
+        self._pending[key] = pending
+
+    def transmitted(self, packet: Packet) -> None:
+        """ Start the timeout of the pending commands, which are sent by the packet """
+        if not self._pending or packet.rorg != RORG.VLD or len(packet.data) < 3 or len(packet.optional) < 5:
+            return
+        if packet.data[1] & 0x0F != CMD_SET_OUTPUT:
+            return
+        dev_id = dev_id_to_int(packet.optional[1:5])
+        channel = packet.data[2] & 0x1F
+        if channel == ALL_CHANNELS:
+            keys = [key for key in self._pending if key[0] == dev_id]
+        else:
+            keys = [(dev_id, channel)]
+        now = self._clock()
+        for key in keys:
+            pending = self._pending.get(key)
+            if pending is None:
+                continue
+            if pending.timer is not None:
+                pending.timer.cancel()
+            pending.sent_at = now
+            timeout = self.timeout * self.backoff ** pending.attempts
+            pending.attempts += 1
+            pending.timer = self._loop.call_later(timeout, self._timed_out, key)
+
+    def received(self, packet: Packet) -> None:
+        """ Confirm the pending commands of a channel, if the packet is its status telegram.
+
+            A status for ALL_CHANNELS confirms the commands of all channels of
+            the device, the status of any channel confirms a command for
+            ALL_CHANNELS.
+        """
+        if not self._pending or packet.rorg != RORG.VLD or len(packet.data) < 9:
+            return
+        if packet.data[1] & 0x0F != CMD_STATUS_RESPONSE:
+            return
+        channel = packet.data[2] & 0x1F
+        if channel == ALL_CHANNELS:
+            dev_id = dev_id_to_int(packet.sender)
+            channels = [key[1] for key in self._pending if key[0] == dev_id]
+        else:
+            channels = (channel, ALL_CHANNELS)
+        for channel in channels:
+            self.confirm(packet.sender, channel, packet.data[3] & 0x7F)
+
+    def confirm(self, dev_id: list[int], channel: int, value: int | None = None) -> None:
+        """ Resolve the pending command of a channel, when its status telegram is received """
+        dev_id = dev_id_to_int(dev_id)
+        key = (dev_id, channel)
+        pending = self._pending.get(key)
+        if pending is None or pending.sent_at is None:
+            # no command, or it's still waiting in the send queue
+            return
+        del self._pending[key]
+        if pending.timer is not None:
+            # None after a timeout, while the retransmission waits in the send queue
+            pending.timer.cancel()
+        latency = self._clock() - pending.sent_at
+        self._histograms.setdefault(dev_id, LatencyHistogram()).add(latency)
+        self.confirmed += 1
+        self._resolve(pending, CommandResult(True, pending.attempts, latency, value))
+
+    def _timed_out(self, key: tuple[int, int]) -> None:
+        pending = self._pending[key]
+        pending.timer = None
+        if pending.attempts <= self.retries:
+            LOGGER.debug(f"No status of {key[0]:08X} channel {key[1]}, sending again (attempt {pending.attempts + 1})")
+            self.retried += 1
+            pending.resend()
+            return
+        LOGGER.warning(f"No status of {key[0]:08X} channel {key[1]} after {pending.attempts} attempts")
+        del self._pending[key]
+        self.failed += 1
+        self._resolve(pending, CommandResult(False, pending.attempts, None, None))
+
+    @staticmethod
+    def _resolve(pending: _PendingCommand, result: CommandResult) -> None:
+        for future in pending.futures:
+            if not future.done():
+                future.set_result(result)
+
+    def cancel_all(self) -> None:
+        """ Stop waiting for any confirmation, the futures are cancelled """
+        for pending in self._pending.values():
+            if pending.timer is not None:
+                pending.timer.cancel()
+            for future in pending.futures:
+                future.cancel()
+        self._pending.clear()
+
+    def latency_histogram(self, dev_id: list[int]) -> LatencyHistogram | None:
+        """ Round trip times of the confirmed commands of a device """
+        return self._histograms.get(dev_id_to_int(dev_id))
+
+    def stats(self) -> dict[str, int]:
+        """ Counters of the tracker, e.g. for diagnostics """
+        return {
+            "pending": len(self._pending),
+            "confirmed": self.confirmed,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
@@ -0,0 +1,281 @@
+""" Offline analysis of recorded telegrams with NumPy.
+
+    The radio telegrams of a capture file are loaded into columns, one
+    array per property, and the statistics are computed on whole columns.
+    Needs numpy, which is an optional dependency (the analysis extra).
+"""
+
+import logging
+from typing import Iterable, NamedTuple
+
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import RadioPacket
+
+from .capture import CAPTURE_MAGIC, CAPTURE_RECORD, CaptureFormatError
+from .common import EEPInfo
+from .decoders import get_decoder, receive_direction
+from .dedup import DEFAULT_WINDOW, STATUS_MASK
+from .sensor import A5_10_TEMPERATURE_TYPES
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+LOGGER = logging.getLogger('enocean.ha.analysis')
+
+# ESP3 header: sync byte, data length (2 bytes), optional length, packet type, CRC8
+_HEADER_SIZE = 6
+# RORG before the payload, sender and status after it
+_FRAME_BYTES = 6
+_REPEATER_BUCKETS = 16
+# DB0 of 4BS telegrams, the LRN bit is 0 for teach-in telegrams
+_BS4_DB0 = 3
+_BS4_LRN = 0x08
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("The analysis needs numpy, install enocean4ha_bridge[analysis]")
+
+
+class SenderStatistics(NamedTuple):
+    """ Statistics per sender, each field is an array with one entry per sender """
+    sender: "np.ndarray"
+    # received copies, including the duplicates
+    copies: "np.ndarray"
+    # telegrams without the duplicates
+    telegrams: "np.ndarray"
+    duplicate_ratio: "np.ndarray"
+    telegrams_per_hour: "np.ndarray"
+    min_dBm: "np.ndarray"
+    mean_dBm: "np.ndarray"
+    median_dBm: "np.ndarray"
+    max_dBm: "np.ndarray"
+    # copies per repeater count, shape (senders, 16)
+    repeater_counts: "np.ndarray"
+
+
+class TelegramTable:
+    """ The radio telegrams of a capture, as columns of equal length.
+
+        payload holds the data bytes between RORG and sender, padded with
+        zeros to the longest payload; length holds the actual length.
+    """
+
+    def __init__(self, timestamp, sender, rorg, status, dBm, length, payload):
+        _require_numpy()
+        self.timestamp = timestamp
+        self.sender = sender
+        self.rorg = rorg
+        self.status = status
+        self.dBm = dBm
+        self.repeater_count = status & 0x0F
+        self.length = length
+        self.payload = payload
+        self._order = None
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    @classmethod
+    def from_capture(cls, path: str) -> "TelegramTable":
+        """ Load the radio telegrams of a capture file, see capture.PacketRecorder """
+        _require_numpy()
+        with open(path, "rb") as file:
+            buffer = file.read()
+        if not buffer.startswith(CAPTURE_MAGIC):
+            raise CaptureFormatError(f"{path} is no capture file")
+        # only the record boundaries are found in Python, all fields are gathered by NumPy
+        timestamps = []
+        starts = []
+        position = len(CAPTURE_MAGIC)
+        end = len(buffer)
+        unpack = CAPTURE_RECORD.unpack_from
+        record_size = CAPTURE_RECORD.size
+        while position < end:
+            if position + record_size > end:
+                raise CaptureFormatError(f"{path} is truncated")
+            timestamp, length = unpack(buffer, position)
+            position += record_size
+            if position + length > end:
+                raise CaptureFormatError(f"{path} is truncated")
+            if length > _HEADER_SIZE and buffer[position + 4] == PACKET.RADIO_ERP1:
+                timestamps.append(timestamp)
+                starts.append(position)
+            position += length
+        frames = np.frombuffer(buffer, dtype=np.uint8)
+        starts = np.array(starts, dtype=np.int64)
+        data_length = frames[starts + 1].astype(np.int64) << 8 | frames[starts + 2]
+        optional_length = frames[starts + 3]
+        valid = data_length >= _FRAME_BYTES
+        if not valid.all():
+            LOGGER.warning(f"Skipping {np.count_nonzero(~valid)} radio frames without sender in {path}")
+            starts = starts[valid]
+            data_length = data_length[valid]
+            optional_length = optional_length[valid]
+            timestamps = np.array(timestamps)[valid]
+        data = starts + _HEADER_SIZE
+        data_end = data + data_length
+        sender = np.zeros(len(starts), dtype=np.uint32)
+        for index in range(4):
+            sender = sender << 8 | frames[data_end - 5 + index]
+        # the optional data of ERP1 frames holds the signal strength as positive number at index 5
+        dBm = np.where(optional_length > 5, -frames[np.minimum(data_end + 5, len(frames) - 1)].astype(np.int16), 0)
+        length = (data_length - _FRAME_BYTES).astype(np.uint8)
+        width = int(length.max()) if len(length) else 0
+        columns = np.arange(width)
+        indices = data[:, None] + 1 + columns[None, :]
+        inside = columns[None, :] < length[:, None]
+        payload = np.where(inside, frames[np.where(inside, indices, 0)], 0).astype(np.uint8)
+        return cls(
+            np.asarray(timestamps, dtype=np.float64), sender, frames[data].copy(), frames[data_end - 1].copy(),
+            dBm.astype(np.int16), length, payload,
+        )
+
+    @classmethod
+    def from_packets(cls, packets: Iterable[tuple[float, RadioPacket]]) -> "TelegramTable":
+        """ Load (receive time, packet) pairs, e.g. of a capture.ReplayDriver """
+        _require_numpy()
+        rows = [
+            (timestamp, int.from_bytes(bytes(packet.sender), "big"), packet.rorg, packet.status, packet.dBm,
+             bytes(packet.data[1:-5]))
+            for timestamp, packet in packets
+        ]
+        width = max((len(row[5]) for row in rows), default=0)
+        payload = np.zeros((len(rows), width), dtype=np.uint8)
+        for index, row in enumerate(rows):
+            payload[index, :len(row[5])] = np.frombuffer(row[5], dtype=np.uint8)
+        return cls(
+            np.array([row[0] for row in rows], dtype=np.float64),
+            np.array([row[1] for row in rows], dtype=np.uint32),
+            np.array([row[2] for row in rows], dtype=np.uint8),
+            np.array([row[3] for row in rows], dtype=np.uint8),
+            np.array([row[4] for row in rows], dtype=np.int16),
+            np.array([len(row[5]) for row in rows], dtype=np.uint8),
+            payload,
+        )
+
+    def select(self, mask) -> "TelegramTable":
+        """ The rows of a boolean mask or an index array, e.g. table.select(table.sender == 0x0194E3B9) """
+        return TelegramTable(
+            self.timestamp[mask], self.sender[mask], self.rorg[mask], self.status[mask], self.dBm[mask],
+            self.length[mask], self.payload[mask],
+        )
+
+    def _sender_order(self):
+        """ Row indices sorted by sender and time """
+        if self._order is None:
+            self._order = np.lexsort((self.timestamp, self.sender))
+        return self._order
+
+    def duplicates(self, window: float = DEFAULT_WINDOW):
+        """ Boolean mask of the copies, which the DuplicateFilter would drop.
+
+            A row is a copy, if RORG, payload and status (without the repeater
+            count) match the previous row of its sender, received within window
+            seconds.
+        """
+        order = self._sender_order()
+        sender = self.sender[order]
+        payload = self.payload[order]
+        status = self.status[order] & STATUS_MASK
+        rorg = self.rorg[order]
+        length = self.length[order]
+        same = (
+            (sender[1:] == sender[:-1]) & (rorg[1:] == rorg[:-1]) & (length[1:] == length[:-1])
+            & (status[1:] == status[:-1]) & (payload[1:] == payload[:-1]).all(axis=1)
+            & (np.diff(self.timestamp[order]) <= window)
+        )
+        duplicates = np.zeros(len(self), dtype=bool)
+        duplicates[order[1:]] = same
+        return duplicates
+
+    def sender_statistics(self, window: float = DEFAULT_WINDOW) -> SenderStatistics:
+        """ Rates, signal strength, repeater usage and duplicate ratio of each sender """
+        order = self._sender_order()
+        sender = self.sender[order]
+        if not len(sender):
+            empty = np.array([])
+            return SenderStatistics(*([empty] * 9), np.zeros((0, _REPEATER_BUCKETS)))
+        starts = np.flatnonzero(np.r_[True, sender[1:] != sender[:-1]])
+        copies = np.diff(np.r_[starts, len(sender)])
+        ends = starts + copies - 1
+        group = np.repeat(np.arange(len(starts)), copies)
+
+        timestamp = self.timestamp[order]
+        duplicates = self.duplicates(window)[order]
+        telegrams = np.bincount(group, weights=~duplicates, minlength=len(starts)).astype(np.int64)
+        span = timestamp[ends] - timestamp[starts]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.where(span > 0, (telegrams - 1) * 3600.0 / span, 0.0)
+
+        dBm = self.dBm[order].astype(np.float64)
+        # the rows of each sender sorted by dBm, for the median
+        by_dBm = np.sort(dBm + group * 1024.0) - group * 1024.0
+        median = (by_dBm[starts + (copies - 1) // 2] + by_dBm[starts + copies // 2]) / 2
+
+        repeaters = np.bincount(
+            group * _REPEATER_BUCKETS + self.repeater_count[order], minlength=len(starts) * _REPEATER_BUCKETS
+        ).reshape(len(starts), _REPEATER_BUCKETS)
+        return SenderStatistics(
+            sender[starts], copies, telegrams, 1.0 - telegrams / copies, rate,
+            by_dBm[starts], np.add.reduceat(dBm, starts) / copies, median, by_dBm[ends], repeaters,
+        )
+
+    def dBm_histogram(self, bins: int | Iterable[float] = 20, sender: int | None = None):
+        """ (counts, bin edges) of the signal strength of all copies, or of the copies of one sender """
+        dBm = self.dBm if sender is None else self.dBm[self.sender == sender]
+        return np.histogram(dBm, bins=bins)
+
+    def _raw(self, first: int, last: int, shift: int, mask: int):
+        # packet.data[first] is payload column first - 1
+        raw = np.zeros(len(self), dtype=np.uint64)
+        for column in range(first - 1, min(last, self.payload.shape[1])):
+            raw = raw << np.uint64(8) | self.payload[:, column]
+        return (raw >> np.uint64(shift)) & np.uint64(mask)
+
+    def _field(self, eep: EEPInfo, shortcut: str):
+        """ (raw values, scaled values, rows containing the field) of a field of the rows of an EEP """
+        spec = get_decoder(eep, receive_direction(eep)).field_spec(shortcut)
+        if spec is None:
+            raise KeyError(f"{shortcut} is no field of {repr(eep)}")
+        first, last, shift, mask, scaling = spec
+        rows = (self.rorg == eep.rorg) & (self.length >= last)
+        if eep.rorg == RORG.BS4:
+            rows &= (self.payload[:, _BS4_DB0] & _BS4_LRN) != 0 if self.payload.shape[1] > _BS4_DB0 else False
+        raw = self._raw(first, last, shift, mask)
+        if scaling is None:
+            return raw, raw.astype(np.float64), rows
+        factor, range_min, scale_min = scaling
+        return raw, factor * (raw.astype(np.float64) - range_min) + scale_min, rows
+
+    def decode(self, eep: EEPInfo, shortcut: str, sender: int | None = None):
+        """ Values of a field, like the entities decode them, for all rows of a sender or of all senders.
+
+            Rows without the value (other RORG, teach-in telegrams, or flags
+            telling the value is not available) are NaN. TMP follows the
+            rules of EO4HATemperatureSensor and LO those of EO4HAShortcutSensor,
+            other fields are scaled as in EEP.xml, enums return the raw value.
+        """
+        _, values, rows = self._field(eep, shortcut)
+        func, func_type = eep.func, eep.func_type
+        if shortcut == "TMP":
+            if func == 0x04 and func_type in (0x01, 0x02):
+                rows &= self._field(eep, "TSN")[0] == 1
+            elif func == 0x10 and func_type == 0x1F:
+                rows &= self._field(eep, "TMP_F")[0] == 1
+            elif func == 0x20 and func_type == 0x06:
+                raw = self._field(eep, "TMP")[0].astype(np.float64)
+                values = np.where(self._field(eep, "TSL")[0] == 0, raw * 40.0 / 80.0, raw * 80.0 / 16.0)
+            elif not (
+                    func in (0x02, 0x08) or (func == 0x04 and func_type in (0x03, 0x04))
+                    or (func == 0x10 and func_type in A5_10_TEMPERATURE_TYPES)
+            ):
+                rows &= False
+        elif shortcut == "LO" and func == 0x20 and func_type == 0x06:
+            raw = self._field(eep, "LO")[0].astype(np.float64)
+            values = np.where(self._field(eep, "LOM")[0] == 1, raw * 40.0 / 80.0, np.where(raw <= 5, raw, raw - 128))
+        if sender is not None:
+            rows &= self.sender == sender
+        return np.where(rows, values, np.nan)
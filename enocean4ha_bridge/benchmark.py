@@ -0,0 +1,332 @@
+""" Benchmarks of the parse methods of the entities and of EnOceanGateway.send_command().
+
+    The telegrams are generated from the EEP profiles, no dongle is needed,
+    and the gateway runs with a plain event loop instead of Home Assistant.
+    The results are printed as JSON, so the numbers of releases can be compared:
+
+        python -m enocean4ha_bridge.benchmark --iterations 5000 --output results.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Callable, NamedTuple
+
+from enocean.protocol.constants import PACKET, PARSE_RESULT, RORG
+from enocean.protocol.packet import Packet, RadioPacket
+
+from . import __version__
+from .binary_sensor import EO4HABinarySensor
+from .common import EEPInfo
+from .frames import generate_frames
+from .gateway import EnOceanGateway
+from .light import EO4HALight
+from .number import EO4HANumber
+from .select import EO4HASelect
+from .send_queue import Priority
+from .sensor import (
+    EO4HAHumiditySensor,
+    EO4HAIlluminanceSensor,
+    EO4HAPowerSensor,
+    EO4HATemperatureSensor,
+    EO4HAShortcutSensor,
+    EO4HAWindowHandleSensor
+)
+from .switch import EO4HASwitch
+from .valve import EO4HAValve
+
+LOGGER = logging.getLogger('enocean.ha.benchmark')
+
+DEFAULT_ITERATIONS = 2000
+DEFAULT_REPEAT = 3
+
+SENDER = [0x01, 0x82, 0x5D, 0xAB]
+BASE_ID = [0xFF, 0x80, 0x00, 0x00]
+
+# options of the select entity of the external switch/push button type
+_EDT_OPTIONS = {"not used": 0, "switch": 1, "push button": 2, "auto detect": 3}
+
+
+def _parse_frames(frames: list[bytes], iterations: int) -> list[RadioPacket]:
+    packets = []
+    while len(packets) < iterations:
+        for frame in frames[:iterations - len(packets)]:
+            result, _, packet = Packet.parse_msg(bytearray(frame))
+            if result != PARSE_RESULT.OK:
+                raise ValueError(f"Can't parse generated frame {frame.hex()}")
+            packets.append(packet)
+    return packets
+
+
+def _entity(cls, gateway: EnOceanGateway, eep: tuple[int, int, int], **attributes) -> Any:
+    """ Create an entity without Home Assistant, like the integration sets it up """
+    entity = cls.__new__(cls)
+    entity.gateway = gateway
+    entity.dev_id = SENDER
+    entity.eep = EEPInfo(*eep)
+    for name, value in attributes.items():
+        setattr(entity, name, value)
+    return entity
+
+
+class ParseCase(NamedTuple):
+    name: str
+    eep: tuple[int, int, int]
+    command: int | None
+    # returns the function, which is called with the packet: parse_packet(), or parse() if record is True
+    parser: Callable[[EnOceanGateway, tuple[int, int, int], bool], Callable[[RadioPacket], Any]]
+    # fixed values of the generated telegrams
+    fields: dict[str, Any] | None = None
+
+
+def _binary_sensor(button: str | None = None, shortcut: str = ""):
+    def parser(gateway, eep, record):
+        entity = EO4HABinarySensor(gateway, SENDER, list(eep), button)
+        parse = entity.parse if record else entity.parse_packet
+        return lambda packet: parse(packet, 0, 0, shortcut)
+    return parser
+
+
+def _parse_method(cls, **attributes):
+    def parser(gateway, eep, record):
+        entity = _entity(cls, gateway, eep, **attributes)
+        return entity.parse if record else entity.parse_packet
+    return parser
+
+
+PARSE_CASES: tuple[ParseCase, ...] = (
+    ParseCase("binary_sensor F6-02-01 A0", (0xF6, 0x02, 0x01), None, _binary_sensor("A0")),
+    ParseCase("binary_sensor F6-02-02 B1", (0xF6, 0x02, 0x02), None, _binary_sensor("B1")),
+    ParseCase("binary_sensor F6-10-00", (0xF6, 0x10, 0x00), None, _binary_sensor()),
+    ParseCase("binary_sensor D5-00-01", (0xD5, 0x00, 0x01), None, _binary_sensor()),
+    ParseCase("binary_sensor A5-07-03", (0xA5, 0x07, 0x03), None, _binary_sensor()),
+    ParseCase("binary_sensor A5-20-06 DWO", (0xA5, 0x20, 0x06), None, _binary_sensor(shortcut="DWO")),
+    ParseCase("sensor temperature A5-02-05", (0xA5, 0x02, 0x05), None, _parse_method(EO4HATemperatureSensor)),
+    ParseCase("sensor temperature A5-04-01", (0xA5, 0x04, 0x01), None, _parse_method(EO4HATemperatureSensor)),
+    ParseCase("sensor temperature A5-08-01", (0xA5, 0x08, 0x01), None, _parse_method(EO4HATemperatureSensor)),
+    ParseCase("sensor temperature A5-10-03", (0xA5, 0x10, 0x03), None, _parse_method(EO4HATemperatureSensor)),
+    ParseCase("sensor temperature A5-20-06", (0xA5, 0x20, 0x06), None, _parse_method(EO4HATemperatureSensor)),
+    ParseCase("sensor humidity A5-04-01", (0xA5, 0x04, 0x01), None, _parse_method(EO4HAHumiditySensor)),
+    ParseCase("sensor illuminance A5-07-03", (0xA5, 0x07, 0x03), None, _parse_method(EO4HAIlluminanceSensor)),
+    ParseCase("sensor illuminance A5-08-03", (0xA5, 0x08, 0x03), None, _parse_method(EO4HAIlluminanceSensor)),
+    # the power sensor only handles current values, no meter readings
+    ParseCase("sensor power A5-12-01", (0xA5, 0x12, 0x01), None, _parse_method(EO4HAPowerSensor), {"DT": 1}),
+    ParseCase("sensor window handle F6-10-00", (0xF6, 0x10, 0x00), None, _parse_method(EO4HAWindowHandleSensor)),
+    ParseCase("sensor shortcut A5-20-06 LO", (0xA5, 0x20, 0x06), None,
+              _parse_method(EO4HAShortcutSensor, shortcut="LO")),
+    ParseCase("switch A5-12-01", (0xA5, 0x12, 0x01), None, _parse_method(EO4HASwitch, channel=0)),
+    ParseCase("switch D2-01-12 CMD 4", (0xD2, 0x01, 0x12), 4, _parse_method(EO4HASwitch, channel=0)),
+    ParseCase("light D2-01-12 CMD 4", (0xD2, 0x01, 0x12), 4, _parse_method(EO4HALight, channel=0)),
+    ParseCase("number D2-01-12 CMD 13 AOT", (0xD2, 0x01, 0x12), 13,
+              _parse_method(EO4HANumber, channel=0, shortcut="AOT")),
+    ParseCase("select D2-01-12 CMD 13 EDT", (0xD2, 0x01, 0x12), 13,
+              _parse_method(EO4HASelect, channel=0, shortcut="EDT", select_options_dict=_EDT_OPTIONS)),
+    ParseCase("valve A5-20-06", (0xA5, 0x20, 0x06), None, _parse_method(EO4HAValve)),
+)
+
+
+class SendCase(NamedTuple):
+    name: str
+    # calls gateway.send_command() for the n-th iteration
+    send: Callable[[EnOceanGateway, int], Any]
+    # channels of the destination for the channel grouper, if any
+    channels: tuple[int, ...] = ()
+
+
+def _set_output(gateway: EnOceanGateway, index: int):
+    return gateway.send_command(
+        PACKET.RADIO_ERP1, RORG.VLD, 0x01, 0x12, 0x01, destination=SENDER, sender=BASE_ID,
+        DV=0x00, IO=index % 2, OV=index % 101
+    )
+
+
+def _query_measurement(gateway: EnOceanGateway, index: int):
+    return gateway.send_command(
+        PACKET.RADIO_ERP1, RORG.VLD, 0x01, 0x12, 0x06, priority=Priority.STATUS_QUERY,
+        destination=SENDER, sender=BASE_ID, IO=index % 2, qu=index % 2
+    )
+
+
+SEND_CASES: tuple[SendCase, ...] = (
+    SendCase("send_command D2-01-12 CMD 1", _set_output),
+    SendCase("send_command D2-01-12 CMD 1 grouped", _set_output, (0, 1)),
+    SendCase("send_command D2-01-12 CMD 6", _query_measurement),
+)
+
+
+class MemoryCase(NamedTuple):
+    name: str
+    # creates one entity
+    create: Callable[[EnOceanGateway], Any]
+
+
+MEMORY_CASES: tuple[MemoryCase, ...] = (
+    MemoryCase("entity binary_sensor", lambda gateway: EO4HABinarySensor(gateway, SENDER, [0xF6, 0x02, 0x01], "A0")),
+    MemoryCase("entity sensor", lambda gateway: _entity(EO4HATemperatureSensor, gateway, (0xA5, 0x02, 0x05))),
+    MemoryCase("entity switch", lambda gateway: _entity(EO4HASwitch, gateway, (0xD2, 0x01, 0x12), channel=0)),
+    MemoryCase("entity select", lambda gateway: _entity(
+        EO4HASelect, gateway, (0xD2, 0x01, 0x12), channel=0, shortcut="EDT", select_options_dict={}
+    )),
+)
+
+
+def _result(name: str, iterations: int, best_ns: int, peak_bytes: int, retained_bytes: int) -> dict[str, Any]:
+    return {
+        "name": name,
+        "iterations": iterations,
+        "ops_per_second": iterations * 1e9 / best_ns if best_ns else 0.0,
+        "ns_per_op": best_ns / iterations,
+        "peak_bytes_per_op": peak_bytes / iterations,
+        "retained_bytes_per_op": retained_bytes / iterations,
+    }
+
+
+def bench_parse(case: ParseCase, gateway: EnOceanGateway, iterations: int, repeat: int,
+                record: bool = False) -> dict[str, Any]:
+    """ Time the parser of a case on fresh packets, so the decoder cache of the packets is cold.
+        With record, parse() is timed instead of parse_packet().
+    """
+    eep = EEPInfo(*case.eep)
+    frames = generate_frames(eep, command=case.command, fields=case.fields, sender=SENDER, destination=BASE_ID)
+    parse = case.parser(gateway, case.eep, record)
+    # the decoder is compiled on the first call
+    parse(_parse_frames(frames, 1)[0])
+
+    best_ns = None
+    for _ in range(repeat):
+        packets = _parse_frames(frames, iterations)
+        start = time.perf_counter_ns()
+        for packet in packets:
+            parse(packet)
+        elapsed = time.perf_counter_ns() - start
+        best_ns = elapsed if best_ns is None else min(best_ns, elapsed)
+
+    packets = _parse_frames(frames, iterations)
+    peak_bytes = 0
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        for packet in packets:
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            parse(packet)
+            peak_bytes += tracemalloc.get_traced_memory()[1] - current
+        retained_bytes = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return _result(f"{case.name} record" if record else case.name, iterations, best_ns, peak_bytes, retained_bytes)
+
+
+def bench_memory(case: MemoryCase, gateway: EnOceanGateway, count: int) -> dict[str, Any]:
+    """ Bytes per entity instance, including its device id and decoder reference """
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        entities = [case.create(gateway) for _ in range(count)]
+        for entity in entities:
+            entity.decoder
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return {"name": case.name, "instances": count, "bytes_per_instance": retained / count}
+
+
+async def bench_send(case: SendCase, gateway: EnOceanGateway, iterations: int, repeat: int) -> dict[str, Any]:
+    """ Time send_command() including the queueing in the event loop, but without the transmission """
+
+    async def run() -> None:
+        for index in range(iterations):
+            case.send(gateway, index)
+        # the commands are queued by callbacks of the event loop
+        await asyncio.sleep(0)
+        gateway.channel_grouper.flush()
+
+    def reset() -> None:
+        gateway.send_queue.clear()
+        gateway.ack_tracker.cancel_all()
+
+    gateway.set_device_channels(SENDER, case.channels)
+    try:
+        best_ns = None
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            await run()
+            elapsed = time.perf_counter_ns() - start
+            reset()
+            best_ns = elapsed if best_ns is None else min(best_ns, elapsed)
+
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await run()
+            current, peak = tracemalloc.get_traced_memory()
+            reset()
+        finally:
+            tracemalloc.stop()
+    finally:
+        gateway.set_device_channels(SENDER, ())
+    # the peak of a whole batch, commands are kept until they are sent
+    return _result(case.name, iterations, best_ns, peak - before, current - before)
+
+
+async def run_benchmarks(iterations: int = DEFAULT_ITERATIONS, repeat: int = DEFAULT_REPEAT,
+                         name_filter: str | None = None) -> dict[str, Any]:
+    """ Run all benchmarks, whose name contains name_filter """
+    loop = asyncio.get_running_loop()
+    gateway = EnOceanGateway(SimpleNamespace(loop=loop), "/dev/null", use_asyncio=True)
+    results = []
+    cases = [(case, False) for case in PARSE_CASES]
+    cases += [(case, True) for case in PARSE_CASES]
+    cases += [(case, False) for case in (*SEND_CASES, *MEMORY_CASES)]
+    for case, record in cases:
+        name = f"{case.name} record" if record else case.name
+        if name_filter and name_filter not in name:
+            continue
+        try:
+            if isinstance(case, ParseCase):
+                results.append(bench_parse(case, gateway, iterations, repeat, record))
+            elif isinstance(case, MemoryCase):
+                results.append(bench_memory(case, gateway, iterations))
+            else:
+                results.append(await bench_send(case, gateway, iterations, repeat))
+        except Exception as exception:  # report the broken path and keep going
+            results.append({"name": name, "error": repr(exception)})
+    gateway.unload()
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "iterations": iterations,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0].strip())
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="the fastest run is reported")
+    parser.add_argument("--filter", dest="name_filter", help="only run the benchmarks containing this text")
+    parser.add_argument("--output", help="write the JSON to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    report = asyncio.run(run_benchmarks(args.iterations, args.repeat, args.name_filter))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    return 1 if any("error" in result for result in report["results"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,20 +6,39 @@ from enocean.protocol.packet import RadioPacket
 
 
 from .common import EEPInfo
+from .decoders import get_decoder, receive_direction
+from .entity import NO_STATUS, EO4HAEntity, ParseResult
+from .trace import TRACER
 
 LOGGER = logging.getLogger('enocean.ha.binary_sensor')
 
 
-class EO4HABinarySensor:
+class EO4HABinarySensor(EO4HAEntity):
+    __slots__ = ("button",)
+
     def __init__(self, gateway, dev_id: list[int], eep: list[int], button: str | None, loglevel=logging.NOTSET):
         LOGGER.setLevel(loglevel)
         self.gateway = gateway
         self.dev_id = dev_id
         self.eep = EEPInfo(*eep)
-        self.button = ["A1", "A0", "B1", "B0"].index(button.upper()) if button else 4
+        self._decoder = get_decoder(self.eep, receive_direction(self.eep))
+        self.button = self.button_index(button)
         LOGGER.debug(f"EO4HABinarySensor, {repr(self.eep)}, Device-ID: {to_hex_string(dev_id)}, Button: {button}")
 
-    def parse_packet(self, packet: RadioPacket, actual_which, actual_onoff, shortcut: str):
+    @staticmethod
+    def button_index(button: str | None) -> int:
+        """ Index of a rocker button like "A0", 4 for the whole device """
+        return ["A1", "A0", "B1", "B0"].index(button.upper()) if button else 4
+
+    def parse_packet(self, packet: RadioPacket, actual_which=None, actual_onoff=None, shortcut: str = ""):
+        result = self.parse(packet, actual_which, actual_onoff, shortcut)
+        self.remember_state(result)
+        return self.as_state(self.detect_change(result))
+
+    def state_name(self) -> str:
+        return f"button{self.button}"
+
+    def parse(self, packet: RadioPacket, actual_which=None, actual_onoff=None, shortcut: str = "") -> ParseResult:
         """ This method is called when there is an incoming packet
             associated with this platform.
 
@@ -29,7 +48,8 @@ class EO4HABinarySensor:
                 - button released
                     ['0xF6', '0x00', '0x00', '0x2d', '0xcf', '0x45', '0x20']
         """
-        LOGGER.debug(repr(self.eep))
+        if TRACER.active:
+            TRACER.trace("parse", self.dev_id, self.eep, entity="binary_sensor", button=self.button, shortcut=shortcut)
 
         match packet.rorg:
             case RORG.RPS:
@@ -71,38 +91,26 @@ class EO4HABinarySensor:
             which = actual_which
             onoff = actual_onoff
 
-        return {
-            "legacy": (pushed, which, onoff),
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
+        return ParseResult(packet.dBm, packet.repeater_count, legacy=(pushed, which, onoff))
 
     def _parse_f6_packet(self, packet: RadioPacket):
         func = self.eep.func
         func_type = self.eep.func_type
-        packet.parse_eep(rorg_func=func, rorg_type=func_type)
-        parsed = packet.parsed
-        result = {
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
+        parsed = self._decoder(packet)
+        status = NO_STATUS
 
         if func == 0x01 and func_type == 0x01:
-            result["status"] = parsed["PB"]["raw_value"]
-        elif func == 0x02 and func_type in [0x01, 0x02] and self.button < 4:
+            status = parsed["PB"].raw_value
+        elif func == 0x02 and func_type in (0x01, 0x02) and self.button < 4:
             if (
-                    parsed["R1"]["raw_value"] == self.button
-                    and parsed["T21"]["raw_value"] == 1
-                    and parsed["NU"]["raw_value"] == 1
+                    parsed["R1"].raw_value == self.button
+                    and parsed["T21"].raw_value == 1
+                    and parsed["NU"].raw_value == 1
             ):
-                result["status"] = parsed["EB"]["raw_value"]
+                status = parsed["EB"].raw_value
         elif func == 0x02 and func_type == 0x03 and self.button < 4:
-            if parsed["T21"]["raw_value"] == 1 and parsed["NU"]["raw_value"] == 1:
-                result["status"] = 0
+            if parsed["T21"].raw_value == 1 and parsed["NU"].raw_value == 1:
+                status = 0
                 if "RA" in parsed:
                     buttons = {
                         0x10: 0,
@@ -110,56 +118,46 @@ class EO4HABinarySensor:
                         0x50: 2,
                         0x70: 3
                     }
-                    if buttons[parsed["RA"]["raw_value"]] == self.button:
-                        result["status"] = 1
+                    if buttons[parsed["RA"].raw_value] == self.button:
+                        status = 1
         elif func == 0x02 and func_type == 0x03 and self.button < 4:
             key = ("RAI", "RA0", "RBI", "RB0")[self.button]
-            result["status"] = parsed[key]["raw_value"]
+            status = parsed[key].raw_value
         elif func == 0x04 and func_type == 0x01 and self.button < 4:
             if "KC" in parsed:
-            #     if parsed["T21"]["raw_value"] == 1 and parsed["NU"]["raw_value"] == 1:
+            #     if parsed["T21"].raw_value == 1 and parsed["NU"].raw_value == 1:
             #         print("ON")
-            #         result["status"] = 1
-            #     elif parsed["T21"]["raw_value"] == 1 and parsed["NU"]["raw_value"] == 0:
-            #         result["status"] = 0
+            #         status = 1
+            #     elif parsed["T21"].raw_value == 1 and parsed["NU"].raw_value == 0:
+            #         status = 0
             #         print("OFF")
-                result["status"] = 1 if parsed["KC"]["value"] == "inserted" else 0
-        return result
+                status = 1 if parsed["KC"].value == "inserted" else 0
+        return ParseResult(packet.dBm, packet.repeater_count, status)
 
     def _parse_d5_packet(self, packet: RadioPacket):
         func = self.eep.func
         func_type = self.eep.func_type
-        packet.parse_eep(rorg_func=func, rorg_type=func_type)
-        parsed = packet.parsed
-        result = {
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
+        parsed = self._decoder(packet)
+        status = NO_STATUS
         if func == 0x00 and func_type == 0x01:
             if "CO" in parsed:
-                result["status"] = not bool(parsed["CO"]["raw_value"])
-        return result
+                status = not bool(parsed["CO"].raw_value)
+        return ParseResult(packet.dBm, packet.repeater_count, status)
 
     def _parse_a5_packet(self, packet: RadioPacket, shortcut: str):
         func = self.eep.func
         func_type = self.eep.func_type
-        parsed = packet.parsed
-        result = {
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
+        status = NO_STATUS
         if func == 0x07 and func_type == 0x03:
-            packet.parse_eep(rorg_func=func, rorg_type=func_type)
+            parsed = self._decoder(packet)
             if "PIRS" in parsed:
-                result["status"] = bool(parsed["PIRS"]["raw_value"])
+                status = bool(parsed["PIRS"].raw_value)
         elif func == 0x20 and func_type == 0x06:
-            packet.parse_eep(rorg_func=func, rorg_type=func_type, direction=1)
-            if shortcut in packet.parsed:
-                result["status"] = packet.parsed[shortcut]["raw_value"]
-                result["extra_state_attr"]["raw_value"] = packet.parsed[shortcut]["raw_value"]
-
-        return result
+            parsed = self._decoder(packet)
+            if shortcut in parsed:
+                return ParseResult(
+                    packet.dBm, packet.repeater_count, parsed[shortcut].raw_value,
+                    (("raw_value", parsed[shortcut].raw_value),)
+                )
+
+        return ParseResult(packet.dBm, packet.repeater_count, status)
@@ -0,0 +1,178 @@
+""" Recording of the received ESP3 frames, and their replay through a gateway.
+
+    A capture file starts with CAPTURE_MAGIC, followed by one record per
+    frame: the receive time (seconds since the epoch, little endian double),
+    the length of the frame (little endian unsigned short) and the frame.
+"""
+
+import asyncio
+import logging
+import struct
+import threading
+import time
+from typing import TYPE_CHECKING, Any, BinaryIO, Iterable, Iterator, NamedTuple
+
+from enocean.protocol.constants import PARSE_RESULT
+from enocean.protocol.packet import Packet, RadioPacket
+from enocean.utils import to_hex_string
+
+if TYPE_CHECKING:
+    from .gateway import EnOceanGateway
+
+LOGGER = logging.getLogger('enocean.ha.capture')
+
+CAPTURE_MAGIC = b"EO4HACAP\x01"
+# the header of each record: receive time and length of the frame
+CAPTURE_RECORD = struct.Struct("<dH")
+
+
+class CaptureFormatError(ValueError):
+    """ The file is no capture file, or it is truncated """
+
+
+class PacketRecorder:
+    """ Appends received packets to a capture file. record() may be called from any thread. """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file: BinaryIO = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(CAPTURE_MAGIC)
+        self.recorded = 0
+
+    def record(self, packet: Packet, timestamp: float | None = None) -> None:
+        frame = bytes(packet.build())
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(CAPTURE_RECORD.pack(time.time() if timestamp is None else timestamp, len(frame)))
+            self._file.write(frame)
+            self.recorded += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def read_capture(path: str) -> Iterator[tuple[float, bytes]]:
+    """ Yield (receive time, ESP3 frame) of all records of a capture file """
+    with open(path, "rb") as file:
+        if file.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise CaptureFormatError(f"{path} is no capture file")
+        while header := file.read(CAPTURE_RECORD.size):
+            if len(header) < CAPTURE_RECORD.size:
+                raise CaptureFormatError(f"{path} is truncated")
+            timestamp, length = CAPTURE_RECORD.unpack(header)
+            frame = file.read(length)
+            if len(frame) < length:
+                raise CaptureFormatError(f"{path} is truncated")
+            yield timestamp, frame
+
+
+def entity_name(entity: Any) -> str:
+    """ entity_id of an entity, or its class, device id and channel """
+    entity_id = getattr(entity, "entity_id", None)
+    if entity_id:
+        return entity_id
+    name = f"{type(entity).__name__} {to_hex_string(entity.dev_id)}"
+    channel = getattr(entity, "channel", None)
+    return name if channel is None else f"{name} #{channel}"
+
+
+class ReplayReport(NamedTuple):
+    # number of frames in the capture
+    frames: int
+    # number of radio telegrams routed through the gateway
+    telegrams: int
+    # seconds of the replay
+    duration: float
+    # entity name -> (number of parse_packet() calls, total seconds in parse_packet())
+    entity_times: dict[str, tuple[int, float]]
+
+    @property
+    def telegrams_per_second(self) -> float:
+        return self.telegrams / self.duration if self.duration else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "frames": self.frames,
+            "telegrams": self.telegrams,
+            "duration": self.duration,
+            "telegrams_per_second": self.telegrams_per_second,
+            "entities": {
+                name: {"calls": calls, "total": total, "mean": total / calls if calls else 0.0}
+                for name, (calls, total) in self.entity_times.items()
+            },
+        }
+
+
+class ReplayDriver:
+    """ Feeds a capture file through the routing of a gateway to the parse_packet() of entities.
+
+        speed is the factor of the original timing, e.g. 1.0 for real time
+        or 10.0 for ten times faster; None replays as fast as possible.
+        For a deterministic replay, e.g. of the duplicate filter, pass clock
+        as clock of the components of the gateway: it returns the receive
+        time of the telegram being replayed.
+    """
+
+    def __init__(self, gateway: "EnOceanGateway", entities: Iterable[Any] = ()):
+        self._gateway = gateway
+        self._entities = list(entities)
+        self._time = 0.0
+
+    def clock(self) -> float:
+        return self._time
+
+    async def run(self, path: str, speed: float | None = 1.0) -> ReplayReport:
+        """ Replay a capture file, must be run in the event loop """
+        entity_times: dict[str, list] = {}
+        unregister = [
+            self._gateway.register_receiver(entity.dev_id, self._timed(entity, entity_times))
+            for entity in self._entities
+        ]
+        frames = telegrams = 0
+        first = None
+        start = time.perf_counter()
+        try:
+            for timestamp, frame in read_capture(path):
+                frames += 1
+                if first is None:
+                    first = timestamp
+                if speed:
+                    delay = (timestamp - first) / speed - (time.perf_counter() - start)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                result, _, packet = Packet.parse_msg(bytearray(frame))
+                if result != PARSE_RESULT.OK or not isinstance(packet, RadioPacket):
+                    continue
+                self._time = timestamp
+                telegrams += 1
+                self._gateway.route_packet(packet)
+        finally:
+            for unregister_receiver in unregister:
+                unregister_receiver()
+        return ReplayReport(
+            frames, telegrams, time.perf_counter() - start,
+            {name: (calls, total) for name, (calls, total) in entity_times.items()}
+        )
+
+    @staticmethod
+    def _timed(entity: Any, entity_times: dict[str, list]):
+        times = entity_times.setdefault(entity_name(entity), [0, 0.0])
+
+        def _receiver(packet: RadioPacket):
+            begin = time.perf_counter()
+            try:
+                entity.parse_packet(packet)
+            finally:
+                times[0] += 1
+                times[1] += time.perf_counter() - begin
+
+        return _receiver
@@ -0,0 +1,59 @@
+""" Detection of meaningful changes of the readings of an entity.
+
+    Sensors repeat their reading every few minutes, even if it didn't change.
+    A ChangeDetector assigned to the change_detector of an entity marks those
+    repeats, so parse_packet() returns "changed": False and the state doesn't
+    need to be written again:
+
+        sensor.change_detector = ChangeDetector(deadband=0.2, heartbeat=900)
+"""
+
+import time
+from numbers import Number
+from typing import Any, Callable
+
+# seconds after which an unchanged value is reported anyway
+DEFAULT_HEARTBEAT = 3600.0
+
+
+class ChangeDetector:
+    """ Remembers the last reported value of an entity.
+
+        A numeric value has changed, if it differs by more than deadband
+        from the last reported value, any other value if it isn't equal.
+        After heartbeat seconds without a reported change the value is
+        reported anyway, None disables the heartbeat.
+    """
+    __slots__ = ("deadband", "heartbeat", "_clock", "_value", "_time", "suppressed")
+
+    def __init__(self, deadband: float = 0.0, heartbeat: float | None = DEFAULT_HEARTBEAT,
+                 clock: Callable[[], float] = time.monotonic):
+        self.deadband = deadband
+        self.heartbeat = heartbeat
+        self._clock = clock
+        self._value: Any = None
+        self._time: float | None = None
+        self.suppressed = 0
+
+    def update(self, value: Any) -> bool:
+        """ Return True and remember the value, if it has to be reported """
+        now = self._clock()
+        if self._time is not None and not self._differs(value):
+            if self.heartbeat is None or now - self._time < self.heartbeat:
+                self.suppressed += 1
+                return False
+        self._value = value
+        self._time = now
+        return True
+
+    def reset(self) -> None:
+        """ Report the next value in any case, e.g. after a reconnect """
+        self._value = None
+        self._time = None
+
+    def _differs(self, value: Any) -> bool:
+        last = self._value
+        if isinstance(value, Number) and isinstance(last, Number) \
+                and not isinstance(value, bool) and not isinstance(last, bool):
+            return abs(value - last) > self.deadband
+        return value != last
@@ -0,0 +1,122 @@
+""" Merging of the output commands for several channels of a D2-01 actuator. """
+
+import asyncio
+import logging
+from collections import Counter
+from typing import Any, Callable
+
+from enocean.protocol.constants import RORG
+
+from .common import dev_id_to_int
+
+LOGGER = logging.getLogger('enocean.ha.channel_groups')
+
+# IO value of D2-01 commands for all output channels of the device
+ALL_CHANNELS = 0x1E
+# D2-01 CMD 1: Actuator Set Output
+CMD_SET_OUTPUT = 0x1
+DEFAULT_GROUP_WINDOW = 0.05
+
+# arguments of send_command(), which are no EEP fields
+_SEND_ARGUMENTS = frozenset({
+    'packet_type', 'rorg', 'rorg_func', 'rorg_type', 'command', 'priority',
+    'destination', 'sender', 'direction', 'learn',
+})
+
+
+class _Group:
+    __slots__ = ("dev_id", "command", "channels", "timer")
+
+    def __init__(self, dev_id: int, command: dict[str, Any]):
+        self.dev_id = dev_id
+        # the arguments of send_command(), without IO
+        self.command = command
+        # channel -> the values of the fields, e.g. (("DV", 0), ("OV", 100))
+        self.channels: dict[int, tuple] = {}
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class ChannelCommandGrouper:
+    """ Merges the D2-01 set output commands for the channels of a device.
+
+        The commands for the channels of a device, which arrive within window
+        seconds, are sent as one telegram with IO=ALL_CHANNELS, if all channels
+        of the device get the same values. If most channels get the same
+        values, these are sent to all channels first, followed by the
+        channels with other values. Otherwise, each channel gets its own
+        telegram.
+
+        Only devices with known channels (set_device_channels()) are grouped,
+        as a telegram for all channels would also switch unknown ones.
+        add() and set_device_channels() must be run in the event loop.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, send: Callable[..., None],
+                 window: float = DEFAULT_GROUP_WINDOW):
+        self._loop = loop
+        self._send = send
+        self.window = window
+        self._device_channels: dict[int, frozenset[int]] = {}
+        self._groups: dict[tuple, _Group] = {}
+        self.commands = 0
+        self.telegrams = 0
+
+    def set_device_channels(self, dev_id: list[int], channels) -> None:
+        """ Set the output channels of a device, or remove them with an empty list """
+        if channels:
+            self._device_channels[dev_id_to_int(dev_id)] = frozenset(channels)
+        else:
+            self._device_channels.pop(dev_id_to_int(dev_id), None)
+
+    def device_channels(self, dev_id: list[int]) -> frozenset[int]:
+        return self._device_channels.get(dev_id_to_int(dev_id), frozenset())
+
+    def accepts(self, rorg: int, rorg_func: int, command: int, kwargs: dict[str, Any]) -> bool:
+        """ Return True, if the command of send_command() can be grouped """
+        if rorg != RORG.VLD or rorg_func != 0x01 or command != CMD_SET_OUTPUT:
+            return False
+        destination = kwargs.get('destination')
+        if destination is None:
+            return False
+        channels = self._device_channels.get(dev_id_to_int(destination))
+        return channels is not None and kwargs.get('IO') in channels
+
+    def add(self, **command) -> None:
+        """ Collect a command, with the arguments of send_command() """
+        self.commands += 1
+        channel = command.pop('IO')
+        values = tuple(sorted((name, value) for name, value in command.items() if name not in _SEND_ARGUMENTS))
+        command = {name: value for name, value in command.items() if name in _SEND_ARGUMENTS}
+        dev_id = dev_id_to_int(command['destination'])
+        key = tuple(
+            (name, tuple(value) if isinstance(value, list) else value) for name, value in sorted(command.items())
+        )
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _Group(dev_id, command)
+            group.timer = self._loop.call_later(self.window, self._flush, key)
+        group.channels[channel] = values
+
+    def flush(self) -> None:
+        """ Send all collected commands now """
+        for key in list(self._groups):
+            self._groups[key].timer.cancel()
+            self._flush(key)
+
+    def _flush(self, key: tuple) -> None:
+        group = self._groups.pop(key)
+        for channel, values in self._merge(group):
+            self.telegrams += 1
+            self._send(IO=channel, **group.command, **dict(values))
+
+    def _merge(self, group: _Group) -> list[tuple[int, tuple]]:
+        """ Return the fewest (IO, values) telegrams, which set all channels of the group """
+        telegrams = list(group.channels.items())
+        device_channels = self._device_channels.get(group.dev_id, frozenset())
+        if not device_channels or not device_channels <= group.channels.keys():
+            return telegrams
+        values, _ = Counter(group.channels[channel] for channel in device_channels).most_common(1)[0]
+        others = [(channel, other) for channel, other in telegrams if other != values]
+        if 1 + len(others) >= len(telegrams):
+            return telegrams
+        return [(ALL_CHANNELS, values), *others]
@@ -1,5 +1,7 @@
 from typing import NamedTuple
 
+from enocean.protocol.packet import Packet
+
 
 class EEPInfo(NamedTuple):
     rorg: int
@@ -10,10 +12,50 @@ class EEPInfo(NamedTuple):
         return f"EEP {self.rorg:02X}-{self.func:02X}-{self.func_type:02X}"
 
 
+def dev_id_to_int(dev_id: list[int] | bytes) -> int:
+    """ Convert a device id like [0x01, 0x82, 0x5D, 0xAB] to an int, usable as dict key """
+    return int.from_bytes(bytes(dev_id), "big")
+
+
+def parse_cache(packet: Packet) -> dict:
+    """ The cache of the parsed EEP values of a packet.
+
+        All entities of a device receive the same packet object, so a packet
+        is parsed only once per profile. parse_eep() keys it on (rorg, func,
+        type, direction, command), the decoders on (EEPInfo, direction,
+        command).
+    """
+    try:
+        return packet.eo4ha_parse_cache
+    except AttributeError:
+        cache = packet.eo4ha_parse_cache = {}
+        return cache
+
+
+def parse_eep(packet: Packet, rorg_func: int, rorg_type: int, direction=None, command: int | None = None) -> dict:
+    """ Parse the EEP data of a packet, but only once per packet and profile.
+
+        Returns shortcut -> the dict of Packet.parse_eep() with description
+        and unit, for the profiles the decoders don't compile. The returned
+        dict is shared and must not be modified.
+    """
+    cache = parse_cache(packet)
+    key = (packet.rorg, rorg_func, rorg_type, direction, command)
+    parsed = cache.get(key)
+    if parsed is None:
+        provides = packet.parse_eep(rorg_func=rorg_func, rorg_type=rorg_type, direction=direction, command=command)
+        parsed = cache[key] = {shortcut: packet.parsed[shortcut] for shortcut in provides}
+    return parsed
+
+
 class EO4HAError(Exception):
     """ Base exception for enocean4ha_bridge """
 
 class EO4HAEEPNotSupportedError(EO4HAError):
-    """ The given EEP is currently not supported """
-    def __init__(self, eep: EEPInfo):
-        super().__init__(f"{repr(eep)} is currently not supported.")
+    """ The given EEPs are currently not supported """
+    def __init__(self, eep: EEPInfo, *eeps: EEPInfo):
+        self.eeps = (eep, *eeps)
+        if eeps:
+            super().__init__(f"{', '.join(repr(eep) for eep in self.eeps)} are currently not supported.")
+        else:
+            super().__init__(f"{repr(eep)} is currently not supported.")
@@ -0,0 +1,182 @@
+""" Communicator for the EnOcean dongle, which runs in the asyncio event loop.
+
+    In contrast to enocean.communicators.SerialCommunicator, there is no
+    extra thread: the serial port is watched with loop.add_reader() and
+    received packets are handed to the callback in the event loop.
+"""
+
+import asyncio
+import datetime
+import logging
+import os
+from typing import Callable
+
+import serial
+from enocean.protocol.constants import COMMON_COMMAND, PACKET, PARSE_RESULT, RETURN_CODE
+from enocean.protocol.packet import Packet, RadioPacket, ResponsePacket, UTETeachInPacket
+
+from .trace import TRACER
+
+LOGGER = logging.getLogger('enocean.ha.communicator')
+
+BAUDRATE = 57600
+BASE_ID_TIMEOUT = 1.0
+
+
+class ESP3Protocol(asyncio.Protocol):
+    """ Splits a byte stream into ESP3 packets and hands them to a callback """
+
+    def __init__(self, packet_callback: Callable[[Packet], None]):
+        self._packet_callback = packet_callback
+        self._buffer = []
+
+    def data_received(self, data: bytes) -> None:
+        self._buffer.extend(data)
+        while True:
+            status, self._buffer, packet = Packet.parse_msg(self._buffer)
+            if status == PARSE_RESULT.INCOMPLETE:
+                return
+            if status == PARSE_RESULT.OK and packet:
+                packet.received = datetime.datetime.now()
+                self._packet_callback(packet)
+
+
+class AsyncSerialCommunicator:
+    """ Serial communicator for EnOcean dongles, integrated in the asyncio event loop.
+
+        Offers the same interface as SerialCommunicator (send, stop, base_id,
+        teach_in), but start() and get_base_id() are coroutines and all
+        callbacks are run in the event loop.
+    """
+
+    def __init__(self, port: str, callback: Callable[[Packet], None] | None = None, teach_in: bool = True,
+                 loglevel=logging.NOTSET):
+        LOGGER.setLevel(loglevel)
+        self.port = port
+        self.callback = callback
+        self.teach_in = teach_in
+        self._base_id: list[int] | None = None
+        self._base_id_future: asyncio.Future | None = None
+        self._serial: serial.Serial | None = None
+        self._fd: int | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._write_buffer = bytearray()
+        self._protocol = ESP3Protocol(self._packet_received)
+
+    @property
+    def is_running(self) -> bool:
+        return self._fd is not None
+
+    async def start(self) -> None:
+        """ Open the serial port and start watching it """
+        self._loop = asyncio.get_running_loop()
+        # opening the port may block for a moment, so don't do it in the loop
+        self._serial = await self._loop.run_in_executor(
+            None, lambda: serial.Serial(self.port, BAUDRATE, timeout=0)
+        )
+        self._fd = self._serial.fileno()
+        os.set_blocking(self._fd, False)
+        self._loop.add_reader(self._fd, self._read_ready)
+        LOGGER.info(f"AsyncSerialCommunicator started on {self.port}")
+
+    def stop(self) -> None:
+        """ Stop watching the serial port and close it """
+        if self._fd is None:
+            return
+        self._loop.remove_reader(self._fd)
+        self._loop.remove_writer(self._fd)
+        self._fd = None
+        self._write_buffer.clear()
+        self._serial.close()
+        if self._base_id_future and not self._base_id_future.done():
+            self._base_id_future.set_result(None)
+        LOGGER.info(f"AsyncSerialCommunicator on {self.port} stopped")
+
+    def _read_ready(self) -> None:
+        try:
+            data = os.read(self._fd, 1024)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as exception:
+            LOGGER.error(f"Serial port exception! (device disconnected?) {repr(exception)}")
+            self.stop()
+            return
+        if data:
+            self._protocol.data_received(data)
+
+    def _write_ready(self) -> None:
+        try:
+            written = os.write(self._fd, self._write_buffer)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as exception:
+            LOGGER.error(f"Serial port exception! (device disconnected?) {repr(exception)}")
+            self.stop()
+            return
+        del self._write_buffer[:written]
+        if not self._write_buffer:
+            self._loop.remove_writer(self._fd)
+
+    def send(self, packet: Packet) -> bool:
+        """ Send a packet to the dongle. Must be run in the event loop. """
+        if not isinstance(packet, Packet):
+            LOGGER.error('Object to send must be an instance of Packet')
+            return False
+        if TRACER.active:
+            TRACER.trace("esp3_send", packet.optional[1:5] if len(packet.optional) >= 5 else None, packet=packet)
+        if self._fd is None:
+            LOGGER.error('AsyncSerialCommunicator is not running')
+            return False
+        waiting = bool(self._write_buffer)
+        self._write_buffer.extend(packet.build())
+        if not waiting:
+            self._write_ready()
+            if self._write_buffer and self._fd is not None:
+                self._loop.add_writer(self._fd, self._write_ready)
+        return True
+
+    def _packet_received(self, packet: Packet) -> None:
+        if (
+            isinstance(packet, ResponsePacket)
+            and self._base_id_future is not None
+            and not self._base_id_future.done()
+            and packet.response == RETURN_CODE.OK
+            and len(packet.response_data) == 4
+        ):
+            self._base_id = packet.response_data
+            self._base_id_future.set_result(self._base_id)
+
+        if isinstance(packet, UTETeachInPacket) and self.teach_in and self._base_id is not None:
+            LOGGER.info('Sending response to UTE teach-in.')
+            self.send(packet.create_response_packet(self._base_id))
+
+        if TRACER.active:
+            TRACER.trace("esp3_receive", packet.sender if isinstance(packet, RadioPacket) else None, packet=packet)
+        if self.callback is not None:
+            self.callback(packet)
+
+    @property
+    def base_id(self) -> list[int] | None:
+        """ The base id of the dongle, None until get_base_id() succeeded """
+        return self._base_id
+
+    @base_id.setter
+    def base_id(self, base_id: list[int]):
+        """ Sets the Base ID manually, only for testing purposes. """
+        self._base_id = base_id
+
+    async def get_base_id(self, timeout: float = BASE_ID_TIMEOUT) -> list[int] | None:
+        """ Fetch the base id from the dongle, if not done already.
+
+            Returns None, if the dongle didn't answer within timeout seconds.
+        """
+        if self._base_id is not None:
+            return self._base_id
+        if self._base_id_future is None or self._base_id_future.done():
+            self._base_id_future = self._loop.create_future()
+            self.send(Packet(PACKET.COMMON_COMMAND, data=[COMMON_COMMAND.CO_RD_IDBASE]))
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._base_id_future), timeout)
+        except asyncio.TimeoutError:
+            LOGGER.warning(f"Dongle on {self.port} didn't send its base id within {timeout} seconds")
+            return None
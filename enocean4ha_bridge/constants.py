@@ -2,5 +2,13 @@ DATA_ENOCEAN = "enocean"
 ENOCEAN_DONGLE = "dongle"
 SIGNAL_RECEIVE_MESSAGE = "enocean.receive_message"
 SIGNAL_SEND_MESSAGE = "enocean.send_message"
+# statistics of an interval of an electricity meter, see metering.MeteringPipeline
+SIGNAL_METER_STATISTICS = "enocean.meter_statistics"
 
-STATE_TILT = "tilt"
\ No newline at end of file
+STATE_TILT = "tilt"
+# values of the Home Assistant constants, so the bridge doesn't need to import homeassistant
+ATTR_BRIGHTNESS = "brightness"
+CONF_BRIGHTNESS = "brightness"
+CONF_STATE = "state"
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
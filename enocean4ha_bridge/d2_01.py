@@ -0,0 +1,61 @@
+""" D2-01 telegrams, which the EEP.xml of enocean4ha doesn't describe.
+
+    EEP.xml only has profiles for CMD 1, 4, 6 and 7 of D2-01-12, so the
+    status query and the external interface settings are encoded and
+    decoded here by their bit positions.
+"""
+
+from typing import Any, NamedTuple
+
+from enocean.protocol.constants import RORG
+from enocean.protocol.packet import RadioPacket
+
+# D2-01 queries, which are answered by CMD 4, CMD 7 and CMD 0xD
+CMD_QUERY_STATUS = 0x3
+CMD_QUERY_MEASUREMENT = 0x6
+CMD_QUERY_INTERFACE = 0xC
+# D2-01 CMD 0xB: Actuator Set External Interface Settings
+CMD_SET_INTERFACE = 0xB
+# D2-01 CMD 0xD: Actuator External Interface Settings Response
+CMD_INTERFACE_RESPONSE = 0xD
+# AOT or DOT of CMD 0xB, which leaves the timer unchanged
+TIMER_UNCHANGED = 0xFFFF
+
+
+class InterfaceSettings(NamedTuple):
+    """ External interface settings of a channel, the fields are named like the EEP shortcuts """
+    IO: int
+    # auto OFF and delay OFF timer in 0.1 s, 0xFFFF if not used
+    AOT: int
+    DOT: int
+    # external switch/push button type
+    EDT: int
+    # 2-state switch type
+    EDTS: int
+
+
+def decode_interface_settings(packet: RadioPacket) -> InterfaceSettings | None:
+    """ Decode a CMD 0xD telegram, None for other telegrams """
+    data = packet.data
+    # 8 data bytes, followed by the sender and the status
+    if packet.rorg != RORG.VLD or len(data) < 13 or data[1] & 0x0F != CMD_INTERFACE_RESPONSE:
+        return None
+    return InterfaceSettings(
+        data[2] & 0x1F, data[3] << 8 | data[4], data[5] << 8 | data[6], data[7] >> 6 & 0x03, data[7] >> 5 & 0x01
+    )
+
+
+def encode_command(command: int | None, fields: dict[str, Any]) -> list[int] | None:
+    """ Data bytes after the RORG of a CMD 3, 0xB or 0xC telegram, None for other commands.
+
+        fields are the values of send_command(): IO, and for CMD 0xB AOT,
+        DOT, EDT and EDTS, of which the missing ones aren't changed or are 0.
+    """
+    if command in (CMD_QUERY_STATUS, CMD_QUERY_INTERFACE):
+        return [command, fields['IO'] & 0x1F]
+    if command == CMD_SET_INTERFACE:
+        aot = fields.get('AOT', TIMER_UNCHANGED) & 0xFFFF
+        dot = fields.get('DOT', TIMER_UNCHANGED) & 0xFFFF
+        flags = (fields.get('EDT', 0) & 0x03) << 6 | (fields.get('EDTS', 0) & 0x01) << 5
+        return [command, fields['IO'] & 0x1F, aot >> 8, aot & 0xFF, dot >> 8, dot & 0xFF, flags]
+    return None
@@ -0,0 +1,256 @@
+""" Precompiled decoders for the EEP profiles used by the bridge.
+
+    The generic Packet.parse_eep() walks the EEP.xml profile and converts the
+    data to bit lists on every call. The decoders in this module walk the
+    profile only once, when they are created, and afterward extract the
+    fields with plain bit operations on packet.data.
+"""
+
+import logging
+from typing import Any, NamedTuple
+
+from enocean.protocol.constants import RORG
+from enocean.protocol.packet import Packet
+
+from .common import EEPInfo, parse_cache
+
+LOGGER = logging.getLogger('enocean.ha.decoders')
+
+# field kinds
+_VALUE = 0
+_ENUM = 1
+_STATUS = 2
+
+# enum fields up to this size get a complete lookup table
+_MAX_TABLE_BITS = 8
+
+
+class Field(NamedTuple):
+    """ A decoded field of a telegram """
+    raw_value: int
+    value: Any
+
+
+# RORG and FUNC of the profiles the bridge entities know how to handle.
+# All TYPEs of these FUNCs, which are described in EEP.xml, are supported.
+SUPPORTED_FUNCS: frozenset[tuple[int, int]] = frozenset({
+    (RORG.RPS, 0x01),
+    (RORG.RPS, 0x02),
+    (RORG.RPS, 0x04),
+    (RORG.RPS, 0x10),
+    (RORG.BS1, 0x00),
+    (RORG.BS4, 0x02),
+    (RORG.BS4, 0x04),
+    (RORG.BS4, 0x07),
+    (RORG.BS4, 0x08),
+    (RORG.BS4, 0x10),
+    (RORG.BS4, 0x12),
+    (RORG.BS4, 0x20),
+    (RORG.VLD, 0x01),
+})
+
+
+# Profiles with a data block per direction, and the direction of the telegrams
+# the devices send. The bridge receives only these.
+RECEIVE_DIRECTIONS: dict[tuple[int, int, int], int] = {
+    (RORG.BS4, 0x20, 0x01): 1,
+    (RORG.BS4, 0x20, 0x06): 1,
+}
+
+
+def is_supported(eep: EEPInfo) -> bool:
+    """ Return True, if the bridge has entities which can handle the given EEP, and EEP.xml describes it """
+    return (
+        (eep.rorg, eep.func) in SUPPORTED_FUNCS
+        and eep.func_type in Packet.eep.telegrams.get(eep.rorg, {}).get(eep.func, {})
+    )
+
+
+def field_position(source) -> tuple[int, int, int, int]:
+    """ Convert offset and size of a field in the data bits to (first byte, last byte, shift, mask) of packet.data """
+    offset = int(source['offset'])
+    size = int(source['size'])
+    end = offset + size - 1
+    # packet.data[0] is the RORG, the data bits start at packet.data[1]
+    return 1 + offset // 8, 1 + end // 8, 7 - end % 8, (1 << size) - 1
+
+
+def _extract(data: list[int], first: int, last: int, shift: int, mask: int) -> int:
+    if first == last:
+        return (data[first] >> shift) & mask
+    return (int.from_bytes(bytes(data[first:last + 1]), "big") >> shift) & mask
+
+
+def _compile_enum(source) -> tuple[dict | list, list]:
+    """ Return (items, rangeitems) for the enum, like EEP._get_enum() finds them """
+    items = {}
+    for item in source.find_all('item'):
+        value = item.get('value', '')
+        try:
+            raw_value = int(value)
+        except ValueError:
+            continue
+        # EEP._get_enum() compares the value as string, so "0x0" never matches
+        if str(raw_value) == value:
+            items.setdefault(raw_value, item['description'])
+    rangeitems = [
+        (int(rangeitem.get('start', -1)), int(rangeitem.get('end', -1)), rangeitem['description'])
+        for rangeitem in source.find_all('rangeitem')
+    ]
+    if int(source['size']) > _MAX_TABLE_BITS:
+        return items, rangeitems
+    table = [_lookup_enum(items, rangeitems, raw_value) for raw_value in range(1 << int(source['size']))]
+    return table, []
+
+
+def _lookup_enum(items: dict, rangeitems: list, raw_value: int) -> str | None:
+    description = items.get(raw_value)
+    if description is None:
+        for start, end, rangeitem_description in rangeitems:
+            if start <= raw_value <= end:
+                description = rangeitem_description
+                break
+        else:
+            return None
+    try:
+        return description.format(value=raw_value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _compile_field(source) -> tuple | None:
+    if source.name == 'value':
+        rng_min = float(source.find('range').find('min').text)
+        rng_max = float(source.find('range').find('max').text)
+        scl_min = float(source.find('scale').find('min').text)
+        scl_max = float(source.find('scale').find('max').text)
+        factor = (scl_max - scl_min) / (rng_max - rng_min)
+        return source['shortcut'], _VALUE, *field_position(source), (factor, rng_min, scl_min)
+    if source.name == 'enum':
+        return source['shortcut'], _ENUM, *field_position(source), _compile_enum(source)
+    if source.name == 'status':
+        # the status bits are taken from packet.status, which is one byte
+        size = int(source['size'])
+        shift = 8 - int(source['offset']) - size
+        return source['shortcut'], _STATUS, 0, 0, shift, (1 << size) - 1, None
+    return None
+
+
+def _compile(data) -> tuple:
+    """ Compile the <data> section of a profile into a tuple of field descriptions """
+    if data is None:
+        return ()
+    fields = []
+    for source in data.contents:
+        if not source.name:
+            continue
+        try:
+            field = _compile_field(source)
+        except (AttributeError, KeyError, ValueError, ZeroDivisionError) as exception:
+            LOGGER.warning(f"Can't compile EEP field {source.get('shortcut')}: {repr(exception)}")
+            continue
+        if field is not None:
+            fields.append(field)
+    return tuple(fields)
+
+
+def _decode(fields: tuple, packet: Packet) -> dict[str, Field]:
+    data = packet.data
+    data_end = len(data) - 5  # sender and status follow the data bytes
+    result = {}
+    for shortcut, kind, first, last, shift, mask, extra in fields:
+        if kind == _STATUS:
+            raw_value = (packet.status >> shift) & mask
+            result[shortcut] = Field(raw_value, bool(raw_value))
+            continue
+        if last >= data_end:
+            continue
+        raw_value = _extract(data, first, last, shift, mask)
+        if kind == _VALUE:
+            factor, rng_min, scl_min = extra
+            result[shortcut] = Field(raw_value, factor * (raw_value - rng_min) + scl_min)
+        else:
+            table, rangeitems = extra
+            if rangeitems or isinstance(table, dict):
+                value = _lookup_enum(table, rangeitems, raw_value)
+            else:
+                value = table[raw_value]
+            if value is not None:
+                result[shortcut] = Field(raw_value, value)
+    return result
+
+
+class EEPDecoder:
+    """ Decoder for the telegrams of one EEP.
+
+        Calling the decoder with a packet returns a dict of shortcut -> Field,
+        with the same raw values and values Packet.parse_eep() would return.
+        The result is kept in the parse_cache() of the packet, so all
+        entities of a device share it. It must not be modified.
+    """
+
+    def __init__(self, eep: EEPInfo, direction=None):
+        self.eep = eep
+        self.direction = direction
+        self._fields = ()
+        self._command = None
+        self._commands: dict[int, tuple] = {}
+
+        profile = Packet.eep.telegrams.get(eep.rorg, {}).get(eep.func, {}).get(eep.func_type)
+        if profile is None:
+            LOGGER.warning(f"{repr(eep)} not found in EEP.xml")
+            return
+        command = profile.find('command', recursive=False)
+        if command is None:
+            self._fields = _compile(Packet.eep.find_profile(eep.rorg, eep.func, eep.func_type, direction))
+        else:
+            self._command = field_position(command)
+
+    def field_spec(self, shortcut: str) -> tuple | None:
+        """ (first byte, last byte, shift, mask) of a field of packet.data, and for values (factor, range min,
+            scale min), for decoding many telegrams at once. None for unknown fields and profiles with commands.
+        """
+        for field_shortcut, kind, first, last, shift, mask, extra in self._fields:
+            if field_shortcut == shortcut and kind != _STATUS:
+                return first, last, shift, mask, extra if kind == _VALUE else None
+        return None
+
+    def __call__(self, packet: Packet) -> dict[str, Field]:
+        if packet.rorg != self.eep.rorg:
+            return {}
+        if self._command is None:
+            command = None
+            fields = self._fields
+        else:
+            if self._command[1] >= len(packet.data) - 5:
+                return {}
+            command = _extract(packet.data, *self._command)
+            fields = self._commands.get(command)
+            if fields is None:
+                fields = self._commands[command] = _compile(
+                    Packet.eep.find_profile(self.eep.rorg, self.eep.func, self.eep.func_type, self.direction, command)
+                )
+
+        cache = parse_cache(packet)
+        key = (self.eep, self.direction, command)
+        decoded = cache.get(key)
+        if decoded is None:
+            decoded = cache[key] = _decode(fields, packet)
+        return decoded
+
+
+_DECODERS: dict[tuple[EEPInfo, Any], EEPDecoder] = {}
+
+
+def receive_direction(eep: EEPInfo) -> int | None:
+    """ Direction of the telegrams received from devices of the given EEP, None for profiles without directions """
+    return RECEIVE_DIRECTIONS.get((eep.rorg, eep.func, eep.func_type))
+
+
+def get_decoder(eep: EEPInfo, direction=None) -> EEPDecoder:
+    """ Return the decoder for the given EEP, compiling it on first use """
+    key = (eep, direction)
+    decoder = _DECODERS.get(key)
+    if decoder is None:
+        decoder = _DECODERS[key] = EEPDecoder(eep, direction)
+    return decoder
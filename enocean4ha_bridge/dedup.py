@@ -0,0 +1,95 @@
+""" Suppression of telegrams received more than once, e.g. via repeaters or several dongles. """
+
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple
+
+from enocean.protocol.constants import PACKET
+from enocean.protocol.packet import Packet, RadioPacket
+
+from .common import dev_id_to_int
+
+DEFAULT_WINDOW = 0.5
+DEFAULT_MAXSIZE = 4096
+
+# the lower nibble of the status holds the repeater count, which differs between the copies
+STATUS_MASK = 0xF0
+
+
+def fingerprint(packet: Packet) -> tuple:
+    """ Key which is equal for all received copies of a telegram.
+
+        For radio telegrams these are RORG, payload, sender and the status
+        without the repeater count, other packets are compared as a whole.
+    """
+    if packet.packet_type != PACKET.RADIO_ERP1:
+        return packet.packet_type, tuple(packet.data)
+    return tuple(packet.data[:-1]), packet.status & STATUS_MASK
+
+
+class LinkQuality(NamedTuple):
+    """ Signal strength and repeater count of the best received copy of a telegram """
+    dBm: int
+    repeater_count: int
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "time", "best", "copies")
+
+    def __init__(self, fingerprint: tuple, now: float, best: LinkQuality):
+        self.fingerprint = fingerprint
+        self.time = now
+        self.best = best
+        self.copies = 1
+
+
+class DuplicateFilter:
+    """ Recognizes copies of the latest telegram of each sender.
+
+        A packet is a duplicate, if sender, data and status (without the
+        repeater count) match the latest telegram of that sender, which was
+        received less than window seconds ago. The link quality of the copy
+        with the best signal is kept. At most maxsize senders are remembered,
+        the least recently heard ones are dropped first.
+    """
+
+    def __init__(self, window: float = DEFAULT_WINDOW, maxsize: int = DEFAULT_MAXSIZE,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.maxsize = maxsize
+        self._clock = clock
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_duplicate(self, packet: RadioPacket) -> bool:
+        """ Check a received packet and remember it, if it's a new telegram """
+        now = self._clock()
+        sender = dev_id_to_int(packet.sender)
+        key = fingerprint(packet)
+        entry = self._entries.get(sender)
+        if entry is not None and entry.fingerprint == key and now - entry.time <= self.window:
+            self.duplicates += 1
+            entry.copies += 1
+            if packet.dBm > entry.best.dBm:
+                entry.best = LinkQuality(packet.dBm, packet.repeater_count)
+            self._entries.move_to_end(sender)
+            return True
+
+        self._entries[sender] = _Entry(key, now, LinkQuality(packet.dBm, packet.repeater_count))
+        self._entries.move_to_end(sender)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return False
+
+    def link_quality(self, dev_id: list[int]) -> LinkQuality | None:
+        """ Link quality of the best received copy of the latest telegram of a device """
+        entry = self._entries.get(dev_id_to_int(dev_id))
+        return entry.best if entry is not None else None
+
+    def copies(self, dev_id: list[int]) -> int:
+        """ Number of received copies of the latest telegram of a device """
+        entry = self._entries.get(dev_id_to_int(dev_id))
+        return entry.copies if entry is not None else 0
@@ -0,0 +1,174 @@
+""" Discovery and validation of EnOcean dongles, cached and without blocking the event loop.
+
+    The serial ports are only scanned again, if the device directories
+    changed, i.e. a device was plugged in or removed. Candidates are
+    validated in parallel, by opening and closing the port. A port, which
+    couldn't be opened, e.g. as another process had it open, is probed
+    again after a few seconds.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from glob import glob
+from typing import Callable, Iterable, NamedTuple
+
+import serial
+from serial.tools.list_ports import comports
+
+LOGGER = logging.getLogger('enocean.ha.discovery')
+
+# (vendor id, product id) of the USB serial converters of EnOcean dongles
+USB_IDS = {
+    (0x0403, 0x6001): "FTDI FT232R (USB300, USB310)",
+    (0x0403, 0x6015): "FTDI FT-X (USB500)",
+}
+# UARTs of the Raspberry Pi, where an EnOcean Pi is attached
+PI_UARTS = ("/dev/serial0", "/dev/ttyAMA0")
+PI_MODEL = "/proc/device-tree/model"
+# directories, which change when a device is added or removed
+WATCHED_PATHS = ("/dev", "/dev/serial/by-id", "/sys/class/tty")
+BAUDRATE = 57600
+# seconds until a failed probe of a port is repeated
+DEFAULT_FAILURE_TTL = 5.0
+
+
+class DongleCandidate(NamedTuple):
+    # the stable /dev/serial/by-id path, if there is one, the device path otherwise
+    path: str
+    device: str
+    description: str
+
+
+def _usb_path(port) -> str:
+    pattern = f"/dev/serial/by-id/usb-{(port.manufacturer or '').replace(' ', '_')}_" \
+              f"{(port.product or '').replace(' ', '_')}_{port.serial_number}-*"
+    paths = glob(pattern)
+    if paths:
+        return paths[0]
+    by_id = [path for path in glob("/dev/serial/by-id/*") if os.path.realpath(path) == port.device]
+    return by_id[0] if by_id else port.device
+
+
+def _is_raspberry_pi() -> bool:
+    try:
+        with open(PI_MODEL, "rb") as file:
+            return b"Raspberry Pi" in file.read()
+    except OSError:
+        return False
+
+
+def scan_ports() -> list[DongleCandidate]:
+    """ Return the serial ports, which may be EnOcean dongles. Blocks, run it in an executor. """
+    candidates = []
+    for port in comports():
+        description = USB_IDS.get((port.vid, port.pid))
+        if description is None and "enocean" in f"{port.manufacturer} {port.product}".lower():
+            description = port.product or "EnOcean"
+        if description is not None:
+            candidates.append(DongleCandidate(_usb_path(port), port.device, description))
+    if _is_raspberry_pi():
+        for uart in PI_UARTS:
+            if os.path.exists(uart):
+                candidates.append(DongleCandidate(uart, os.path.realpath(uart), "EnOcean Pi"))
+                break
+    return candidates
+
+
+def probe_port(path: str) -> bool:
+    """ Return True, if the port can be opened. Blocks, run it in an executor. """
+    try:
+        serial.Serial(path, BAUDRATE, timeout=0).close()
+    except (serial.SerialException, OSError) as exception:
+        LOGGER.debug(f"Dongle path {path} is invalid: {exception}")
+        return False
+    return True
+
+
+def _watched_state(paths: Iterable[str] = WATCHED_PATHS) -> tuple:
+    state = []
+    for path in paths:
+        try:
+            state.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            state.append(None)
+    return tuple(state)
+
+
+class DongleDiscovery:
+    """ Caches the scanned candidates and the probed paths, until the watched directories change.
+
+        Failed probes are cached for failure_ttl seconds only.
+    """
+
+    def __init__(self, watched_paths: Iterable[str] = WATCHED_PATHS,
+                 scan: Callable[[], list[DongleCandidate]] = scan_ports, probe: Callable[[str], bool] = probe_port,
+                 failure_ttl: float = DEFAULT_FAILURE_TTL, clock: Callable[[], float] = time.monotonic):
+        self.watched_paths = tuple(watched_paths)
+        self._scan = scan
+        self._probe = probe
+        self.failure_ttl = failure_ttl
+        self._clock = clock
+        self._state: tuple | None = None
+        self._candidates: list[DongleCandidate] | None = None
+        # path -> the result of its probe and the time of the probe
+        self._valid: dict[str, tuple[bool, float]] = {}
+
+    def _check_state(self) -> None:
+        state = _watched_state(self.watched_paths)
+        if state != self._state:
+            self._state = state
+            self._candidates = None
+            self._valid.clear()
+
+    def invalidate(self) -> None:
+        self._state = None
+
+    def detect(self) -> list[DongleCandidate]:
+        """ The candidates, scanned again only after a change. Blocks on a change. """
+        self._check_state()
+        if self._candidates is None:
+            self._candidates = self._scan()
+        return list(self._candidates)
+
+    def _cached(self, path: str) -> bool | None:
+        """ The cached result of the probe of a path, None if it must be probed """
+        self._check_state()
+        entry = self._valid.get(path)
+        if entry is None:
+            return None
+        valid, probed = entry
+        if not valid and self._clock() - probed >= self.failure_ttl:
+            return None
+        return valid
+
+    def _store(self, path: str, valid: bool) -> bool:
+        self._valid[path] = (valid, self._clock())
+        return valid
+
+    def validate(self, path: str) -> bool:
+        """ Probe a path, the result is cached until a change. Blocks on a cache miss. """
+        valid = self._cached(path)
+        if valid is None:
+            valid = self._store(path, self._probe(path))
+        return valid
+
+    async def async_detect(self) -> list[DongleCandidate]:
+        """ The candidates, which could be opened. Scanning and probing run in executors, the probes in parallel. """
+        loop = asyncio.get_running_loop()
+        self._check_state()
+        if self._candidates is None:
+            self._candidates = await loop.run_in_executor(None, self._scan)
+        candidates = list(self._candidates)
+        valid = await asyncio.gather(*(self.async_validate(candidate.path) for candidate in candidates))
+        return [candidate for candidate, ok in zip(candidates, valid) if ok]
+
+    async def async_validate(self, path: str) -> bool:
+        valid = self._cached(path)
+        if valid is None:
+            valid = self._store(path, await asyncio.get_running_loop().run_in_executor(None, self._probe, path))
+        return valid
+
+
+DISCOVERY = DongleDiscovery()
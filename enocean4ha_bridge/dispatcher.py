@@ -0,0 +1,80 @@
+""" Signal dispatching of the gateway, with or without Home Assistant.
+
+    Within Home Assistant the signals go through its dispatcher, so the
+    integration can connect to them with async_dispatcher_connect(). Other
+    users of the bridge, e.g. tools and benchmarks, get a LocalDispatcher
+    and don't import homeassistant at all.
+"""
+
+import asyncio
+import logging
+from typing import Any, Callable, Protocol
+
+LOGGER = logging.getLogger('enocean.ha.dispatcher')
+
+
+class Dispatcher(Protocol):
+    def connect(self, signal: str, target: Callable[..., Any]) -> Callable[[], None]:
+        """ Connect a target to a signal, returns a function to disconnect it again """
+
+    def send(self, signal: str, *args: Any) -> None:
+        """ Call all targets connected to a signal """
+
+
+class LocalDispatcher:
+    """ In-process dispatcher, must be used in the event loop.
+
+        Targets are called directly, coroutine functions are scheduled as tasks.
+    """
+
+    def __init__(self):
+        self._targets: dict[str, list[Callable[..., Any]]] = {}
+
+    def connect(self, signal: str, target: Callable[..., Any]) -> Callable[[], None]:
+        self._targets.setdefault(signal, []).append(target)
+
+        def _disconnect():
+            targets = self._targets.get(signal)
+            if targets is not None and target in targets:
+                targets.remove(target)
+                if not targets:
+                    del self._targets[signal]
+
+        return _disconnect
+
+    def send(self, signal: str, *args: Any) -> None:
+        for target in tuple(self._targets.get(signal, ())):
+            try:
+                result = target(*args)
+                if asyncio.iscoroutine(result):
+                    asyncio.get_running_loop().create_task(result)
+            except Exception:  # one broken target must not stop the others
+                LOGGER.exception(f"Error in target of signal {signal}")
+
+
+class HomeAssistantDispatcher:
+    """ Uses the dispatcher of Home Assistant, which is only imported here """
+
+    def __init__(self, hass):
+        from homeassistant.helpers.dispatcher import async_dispatcher_connect, async_dispatcher_send
+        self._hass = hass
+        self._connect = async_dispatcher_connect
+        self._send = async_dispatcher_send
+
+    def connect(self, signal: str, target: Callable[..., Any]) -> Callable[[], None]:
+        return self._connect(self._hass, signal, target)
+
+    def send(self, signal: str, *args: Any) -> None:
+        self._send(self._hass, signal, *args)
+
+
+def is_home_assistant(hass) -> bool:
+    """ Return True, if hass is a HomeAssistant instance, without importing homeassistant """
+    return any(cls.__module__.startswith("homeassistant.") for cls in type(hass).__mro__)
+
+
+def create_dispatcher(hass) -> Dispatcher:
+    """ The dispatcher of Home Assistant for a HomeAssistant instance, a LocalDispatcher otherwise """
+    if is_home_assistant(hass):
+        return HomeAssistantDispatcher(hass)
+    return LocalDispatcher()
@@ -0,0 +1,144 @@
+""" Common base of the bridge entities and the result of parsing a packet. """
+
+from typing import Any, NamedTuple
+
+from enocean.protocol.packet import RadioPacket
+
+from .changes import ChangeDetector
+from .common import EEPInfo
+from .decoders import EEPDecoder, get_decoder, receive_direction
+from .snapshot import SnapshotEntry
+
+
+class _NoStatus:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "NO_STATUS"
+
+    def __bool__(self):
+        return False
+
+
+# status of a ParseResult, if the packet doesn't change the state of the entity
+NO_STATUS = _NoStatus()
+
+
+class ParseResult(NamedTuple):
+    """ Immutable result of parse(), as_dict() returns the form of parse_packet() """
+    dBm: int
+    repeater_count: int
+    status: Any = NO_STATUS
+    # further extra state attributes as (name, value) pairs
+    attributes: tuple[tuple[str, Any], ...] = ()
+    # (pushed, which, onoff) of the legacy button handling of the binary sensor
+    legacy: tuple | None = None
+    # False, if the change detector of the entity considers the status a repeat
+    changed: bool = True
+
+    @property
+    def has_status(self) -> bool:
+        return self.status is not NO_STATUS
+
+    def as_dict(self, link_quality: dict[str, Any] | None = None) -> dict[str, Any]:
+        """ The dict form, with the link quality summary instead of dBm and repeater_count, if given """
+        dBm, repeater_count, status, attributes, legacy, changed = self
+        if link_quality is None:
+            extra_state_attr = {"dBm": dBm, "repeater_count": repeater_count}
+        else:
+            extra_state_attr = dict(link_quality)
+        if attributes:
+            extra_state_attr.update(attributes)
+        if legacy is None:
+            result = {"extra_state_attr": extra_state_attr}
+        else:
+            result = {"legacy": legacy, "extra_state_attr": extra_state_attr}
+        if status is not NO_STATUS:
+            result["status"] = status
+        if not changed:
+            result["changed"] = False
+        return result
+
+
+class EO4HAEntity:
+    """ Base of the bridge entities.
+
+        The state lives in __slots__, the device id is kept as bytes. The
+        Home Assistant entity classes, which derive from these, keep their
+        _attr_ attributes in a __dict__, so the slots only save memory in
+        the bridge itself, as the benchmark measures it. dev_id still
+        accepts and returns a list like [0x01, 0x82, 0x5D, 0xAB], and
+        parse_packet() returns the dict form of parse() for Home Assistant.
+        With a change_detector, repeated readings come with "changed": False.
+        If summary_attributes of the link quality tracker of the gateway is
+        set, the summary replaces dBm and repeater_count of each telegram.
+        With a state_snapshot of the gateway, each status is kept there and
+        last_state() returns it after a restart.
+    """
+    __slots__ = ("gateway", "eep", "_dev_id", "_decoder", "change_detector")
+
+    eep: EEPInfo
+    change_detector: ChangeDetector
+    # name of the state in the snapshot, to tell apart entities of the same device and channel
+    STATE_NAME = ""
+
+    @property
+    def dev_id(self) -> list[int]:
+        return list(self._dev_id)
+
+    @dev_id.setter
+    def dev_id(self, dev_id: list[int] | bytes | int):
+        self._dev_id = dev_id.to_bytes(4, "big") if isinstance(dev_id, int) else bytes(dev_id)
+
+    @property
+    def dev_id_int(self) -> int:
+        return int.from_bytes(self._dev_id, "big")
+
+    @property
+    def decoder(self) -> EEPDecoder:
+        try:
+            return self._decoder
+        except AttributeError:
+            self._decoder = get_decoder(self.eep, receive_direction(self.eep))
+            return self._decoder
+
+    def parse(self, packet: RadioPacket) -> ParseResult | None:
+        return None
+
+    def detect_change(self, result: ParseResult) -> ParseResult:
+        """ Mark the result as unchanged, if the change detector suppresses its status """
+        detector = getattr(self, "change_detector", None)
+        if detector is None or result.status is NO_STATUS or detector.update(result.status):
+            return result
+        return result._replace(changed=False)
+
+    def as_state(self, result: ParseResult) -> dict[str, Any]:
+        """ The dict form of a result for Home Assistant """
+        tracker = getattr(self.gateway, "link_quality_tracker", None)
+        if tracker is None or not tracker.summary_attributes:
+            return result.as_dict()
+        summary = tracker.summary(self._dev_id)
+        return result.as_dict(summary.as_dict() if summary is not None else None)
+
+    def state_name(self) -> str:
+        return getattr(self, "shortcut", None) or self.STATE_NAME
+
+    def last_state(self) -> SnapshotEntry | None:
+        """ The last known status and its time from the state snapshot of the gateway, if any """
+        snapshot = getattr(self.gateway, "state_snapshot", None)
+        if snapshot is None:
+            return None
+        return snapshot.get(self._dev_id, self.eep, getattr(self, "channel", None), self.state_name())
+
+    def remember_state(self, result: ParseResult) -> None:
+        """ Keep the status of a result in the state snapshot of the gateway, if any """
+        snapshot = getattr(self.gateway, "state_snapshot", None)
+        if snapshot is not None and result.status is not NO_STATUS:
+            snapshot.update(self._dev_id, self.eep, getattr(self, "channel", None), result.status, self.state_name())
+
+    def parse_packet(self, packet: RadioPacket):
+        result = self.parse(packet)
+        if result is None:
+            return None
+        self.remember_state(result)
+        return self.as_state(self.detect_change(result))
@@ -0,0 +1,68 @@
+""" Generated ESP3 frames of received telegrams, for the benchmarks and the simulated dongle. """
+
+import random
+from typing import Any
+
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import Packet
+
+from .common import EEPInfo
+from .d2_01 import CMD_INTERFACE_RESPONSE
+
+# different telegrams per profile
+DEFAULT_VARIANTS = 64
+DEFAULT_SENDER = [0x01, 0x82, 0x5D, 0xAB]
+DEFAULT_DESTINATION = [0xFF, 0x80, 0x00, 0x00]
+
+# D2-01 CMD 0xD isn't described in EEP.xml, (CMD, IO) followed by AOT, DOT and EDT/EDTS
+_D2_01_INTERFACE_RESPONSE = [RORG.VLD, CMD_INTERFACE_RESPONSE, 0x00, 0x00, 0x12, 0x00, 0x34, 0x41]
+
+
+def _random_value(target, rnd: random.Random) -> Any:
+    if target.name == 'status':
+        return rnd.random() < 0.5
+    if target.name == 'value':
+        scl_min = float(target.find('scale').find('min').text)
+        scl_max = float(target.find('scale').find('max').text)
+        return rnd.uniform(min(scl_min, scl_max), max(scl_min, scl_max))
+    values = []
+    for item in target.find_all('item'):
+        try:
+            values.append(int(item['value']))
+        except (KeyError, ValueError):
+            pass
+    for rangeitem in target.find_all('rangeitem'):
+        values.extend(range(int(rangeitem['start']), int(rangeitem['end']) + 1))
+    return rnd.choice(values) if values else 0
+
+
+def generate_frames(eep: EEPInfo, count: int = DEFAULT_VARIANTS, command: int | None = None,
+                    fields: dict[str, Any] | None = None, seed: int = 0,
+                    sender: list[int] = DEFAULT_SENDER, destination: list[int] = DEFAULT_DESTINATION) -> list[bytes]:
+    """ Return count ESP3 frames of received telegrams with random field values of the profile.
+
+        fields are set to the given values instead.
+    """
+    rnd = random.Random(seed)
+    profile = Packet.eep.find_profile(eep.rorg, eep.func, eep.func_type, command=command)
+    frames = []
+    for _ in range(count):
+        if profile is None and eep.rorg == RORG.VLD and command == CMD_INTERFACE_RESPONSE:
+            data = list(_D2_01_INTERFACE_RESPONSE)
+            data[3:] = [rnd.randrange(256) for _ in data[3:]]
+            packet = Packet(PACKET.RADIO_ERP1, data + list(sender) + [0], [0x01] + list(destination) + [0xFF, 0x00])
+        else:
+            values = {
+                target['shortcut']: _random_value(target, rnd)
+                for target in profile.find_all(['value', 'enum', 'status'], recursive=False)
+                if target.get('shortcut') and target['shortcut'] != 'CMD'
+            }
+            values.update(fields or {})
+            packet = Packet.create(
+                PACKET.RADIO_ERP1, eep.rorg, eep.func, eep.func_type, command=command,
+                destination=list(destination), sender=list(sender), **values
+            )
+        # received telegrams carry the signal strength instead of the send power
+        packet.optional[5] = rnd.randrange(0x30, 0x60)
+        frames.append(bytes(packet.build()))
+    return frames
@@ -1,22 +1,40 @@
+import asyncio
 import concurrent.futures
 import os.path
-from glob import glob
 import logging
-import os.path
-from glob import glob
+from functools import partial
+from typing import Callable, Hashable
 
 from enocean.communicators import SerialCommunicator
-from enocean.protocol.packet import RadioPacket, Packet
+from enocean.protocol.constants import COMMON_COMMAND, PACKET, RETURN_CODE, RORG
+from enocean.protocol.packet import Packet, RadioPacket, ResponsePacket, UTETeachInPacket
 from enocean.utils import to_hex_string
-from homeassistant.helpers.dispatcher import async_dispatcher_connect, dispatcher_send
-from serial import SerialException
-from serial.tools.list_ports import comports
 from serial.tools.list_ports_linux import SysFS
 
-from .constants import SIGNAL_SEND_MESSAGE, SIGNAL_RECEIVE_MESSAGE
+from .acks import AckTracker, LatencyHistogram
+from .capture import PacketRecorder
+from .channel_groups import ALL_CHANNELS, CMD_SET_OUTPUT, ChannelCommandGrouper
+from .common import EEPInfo, dev_id_to_int
+from .communicator import BASE_ID_TIMEOUT, AsyncSerialCommunicator
+from .constants import SIGNAL_METER_STATISTICS, SIGNAL_SEND_MESSAGE, SIGNAL_RECEIVE_MESSAGE
+from .d2_01 import CMD_QUERY_STATUS
+from .dedup import DuplicateFilter, LinkQuality
+from .discovery import DISCOVERY
+from .link_quality import LinkQualitySummary, LinkQualityTracker
+from .dispatcher import Dispatcher, create_dispatcher
+from .metering import MeteringPipeline
+from .packet_templates import PacketTemplateCache
+from .polling import PollScheduler
+from .receive_queue import DEFAULT_QUEUE_SIZE, OverflowPolicy, ReceiveQueue
+from .send_queue import Priority, SendQueue
+from .snapshot import DEFAULT_MIN_INTERVAL, StateSnapshot
+from .trace import TRACER
 
 LOGGER = logging.getLogger('enocean.ha.gateway')
 
+# marker for send_command() to derive the coalesce key from destination, channel and command
+DEFAULT_COALESCE_KEY = object()
+
 
 class EnOceanGateway:
     """Representation of an EnOcean dongle.
@@ -25,12 +43,57 @@ class EnOceanGateway:
     creating devices if needed, and dispatching messages to platforms.
     """
 
-    def __init__(self, hass, serial_path: str , loglevel=logging.NOTSET):
-        """Initialize the EnOcean dongle."""
-        self._communicator = SerialCommunicator(port=serial_path, callback=self.callback, loglevel=loglevel)
+    def __init__(
+            self, hass, serial_path: str , loglevel=logging.NOTSET, use_asyncio: bool = False,
+            receive_queue_size: int = DEFAULT_QUEUE_SIZE, overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+            duplicate_filter: DuplicateFilter | None = None, dispatcher: Dispatcher | None = None,
+            link_quality_tracker: LinkQualityTracker | None = None
+    ):
+        """Initialize the EnOcean dongle.
+
+        With use_asyncio the dongle is read in the event loop by an
+        AsyncSerialCommunicator, instead of the thread of a SerialCommunicator.
+        Otherwise, the packets received by the thread are handed to the event
+        loop in batches, through a ReceiveQueue of receive_queue_size packets.
+        Copies of the same telegram are dropped by the duplicate_filter, which
+        can be shared between gateways. The link_quality_tracker collects the
+        link quality of every received copy.
+
+        hass only needs a loop attribute. For a HomeAssistant instance, the
+        signals are sent via its dispatcher, otherwise via a LocalDispatcher,
+        so the bridge runs without Home Assistant, too.
+        """
+        if use_asyncio:
+            self._communicator = AsyncSerialCommunicator(
+                port=serial_path, callback=self._async_callback, loglevel=loglevel
+            )
+        else:
+            self._communicator = SerialCommunicator(port=serial_path, callback=self.callback, loglevel=loglevel)
         LOGGER.setLevel(loglevel)
         self.hass = hass
+        self.dispatcher = dispatcher if dispatcher is not None else create_dispatcher(hass)
         self.dispatcher_disconnect_handle = None
+        self.receive_queue = ReceiveQueue(hass.loop, self.route_packet, receive_queue_size, overflow_policy)
+        self.duplicate_filter = duplicate_filter if duplicate_filter is not None else DuplicateFilter()
+        self.link_quality_tracker = (
+            link_quality_tracker if link_quality_tracker is not None else LinkQualityTracker()
+        )
+        self.send_queue = SendQueue(hass.loop, self._transmit)
+        self.ack_tracker = AckTracker(hass.loop)
+        # gets each received telegram once for consume(), a GatewayPool hands them to all its gateways
+        self.telegram_consumer: Callable[[RadioPacket], None] = self.consume
+        self.packet_templates = PacketTemplateCache()
+        self.channel_grouper = ChannelCommandGrouper(hass.loop, self._send_grouped_command)
+        self.poll_scheduler = PollScheduler(hass.loop, self._send_query)
+        # the meters added to it emit SIGNAL_METER_STATISTICS once per interval
+        self.metering = MeteringPipeline(partial(self.dispatcher.send, SIGNAL_METER_STATISTICS))
+        self._meter_flush_timer: asyncio.TimerHandle | None = None
+        self._recorder: PacketRecorder | None = None
+        # the entities keep their last states here, see load_snapshot()
+        self.state_snapshot: StateSnapshot | None = None
+        self._base_id_future: asyncio.Future | None = None
+        # sender id (as int) -> callbacks of the entities belonging to that sender
+        self._receivers: dict[int, list[Callable[[RadioPacket], None]]] = {}
 
         executor = concurrent.futures.ThreadPoolExecutor(1)
         future_file = executor.submit(SysFS, os.path.realpath(serial_path))
@@ -62,6 +125,13 @@ class EnOceanGateway:
     def serial_number(self) -> str:
         return self._serial_number
 
+    @property
+    def is_connected(self) -> bool:
+        """ True, while the communicator of the dongle is running """
+        if isinstance(self._communicator, AsyncSerialCommunicator):
+            return self._communicator.is_running
+        return self._communicator.is_alive()
+
     @property
     def teach_in(self):
         return self._communicator.teach_in
@@ -74,51 +144,90 @@ class EnOceanGateway:
     def detect(cls):
         """Return a list of candidate paths for USB ENOcean dongles.
 
-        This method is currently a bit simplistic, it may need to be
-        improved to support more configurations and OS.
+        The ports are scanned again only after a device was added or
+        removed, see DongleDiscovery. Blocks on a rescan.
         """
-        found_paths = []
+        return [candidate.path for candidate in DISCOVERY.detect()]
 
-        for dev in comports():
-            if dev.vid == 0x0403 and dev.pid == 0x6001:
-                pattern = f"/dev/serial/by-id/usb-{dev.manufacturer.replace(' ', '_')}_{dev.product.replace(' ', '_')}_{dev.serial_number}-*"
-                found_paths.extend(glob(pattern))
-        return found_paths
+    @classmethod
+    async def async_detect(cls) -> list[str]:
+        """Return the candidate paths, which could be opened, without blocking the event loop."""
+        return [candidate.path for candidate in await DISCOVERY.async_detect()]
 
     @classmethod
     def validate_path(cls, path: str):
         """Return True if the provided path points to a valid serial port, False otherwise."""
-        try:
-            # Creating the serial communicator will raise an exception
-            # if it cannot connect
-            SerialCommunicator(port=path)
-        except SerialException as exception:
-            LOGGER.warning(f"Dongle path {path} is invalid: {str(exception)}")
+        if not DISCOVERY.validate(path):
+            LOGGER.warning(f"Dongle path {path} is invalid")
+            return False
+        return True
+
+    @classmethod
+    async def async_validate_path(cls, path: str) -> bool:
+        """Like validate_path, but the port is probed in an executor."""
+        if not await DISCOVERY.async_validate(path):
+            LOGGER.warning(f"Dongle path {path} is invalid")
             return False
         return True
 
     async def load(self):
         """Finish the setup of the bridge and supported platforms."""
-        self._communicator.start()
-        self.dispatcher_disconnect_handle = async_dispatcher_connect(
-            self.hass, SIGNAL_SEND_MESSAGE, self._send_message_callback
-        )
-        # the following triggers a command to get the base id of the dongle
-        _ = self._communicator.base_id
-        LOGGER.debug(f"EnOcean gateway id: {to_hex_string(self._communicator.base_id)}")
+        if isinstance(self._communicator, AsyncSerialCommunicator):
+            await self._communicator.start()
+        else:
+            self._communicator.start()
+        self.dispatcher_disconnect_handle = self.dispatcher.connect(SIGNAL_SEND_MESSAGE, self._send_message_callback)
+        if isinstance(self._communicator, AsyncSerialCommunicator):
+            base_id = await self._communicator.get_base_id()
+        else:
+            base_id = await self._get_base_id()
+        LOGGER.debug(f"EnOcean gateway id: {to_hex_string(base_id) if base_id else None}")
 
+    async def _get_base_id(self) -> list[int] | None:
+        """ Ask the dongle of a SerialCommunicator for its base id, the answer is picked up by callback().
+
+            The base_id property of SerialCommunicator only looks into its
+            receive queue, which isn't used with a callback.
+        """
+        self._base_id_future = self.hass.loop.create_future()
+        self._communicator.send(Packet(PACKET.COMMON_COMMAND, data=[COMMON_COMMAND.CO_RD_IDBASE]))
+        try:
+            base_id = await asyncio.wait_for(asyncio.shield(self._base_id_future), BASE_ID_TIMEOUT)
+        except asyncio.TimeoutError:
+            LOGGER.warning("The dongle didn't answer the base id request")
+            return None
+        self._communicator.base_id = base_id
+        return base_id
+
+    def _base_id_received(self, base_id: list[int]):
+        if self._base_id_future is not None and not self._base_id_future.done():
+            self._base_id_future.set_result(base_id)
 
     def unload(self) -> bool:
         """Disconnect callbacks established at init time."""
         if self.dispatcher_disconnect_handle:
             self.dispatcher_disconnect_handle()
             self.dispatcher_disconnect_handle = None
+        self.channel_grouper.flush()
+        self.poll_scheduler.stop()
+        if self._meter_flush_timer is not None:
+            self._meter_flush_timer.cancel()
+            self._meter_flush_timer = None
+        self.send_queue.clear()
+        self.ack_tracker.cancel_all()
         self._communicator.stop()
+        self.stop_capture()
+        self.close_snapshot()
         return True
 
     def _send_message_callback(self, command):
         """Send a command through the EnOcean dongle."""
-        self._communicator.send(command)
+        self.send_queue.put(command)
+
+    def _transmit(self, packet):
+        """Hand a packet of the send_queue to the dongle."""
+        self._communicator.send(packet)
+        self.ack_tracker.transmitted(packet)
 
     def callback(self, packet):
         """Handle EnOcean device's callback.
@@ -127,20 +236,241 @@ class EnOceanGateway:
         is an incoming packet.
         """
 
+        if self._recorder is not None:
+            self._recorder.record(packet)
+        if isinstance(packet, RadioPacket):
+            self.receive_queue.put(packet)
+        elif (
+                isinstance(packet, ResponsePacket)
+                and packet.response == RETURN_CODE.OK
+                and len(packet.response_data) == 4
+                and self._base_id_future is not None
+        ):
+            self.hass.loop.call_soon_threadsafe(self._base_id_received, packet.response_data)
+
+    def _async_callback(self, packet):
+        """Handle an incoming packet of the AsyncSerialCommunicator, in the event loop."""
+        if self._recorder is not None:
+            self._recorder.record(packet)
         if isinstance(packet, RadioPacket):
-            dispatcher_send(self.hass, SIGNAL_RECEIVE_MESSAGE, packet)
-
-    def send_command(self, packet_type, rorg, rorg_func, rorg_type, command, **kwargs):
-        """Send a command via the EnOcean dongle."""
-        LOGGER.info(f"send_command {kwargs=}")
-        sender = kwargs.pop('sender', None) or self._communicator.base_id
-        packet = Packet.create(
-            packet_type=packet_type,
-            rorg=rorg,
-            rorg_func=rorg_func,
-            rorg_type=rorg_type,
-            command=command,
-            sender=sender,
-            **kwargs
+            self.route_packet(packet)
+
+    def route_packet(self, packet: RadioPacket):
+        """Deliver a received packet to the entities registered for its sender.
+
+        Packets from unknown senders and teach-in telegrams are broadcast
+        via SIGNAL_RECEIVE_MESSAGE, so the integration can still react to them.
+        Further copies of a telegram only update its link quality.
+        Must be run in the event loop.
+        """
+        duplicate = self.duplicate_filter.is_duplicate(packet)
+        self.link_quality_tracker.record(packet, duplicate)
+        if duplicate:
+            return
+        self.telegram_consumer(packet)
+        receivers = self._receivers.get(dev_id_to_int(packet.sender))
+        if receivers:
+            for receiver in tuple(receivers):
+                receiver(packet)
+            if not self._is_teach_in(packet):
+                return
+        self.dispatcher.send(SIGNAL_RECEIVE_MESSAGE, packet)
+
+    def consume(self, packet: RadioPacket):
+        """Hand a received telegram to the ack_tracker, the poll_scheduler and the metering.
+
+        route_packet() does this through telegram_consumer, once per telegram.
+        Must be run in the event loop.
+        """
+        self.ack_tracker.received(packet)
+        self.poll_scheduler.received(packet)
+        self.metering.received(packet)
+
+    def start_capture(self, path: str):
+        """Append all received frames to a capture file, see capture.ReplayDriver for the replay."""
+        self.stop_capture()
+        self._recorder = PacketRecorder(path)
+
+    def stop_capture(self):
+        """Stop recording the received frames and close the capture file."""
+        recorder, self._recorder = self._recorder, None
+        if recorder is not None:
+            recorder.close()
+
+    def load_snapshot(self, path: str, min_interval: float = DEFAULT_MIN_INTERVAL) -> StateSnapshot:
+        """Load the last states of the entities from a snapshot file, which keeps their states from now on."""
+        self.close_snapshot()
+        self.state_snapshot = StateSnapshot(path, min_interval)
+        return self.state_snapshot
+
+    def close_snapshot(self):
+        """Stop keeping the states of the entities and close the snapshot file."""
+        snapshot, self.state_snapshot = self.state_snapshot, None
+        if snapshot is not None:
+            snapshot.close()
+
+    @staticmethod
+    def _is_teach_in(packet: RadioPacket) -> bool:
+        if isinstance(packet, UTETeachInPacket):
+            return True
+        return packet.rorg in (RORG.BS1, RORG.BS4) and packet.learn
+
+    def link_quality(self, dev_id: list[int]) -> LinkQuality | None:
+        """Signal strength and repeater count of the best copy of the latest telegram of a device."""
+        return self.duplicate_filter.link_quality(dev_id)
+
+    def link_quality_summary(self, dev_id: list[int]) -> LinkQualitySummary | None:
+        """ Rolling link quality statistics of a device, refreshed at the refresh rate of the tracker """
+        return self.link_quality_tracker.summary(dev_id)
+
+    def register_receiver(self, dev_id: list[int], receiver: Callable[[RadioPacket], None]) -> Callable[[], None]:
+        """Register a callback for all packets sent by the device with the given id.
+
+        Returns a function to unregister the callback again, like
+        async_dispatcher_connect does. Must be run in the event loop.
+        """
+        self._receivers.setdefault(dev_id_to_int(dev_id), []).append(receiver)
+
+        def _unregister():
+            self.unregister_receiver(dev_id, receiver)
+
+        return _unregister
+
+    def unregister_receiver(self, dev_id: list[int], receiver: Callable[[RadioPacket], None]):
+        """Remove a callback registered with register_receiver."""
+        key = dev_id_to_int(dev_id)
+        receivers = self._receivers.get(key)
+        if receivers is None or receiver not in receivers:
+            return
+        receivers.remove(receiver)
+        if not receivers:
+            del self._receivers[key]
+
+    def set_device_channels(self, dev_id: list[int], channels):
+        """Set the output channels of a D2-01 actuator.
+
+        Set output commands for several channels of such a device are merged
+        into the fewest telegrams, see ChannelCommandGrouper.
+        Must be run in the event loop.
+        """
+        self.channel_grouper.set_device_channels(dev_id, channels)
+
+    def poll_device(self, dev_id: list[int], eep: EEPInfo, channels=None, commands=(CMD_QUERY_STATUS,)):
+        """Poll the status of a D2-01 actuator regularly, see PollScheduler.
+
+        Without channels, the channels of set_device_channels() are polled.
+        Must be run in the event loop.
+        """
+        if channels is None:
+            channels = self.channel_grouper.device_channels(dev_id)
+        self.poll_scheduler.add(dev_id, eep.func_type, channels, commands)
+
+    def add_meter(self, dev_id: list[int]):
+        """Aggregate the readings of an A5-12-01 electricity meter, see MeteringPipeline.
+
+        The statistics of each interval are sent as SIGNAL_METER_STATISTICS,
+        at the end of the interval at the latest. Must be run in the event loop.
+        """
+        self.metering.add_meter(dev_id)
+        if self._meter_flush_timer is None:
+            self._meter_flush_timer = self.hass.loop.call_later(self.metering.next_flush(), self._flush_meters)
+
+    def _flush_meters(self):
+        """Emit the statistics of the finished intervals, also of the meters which sent nothing since."""
+        self.metering.flush()
+        self._meter_flush_timer = self.hass.loop.call_later(self.metering.next_flush(), self._flush_meters)
+
+    def send_command(
+            self, packet_type, rorg, rorg_func, rorg_type, command,
+            priority: Priority = Priority.USER, coalesce_key: Hashable | None = DEFAULT_COALESCE_KEY, **kwargs
+    ) -> concurrent.futures.Future | None:
+        """Send a command via the EnOcean dongle.
+
+        The packet is queued in the send_queue. A still pending packet with the
+        same coalesce_key is replaced. By default, the key consists of
+        destination, channel (IO) and command; None disables coalescing.
+        Set output commands for the channels of D2-01 actuators with known
+        channels are collected by the channel_grouper first.
+
+        For commands, which are answered by a status telegram, a future is
+        returned, which gets a CommandResult. Unconfirmed commands are sent
+        again by the ack_tracker. In the event loop, the future can be
+        awaited via asyncio.wrap_future().
+        May be called from any thread.
+        """
+        if TRACER.active:
+            TRACER.trace(
+                "send_command", kwargs.get('destination'), (rorg, rorg_func, rorg_type),
+                command=command, fields=dict(kwargs)
+            )
+        kwargs['sender'] = kwargs.pop('sender', None) or self._communicator.base_id
+        command = dict(
+            packet_type=packet_type, rorg=rorg, rorg_func=rorg_func, rorg_type=rorg_type, command=command, **kwargs
         )
-        dispatcher_send(self.hass, SIGNAL_SEND_MESSAGE, packet)
\ No newline at end of file
+        future = None
+        if self.ack_tracker.expects_ack(rorg, rorg_func, command['command'], kwargs):
+            future = concurrent.futures.Future()
+        self.hass.loop.call_soon_threadsafe(self._queue_command, command, priority, coalesce_key, future)
+        return future
+
+    def _queue_command(self, command: dict, priority: Priority, coalesce_key: Hashable | None,
+                       future: concurrent.futures.Future | None = None):
+        """Queue a command of send_command(), in the event loop."""
+        if future is not None:
+            self.ack_tracker.track(
+                command['destination'], command['IO'], future,
+                partial(self._queue_command, command, priority, coalesce_key)
+            )
+        if coalesce_key is DEFAULT_COALESCE_KEY and self.channel_grouper.accepts(
+                command['rorg'], command['rorg_func'], command['command'], command
+        ):
+            self.channel_grouper.add(priority=priority, **command)
+            return
+        packet, coalesce_key = self._create_packet(coalesce_key, **command)
+        self._put_packet(packet, coalesce_key, priority, command)
+
+    def _send_query(self, priority: Priority, **command):
+        """Queue a query of the poll_scheduler, in the event loop. Raises, if the packet can't be created."""
+        command['sender'] = command.pop('sender', None) or self._communicator.base_id
+        packet, coalesce_key = self._create_packet(DEFAULT_COALESCE_KEY, **command)
+        self.send_queue.put(packet, coalesce_key, priority)
+
+    def _send_grouped_command(self, priority: Priority, **command):
+        """Queue a command of the channel_grouper, in the event loop."""
+        packet, coalesce_key = self._create_packet(DEFAULT_COALESCE_KEY, **command)
+        self._put_packet(packet, coalesce_key, priority, command)
+
+    def _put_packet(self, packet: Packet, coalesce_key: Hashable | None, priority: Priority, command: dict):
+        """Queue a packet of a command, so the channels of a D2-01 actuator get the latest output value.
+
+        A coalesced packet keeps the place of the older one. A set output
+        command for all channels therefore drops the pending set output
+        commands for single channels of the device, which would otherwise be
+        sent before it, but set the channels to older values.
+        """
+        if (
+                command['rorg'] == RORG.VLD and command['rorg_func'] == 0x01 and command['command'] == CMD_SET_OUTPUT
+                and command.get('IO') == ALL_CHANNELS
+        ):
+            destination = tuple(command.get('destination') or ())
+            for channel in range(ALL_CHANNELS):
+                self.send_queue.discard((destination, channel, CMD_SET_OUTPUT))
+        self.send_queue.put(packet, coalesce_key, priority)
+
+    def _create_packet(self, coalesce_key: Hashable | None, **command):
+        packet = self.packet_templates.create(**command)
+        if coalesce_key is DEFAULT_COALESCE_KEY:
+            coalesce_key = (tuple(command.get('destination') or ()), command.get('IO'), command['command'])
+        return packet, coalesce_key
+
+    def confirm_command(self, dev_id: list[int], channel: int, value: int | None = None):
+        """Resolve the pending command of a channel, on the status telegram of an actuator.
+
+        route_packet() does this for the received status telegrams.
+        Must be run in the event loop.
+        """
+        self.ack_tracker.confirm(dev_id, channel, value)
+
+    def latency_histogram(self, dev_id: list[int]) -> LatencyHistogram | None:
+        """Round trip times of the confirmed commands of a device."""
+        return self.ack_tracker.latency_histogram(dev_id)
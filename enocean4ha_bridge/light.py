@@ -1,26 +1,24 @@
-import logging
 import math
 from typing import Any
 
 from enocean.protocol.constants import PACKET, RORG
-from enocean.utils import to_hex_string
-from homeassistant.components.light import ATTR_BRIGHTNESS
-from homeassistant.const import CONF_BRIGHTNESS, CONF_STATE
+from enocean.protocol.packet import RadioPacket
 
 from . import EnOceanGateway
-from .common import EEPInfo
+from .constants import ATTR_BRIGHTNESS, CONF_BRIGHTNESS, CONF_STATE
+from .entity import NO_STATUS, EO4HAEntity, ParseResult
+from .trace import TRACER
 
 
-class EO4HALight:
-    eep: EEPInfo
-    dev_id: list[int]
+class EO4HALight(EO4HAEntity):
+    __slots__ = ("channel",)
+
     channel: int
     gateway: EnOceanGateway
     _attr_brightness: int | None
-    _logger: logging.Logger
 
     def turn_on(self, **kwargs: Any) -> None:
-        brightness = kwargs.get(ATTR_BRIGHTNESS, self._attr_brightness)
+        brightness = kwargs.get(ATTR_BRIGHTNESS, getattr(self, "_attr_brightness", None))
 
         if brightness is None:
             brightness = 255
@@ -57,38 +55,34 @@ class EO4HALight:
             OV=0x00,  # Output value. 0x00 = OFF
         )
 
-    def parse_packet(self, packet):
-        self._logger.debug(f"light, {repr(self.eep)}, Device-ID: {to_hex_string(self.dev_id)}")
+    def parse(self, packet: RadioPacket) -> ParseResult | None:
+        if TRACER.active:
+            TRACER.trace("parse", self.dev_id, self.eep, entity="light")
         match packet.rorg:
             case RORG.VLD:
                 return self._parse_d2_packet(packet)
 
     def _parse_d2_packet(self, packet):
         func = self.eep.func
-        func_type = self.eep.func_type
-        result = {
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
+        status = NO_STATUS
+        attributes = ()
 
         if func == 0x01:
-            packet.parse_eep(rorg_func=self.eep.func, rorg_type=self.eep.func_type, command=packet.data[1])
-            if packet.parsed["CMD"]["raw_value"] == 4:
-                channel = packet.parsed["IO"]["raw_value"]
-                output = packet.parsed["OV"]["raw_value"]
+            parsed = self.decoder(packet)
+            if parsed["CMD"].raw_value == 4:
+                channel = parsed["IO"].raw_value
+                output = parsed["OV"].raw_value
                 if channel == self.channel:
-                    result["extra_state_attr"].update({
-                        "error_level": packet.parsed["EL"]["value"],
-                        "over_current": packet.parsed["OC"]["value"],
-                        "power_failure": packet.parsed["PF"]["value"],
-                        "power_failure_detection": packet.parsed["PFD"]["value"],
-                    })
-                    result["status"] = {
+                    attributes = (
+                        ("error_level", parsed["EL"].value),
+                        ("over_current", parsed["OC"].value),
+                        ("power_failure", parsed["PF"].value),
+                        ("power_failure_detection", parsed["PFD"].value),
+                    )
+                    status = {
                         CONF_BRIGHTNESS: math.floor(output / 100.0 * 256.0),
                         CONF_STATE: bool(output > 0)
                     }
 
-        return result
+        return ParseResult(packet.dBm, packet.repeater_count, status, attributes)
 
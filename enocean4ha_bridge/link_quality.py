@@ -0,0 +1,148 @@
+""" Rolling link quality statistics per sender.
+
+    The gateway records the signal strength and the repeater count of every
+    received copy of a telegram in fixed-size ring buffers. Entities read a
+    summary, which is refreshed at most every refresh_interval seconds, so
+    the state attributes don't change with every telegram.
+"""
+
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple
+
+from enocean.protocol.packet import RadioPacket
+
+from .common import dev_id_to_int
+
+# received copies kept per sender
+DEFAULT_SAMPLES = 64
+# latest copies averaged by recent_dBm()
+DEFAULT_RECENT_SAMPLES = 8
+DEFAULT_REFRESH_INTERVAL = 300.0
+DEFAULT_MAXSIZE = 4096
+
+
+class LinkQualitySummary(NamedTuple):
+    # received copies in the buffer
+    samples: int
+    min_dBm: int
+    avg_dBm: float
+    max_dBm: int
+    # repeater count -> number of copies
+    repeater_histogram: dict[int, int]
+    # time of the latest copy
+    last_seen: float
+    # telegrams (without duplicate copies) per hour within the buffer
+    telegrams_per_hour: float
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "min_dBm": self.min_dBm,
+            "avg_dBm": round(self.avg_dBm, 1),
+            "max_dBm": self.max_dBm,
+            "repeater_histogram": self.repeater_histogram,
+            "last_seen": self.last_seen,
+            "telegrams_per_hour": round(self.telegrams_per_hour, 1),
+        }
+
+
+class _DeviceLink:
+    __slots__ = ("dBm", "repeaters", "times", "duplicates", "index", "count", "summary", "summary_time")
+
+    def __init__(self, size: int):
+        self.dBm = array("h", bytes(2 * size))
+        self.repeaters = array("B", bytes(size))
+        self.times = array("d", bytes(8 * size))
+        self.duplicates = array("B", bytes(size))
+        self.index = 0
+        self.count = 0
+        self.summary: LinkQualitySummary | None = None
+        self.summary_time = 0.0
+
+    def add(self, now: float, dBm: int, repeater_count: int, duplicate: bool) -> None:
+        index = self.index
+        self.dBm[index] = dBm
+        self.repeaters[index] = repeater_count
+        self.times[index] = now
+        self.duplicates[index] = duplicate
+        self.index = (index + 1) % len(self.dBm)
+        if self.count < len(self.dBm):
+            self.count += 1
+
+    def summarize(self) -> LinkQualitySummary:
+        count = self.count
+        size = len(self.dBm)
+        # the oldest sample is at index, once the buffer is full
+        indices = range(count) if count < size else [(self.index + offset) % size for offset in range(size)]
+        dBm = [self.dBm[index] for index in indices]
+        histogram: dict[int, int] = {}
+        for index in indices:
+            histogram[self.repeaters[index]] = histogram.get(self.repeaters[index], 0) + 1
+        telegrams = [self.times[index] for index in indices if not self.duplicates[index]]
+        span = telegrams[-1] - telegrams[0] if len(telegrams) > 1 else 0.0
+        return LinkQualitySummary(
+            count, min(dBm), sum(dBm) / count, max(dBm), dict(sorted(histogram.items())),
+            self.times[indices[-1]], (len(telegrams) - 1) * 3600.0 / span if span > 0 else 0.0
+        )
+
+
+class LinkQualityTracker:
+    """ Ring buffers of the link quality of the latest copies of each sender.
+
+        At most maxsize senders are tracked, the least recently heard ones
+        are dropped first. With summary_attributes the entities report the
+        summary instead of dBm and repeater count of each telegram.
+    """
+
+    def __init__(self, size: int = DEFAULT_SAMPLES, refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+                 maxsize: int = DEFAULT_MAXSIZE, clock: Callable[[], float] = time.time):
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.maxsize = maxsize
+        self._clock = clock
+        self._devices: OrderedDict[int, _DeviceLink] = OrderedDict()
+        self.summary_attributes = False
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def record(self, packet: RadioPacket, duplicate: bool = False) -> None:
+        """ Add a received copy, duplicates don't count as telegrams for the rate """
+        sender = dev_id_to_int(packet.sender)
+        device = self._devices.get(sender)
+        if device is None:
+            device = self._devices[sender] = _DeviceLink(self.size)
+            if len(self._devices) > self.maxsize:
+                self._devices.popitem(last=False)
+        else:
+            self._devices.move_to_end(sender)
+        device.add(self._clock(), packet.dBm, packet.repeater_count, duplicate)
+
+    def stats(self, dev_id: list[int] | bytes) -> LinkQualitySummary | None:
+        """ Current summary of a device, None if nothing was received from it """
+        device = self._devices.get(dev_id_to_int(dev_id))
+        return device.summarize() if device is not None else None
+
+    def recent_dBm(self, dev_id: list[int] | bytes, samples: int = DEFAULT_RECENT_SAMPLES) -> float | None:
+        """ Mean dBm of the latest received copies of a device, None if nothing was received from it """
+        device = self._devices.get(dev_id_to_int(dev_id))
+        if device is None:
+            return None
+        count = min(samples, device.count)
+        size = len(device.dBm)
+        return sum(device.dBm[(device.index - offset) % size] for offset in range(1, count + 1)) / count
+
+    def summary(self, dev_id: list[int] | bytes) -> LinkQualitySummary | None:
+        """ Summary of a device, which is updated at most every refresh_interval seconds """
+        device = self._devices.get(dev_id_to_int(dev_id))
+        if device is None:
+            return None
+        now = self._clock()
+        if device.summary is None or now - device.summary_time >= self.refresh_interval:
+            device.summary = device.summarize()
+            device.summary_time = now
+        return device.summary
+
+    def forget(self, dev_id: list[int] | bytes) -> None:
+        self._devices.pop(dev_id_to_int(dev_id), None)
@@ -0,0 +1,266 @@
+""" Construction of all entities of a site from a device manifest.
+
+    A manifest is a JSON or YAML file with a list of devices, optionally
+    under the key "devices":
+
+        devices:
+          - id: "01:94:E3:B9"
+            eep: "D2-01-12"
+            poll: true
+            entities:
+              - {platform: switch, channel: 0}
+              - {platform: number, channel: 0, shortcut: AOT}
+          - id: "FE:F1:2A:07"
+            eep: "F6-02-01"
+            entities:
+              - {platform: binary_sensor, button: A0}
+          - id: "05:11:22:33"
+            eep: "A5-04-01"
+            entities:
+              - {platform: sensor, kind: temperature}
+              - {platform: sensor, kind: humidity}
+
+    All EEPs are checked once, before any entity is created, and each EEP
+    gets one EEPInfo and one decoder, which all its entities share.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Callable, Iterable, NamedTuple
+
+from enocean.protocol.constants import RORG
+from enocean.protocol.packet import RadioPacket
+from enocean.utils import to_hex_string
+
+from .binary_sensor import EO4HABinarySensor
+from .common import EEPInfo, EO4HAEEPNotSupportedError, EO4HAError
+from .decoders import get_decoder, is_supported, receive_direction
+from .entity import EO4HAEntity
+from .light import EO4HALight
+from .number import EO4HANumber
+from .select import EO4HASelect
+from .sensor import (
+    EO4HAHumiditySensor,
+    EO4HAIlluminanceSensor,
+    EO4HAPowerSensor,
+    EO4HAShortcutSensor,
+    EO4HATemperatureSensor,
+    EO4HAWindowHandleSensor
+)
+from .switch import EO4HASwitch
+from .valve import EO4HAValve
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+LOGGER = logging.getLogger('enocean.ha.manifest')
+
+# platform of an entity -> class, sensors are chosen by their kind
+PLATFORMS: dict[str, type] = {
+    "binary_sensor": EO4HABinarySensor,
+    "light": EO4HALight,
+    "number": EO4HANumber,
+    "select": EO4HASelect,
+    "switch": EO4HASwitch,
+    "valve": EO4HAValve,
+}
+SENSOR_KINDS: dict[str, type] = {
+    "humidity": EO4HAHumiditySensor,
+    "illuminance": EO4HAIlluminanceSensor,
+    "power": EO4HAPowerSensor,
+    "shortcut": EO4HAShortcutSensor,
+    "temperature": EO4HATemperatureSensor,
+    "window_handle": EO4HAWindowHandleSensor,
+}
+# platforms of the output channels of D2-01 actuators
+_CHANNEL_PLATFORMS = frozenset({"light", "number", "select", "switch", "valve"})
+# EEP of the electricity meters, whose readings are aggregated by the MeteringPipeline of the gateway
+METER_EEP = EEPInfo(RORG.BS4, 0x12, 0x01)
+# platform or sensor kind -> the shortcuts its entities can have, they need one of them
+_SHORTCUTS: dict[str, frozenset[str] | None] = {
+    "number": frozenset({"AOT", "DOT"}),
+    "select": frozenset({"EDT", "EDTS"}),
+    # any field of the EEP
+    "shortcut": None,
+}
+
+# returns the callback, which is registered with the gateway for the packets of an entity
+ReceiverFactory = Callable[[EO4HAEntity], Callable[[RadioPacket], None]]
+
+
+class DeviceEntry(NamedTuple):
+    dev_id: list[int]
+    eep: EEPInfo
+    # the entity descriptions of the manifest, each with at least "platform"
+    entities: tuple[dict[str, Any], ...]
+    poll: bool = False
+
+
+def _parse_dev_id(value: Any) -> list[int]:
+    if isinstance(value, int):
+        return list(value.to_bytes(4, "big"))
+    if isinstance(value, str):
+        dev_id = list(bytes.fromhex(value.replace(":", "").replace("-", "")))
+    else:
+        dev_id = [int(byte) for byte in value]
+    if len(dev_id) != 4 or not all(0 <= byte <= 0xFF for byte in dev_id):
+        raise ValueError(f"{value!r} is no device id")
+    return dev_id
+
+
+def _parse_eep(value: Any) -> tuple[int, int, int]:
+    if isinstance(value, str):
+        parts = [int(part, 16) for part in value.replace(":", "-").split("-")]
+    else:
+        parts = [int(part) for part in value]
+    if len(parts) != 3:
+        raise ValueError(f"{value!r} is no EEP")
+    return parts[0], parts[1], parts[2]
+
+
+def read_manifest(path: str) -> list[dict[str, Any]]:
+    """ Read the device list of a JSON or YAML manifest file """
+    with open(path, encoding="utf-8") as file:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            if yaml is None:
+                raise EO4HAError("Reading a YAML manifest needs PyYAML")
+            data = yaml.safe_load(file)
+        else:
+            data = json.load(file)
+    if isinstance(data, dict):
+        data = data.get("devices")
+    if not isinstance(data, list):
+        raise EO4HAError(f"{path} contains no device list")
+    return data
+
+
+def _check_entity(description: dict[str, Any], eep: tuple[int, int, int]) -> None:
+    """ Raise ValueError, if an entity description lacks a key its entity needs """
+    platform = description["platform"]
+    if platform == "sensor":
+        name = description.get("kind", "shortcut")
+        if name not in SENSOR_KINDS:
+            raise ValueError(f"unknown sensor kind {description.get('kind')!r}")
+    elif platform in PLATFORMS:
+        name = platform
+    else:
+        raise ValueError(f"unknown platform {platform!r}")
+    if platform in _CHANNEL_PLATFORMS and eep[:2] == (RORG.VLD, 0x01):
+        if "channel" not in description:
+            raise ValueError(f"{platform} of a D2-01 actuator without channel")
+        int(description["channel"])
+    if name in _SHORTCUTS:
+        shortcuts = _SHORTCUTS[name]
+        shortcut = description.get("shortcut")
+        if not shortcut or (shortcuts is not None and shortcut not in shortcuts):
+            raise ValueError(f"{name} needs a shortcut of {sorted(shortcuts or ())}, not {shortcut!r}")
+    if platform == "binary_sensor":
+        EO4HABinarySensor.button_index(description.get("button"))
+
+
+def parse_manifest(devices: Iterable[dict[str, Any]]) -> list[DeviceEntry]:
+    """ Validate a device list. Raises EO4HAEEPNotSupportedError with all unsupported EEPs. """
+    eeps: dict[tuple[int, int, int], EEPInfo] = {}
+    unsupported: list[EEPInfo] = []
+    entries = []
+    for index, device in enumerate(devices):
+        try:
+            dev_id = _parse_dev_id(device["id"])
+            key = _parse_eep(device["eep"])
+            entities = tuple(device.get("entities", ()))
+            for entity in entities:
+                _check_entity(entity, key)
+        except (KeyError, TypeError, ValueError) as exception:
+            raise EO4HAError(f"Invalid device {index} in the manifest: {exception!r}") from exception
+        eep = eeps.get(key)
+        if eep is None:
+            eep = eeps[key] = EEPInfo(*key)
+            if not is_supported(eep):
+                unsupported.append(eep)
+        entries.append(DeviceEntry(dev_id, eep, entities, bool(device.get("poll", False))))
+    if unsupported:
+        raise EO4HAEEPNotSupportedError(*unsupported)
+    return entries
+
+
+def _create(cls: type, gateway, dev_id: bytes, eep: EEPInfo, decoder, description: dict[str, Any]) -> EO4HAEntity:
+    """ Create an entity without its __init__, like the integration sets it up.
+
+        classes may replace the bridge classes by ones with other
+        constructors, so all attributes of the bridge entities are set here,
+        from the description checked by parse_manifest().
+    """
+    entity = cls.__new__(cls)
+    entity.gateway = gateway
+    entity.dev_id = dev_id
+    entity.eep = eep
+    entity._decoder = decoder
+    if isinstance(entity, EO4HABinarySensor):
+        entity.button = EO4HABinarySensor.button_index(description.get("button"))
+    if description["platform"] in _CHANNEL_PLATFORMS:
+        channel = description.get("channel")
+        entity.channel = None if channel is None else int(channel)
+    if isinstance(entity, (EO4HANumber, EO4HASelect, EO4HAShortcutSensor)):
+        entity.shortcut = description.get("shortcut")
+    if isinstance(entity, EO4HASelect):
+        entity.select_options_dict = dict(description.get("options", {}))
+    return entity
+
+
+def build_entities(
+        gateway, devices: Iterable[DeviceEntry], receiver: ReceiverFactory | None = None,
+        classes: dict[str, type] | None = None, loglevel: int = logging.NOTSET
+) -> list[EO4HAEntity]:
+    """ Create the entities of all devices of parse_manifest() in one pass.
+
+        classes replaces the classes of PLATFORMS and SENSOR_KINDS, e.g. with
+        the Home Assistant entities, by platform or sensor kind. If receiver
+        is given, receiver(entity) is registered with the gateway for the
+        packets of each entity. The channels of D2-01 actuators are set with
+        set_device_channels(), and devices with poll are polled. The
+        readings of A5-12-01 meters are aggregated by the metering of the
+        gateway.
+        Must be run in the event loop.
+    """
+    platforms = {**PLATFORMS, **SENSOR_KINDS, **(classes or {})}
+    if loglevel != logging.NOTSET:
+        logging.getLogger('enocean.ha').setLevel(loglevel)
+    entities = []
+    for device in devices:
+        decoder = get_decoder(device.eep, receive_direction(device.eep))
+        dev_id = bytes(device.dev_id)
+        channels = set()
+        for description in device.entities:
+            platform = description["platform"]
+            cls = platforms[description.get("kind", "shortcut") if platform == "sensor" else platform]
+            try:
+                entity = _create(cls, gateway, dev_id, device.eep, decoder, description)
+            except (AttributeError, TypeError, ValueError) as exception:
+                raise EO4HAError(
+                    f"Invalid {platform} entity of {to_hex_string(device.dev_id)} in the manifest: {exception!r}"
+                ) from exception
+            entities.append(entity)
+            if receiver is not None:
+                gateway.register_receiver(device.dev_id, receiver(entity))
+            if platform in _CHANNEL_PLATFORMS and "channel" in description:
+                channels.add(entity.channel)
+        if device.eep == METER_EEP:
+            gateway.add_meter(device.dev_id)
+        if device.eep.rorg == RORG.VLD and device.eep.func == 0x01:
+            if channels:
+                gateway.set_device_channels(device.dev_id, channels)
+            if device.poll:
+                gateway.poll_device(device.dev_id, device.eep, channels)
+    LOGGER.debug(f"Created {len(entities)} entities")
+    return entities
+
+
+def load_manifest(
+        gateway, path: str, receiver: ReceiverFactory | None = None,
+        classes: dict[str, type] | None = None, loglevel: int = logging.NOTSET
+) -> list[EO4HAEntity]:
+    """ Read a manifest file and create its entities, see build_entities() """
+    return build_entities(gateway, parse_manifest(read_manifest(path)), receiver, classes, loglevel)
@@ -0,0 +1,224 @@
+""" Streaming processing of the readings of A5-12-01 electricity meters.
+
+    Each tariff (TI) of a meter is a channel. Cumulative readings (DT 0)
+    are counters in kWh, current readings (DT 1) are power in W. Channels
+    without counter integrate the power over time into energy. The readings
+    are aggregated into fixed intervals, and only the statistics of a
+    finished interval are emitted, so a recorder gets one entry per interval
+    instead of every telegram. The statistics of the latest intervals are
+    kept in a ring of fixed size per channel.
+"""
+
+import logging
+import time
+from collections import deque
+from typing import Callable, NamedTuple
+
+from enocean.protocol.constants import RORG
+from enocean.protocol.packet import RadioPacket
+
+from .common import dev_id_to_int
+
+LOGGER = logging.getLogger('enocean.ha.metering')
+
+DEFAULT_INTERVAL = 300.0
+# finished intervals kept per channel
+DEFAULT_WINDOWS = 12
+# power readings further apart are not integrated, the meter was probably offline
+DEFAULT_MAX_GAP = 900.0
+_WS_PER_KWH = 3_600_000.0
+
+
+class MeterReading(NamedTuple):
+    tariff: int
+    # True for a counter in kWh, False for the current power in W
+    cumulative: bool
+    value: float
+
+
+class MeterStatistics(NamedTuple):
+    tariff: int
+    start: float
+    end: float
+    # energy consumed within the interval
+    energy_kwh: float
+    # energy since the first reading, at the end of the interval
+    total_kwh: float
+    # None without power readings in the interval
+    mean_w: float | None
+    min_w: float | None
+    max_w: float | None
+    samples: int
+
+    def as_dict(self) -> dict:
+        return self._asdict()
+
+
+def decode_meter(packet: RadioPacket) -> MeterReading | None:
+    """ Decode an A5-12-01 data telegram, None for a teach-in telegram """
+    data = packet.data
+    if packet.rorg != RORG.BS4 or len(data) < 5 or not data[4] & 0x08:
+        return None
+    db0 = data[4]
+    value = (data[1] << 16 | data[2] << 8 | data[3]) / 10 ** (db0 & 0x03)
+    return MeterReading(db0 >> 4, not db0 & 0x04, value)
+
+
+class _MeterChannel:
+    __slots__ = (
+        "counter", "energy", "power", "power_time", "start", "start_energy", "samples", "power_sum", "power_min",
+        "power_max", "windows",
+    )
+
+    def __init__(self, windows: int):
+        # latest counter reading, None if the meter sent none yet
+        self.counter: float | None = None
+        self.energy = 0.0
+        self.power: float | None = None
+        self.power_time = 0.0
+        # start of the current interval, None before the first reading
+        self.start: float | None = None
+        self.start_energy = 0.0
+        self.samples = 0
+        self.power_sum = 0.0
+        self.power_min = 0.0
+        self.power_max = 0.0
+        self.windows: deque[MeterStatistics] = deque(maxlen=windows)
+
+    def finish(self, tariff: int, end: float) -> MeterStatistics:
+        statistics = MeterStatistics(
+            tariff, self.start, end, self.energy - self.start_energy, self.energy,
+            self.power_sum / self.samples if self.samples else None,
+            self.power_min if self.samples else None, self.power_max if self.samples else None, self.samples,
+        )
+        self.windows.append(statistics)
+        self.start = end
+        self.start_energy = self.energy
+        self.samples = 0
+        self.power_sum = 0.0
+        return statistics
+
+    def add(self, cumulative: bool, value: float, now: float, max_gap: float) -> None:
+        if cumulative:
+            if self.counter is not None:
+                # a smaller counter was reset or wrapped around
+                self.energy += value - self.counter if value >= self.counter else value
+            self.counter = value
+        else:
+            if self.counter is None and self.power is not None and 0 < now - self.power_time <= max_gap:
+                self.energy += (self.power + value) / 2 * (now - self.power_time) / _WS_PER_KWH
+            self.power = value
+            self.power_time = now
+            if self.samples:
+                self.power_min = min(self.power_min, value)
+                self.power_max = max(self.power_max, value)
+            else:
+                self.power_min = self.power_max = value
+            self.samples += 1
+            self.power_sum += value
+
+
+class MeteringPipeline:
+    """ Aggregates the readings of the registered meters into intervals of interval seconds.
+
+        emit(dev_id, statistics) is called, when the first reading after the
+        end of an interval arrives, or by flush(), which the gateway runs at
+        the end of each interval.
+        All methods must be run in the event loop.
+    """
+
+    def __init__(self, emit: Callable[[list[int], MeterStatistics], None] | None = None,
+                 interval: float = DEFAULT_INTERVAL, windows: int = DEFAULT_WINDOWS,
+                 max_gap: float = DEFAULT_MAX_GAP, clock: Callable[[], float] = time.time):
+        self._emit = emit
+        self.interval = interval
+        self.windows = windows
+        self.max_gap = max_gap
+        self._clock = clock
+        # sender -> (dev_id, tariff -> channel)
+        self._meters: dict[int, tuple[list[int], dict[int, _MeterChannel]]] = {}
+        self.readings = 0
+        self.emitted = 0
+
+    def __len__(self) -> int:
+        return len(self._meters)
+
+    def add_meter(self, dev_id: list[int]) -> None:
+        self._meters.setdefault(dev_id_to_int(dev_id), (list(dev_id), {}))
+
+    def remove_meter(self, dev_id: list[int]) -> None:
+        self._meters.pop(dev_id_to_int(dev_id), None)
+
+    def received(self, packet: RadioPacket) -> MeterReading | None:
+        """ Process a telegram, returns its reading, if it came from a registered meter """
+        meter = self._meters.get(dev_id_to_int(packet.sender))
+        if meter is None:
+            return None
+        reading = decode_meter(packet)
+        if reading is None:
+            return None
+        self.add(meter[0], reading, self._clock())
+        return reading
+
+    def add(self, dev_id: list[int], reading: MeterReading, now: float) -> None:
+        """ Process a decoded reading of a registered meter """
+        dev_id, channels = self._meters[dev_id_to_int(dev_id)]
+        channel = channels.get(reading.tariff)
+        if channel is None:
+            channel = channels[reading.tariff] = _MeterChannel(self.windows)
+        if channel.start is None:
+            channel.start = now - now % self.interval
+        elif now >= channel.start + self.interval:
+            self._finish(dev_id, reading.tariff, channel, now)
+        channel.add(reading.cumulative, reading.value, now, self.max_gap)
+        self.readings += 1
+
+    def _finish(self, dev_id: list[int], tariff: int, channel: _MeterChannel, now: float) -> None:
+        statistics = channel.finish(tariff, channel.start + self.interval)
+        # intervals without any reading are skipped
+        channel.start = now - now % self.interval
+        self.emitted += 1
+        if self._emit is not None:
+            self._emit(dev_id, statistics)
+
+    def next_flush(self) -> float:
+        """ Seconds until the end of the current interval, after which flush() emits its statistics """
+        now = self._clock()
+        return self.interval - now % self.interval
+
+    def flush(self, now: float | None = None) -> None:
+        """ Emit the statistics of all intervals, which ended before now """
+        now = self._clock() if now is None else now
+        for dev_id, channels in self._meters.values():
+            for tariff, channel in channels.items():
+                if channel.start is not None and now >= channel.start + self.interval:
+                    self._finish(dev_id, tariff, channel, now)
+
+    def energy(self, dev_id: list[int], tariff: int = 0) -> float | None:
+        """ Energy of a channel since its first reading in kWh, None if nothing was received """
+        channel = self._channel(dev_id, tariff)
+        return channel.energy if channel is not None and channel.start is not None else None
+
+    def power(self, dev_id: list[int], tariff: int = 0) -> float | None:
+        channel = self._channel(dev_id, tariff)
+        return channel.power if channel is not None else None
+
+    def rolling(self, dev_id: list[int], tariff: int = 0) -> MeterStatistics | None:
+        """ The statistics of the kept intervals of a channel combined, None without finished intervals """
+        channel = self._channel(dev_id, tariff)
+        if channel is None or not channel.windows:
+            return None
+        windows = channel.windows
+        powered = [window for window in windows if window.samples]
+        samples = sum(window.samples for window in powered)
+        return MeterStatistics(
+            tariff, windows[0].start, windows[-1].end, sum(window.energy_kwh for window in windows),
+            windows[-1].total_kwh,
+            sum(window.mean_w * window.samples for window in powered) / samples if samples else None,
+            min((window.min_w for window in powered), default=None),
+            max((window.max_w for window in powered), default=None), samples,
+        )
+
+    def _channel(self, dev_id: list[int], tariff: int) -> _MeterChannel | None:
+        meter = self._meters.get(dev_id_to_int(dev_id))
+        return meter[1].get(tariff) if meter is not None else None
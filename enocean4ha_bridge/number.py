@@ -2,46 +2,44 @@ import logging
 
 from enocean.protocol.constants import PACKET, RORG
 from enocean.protocol.packet import RadioPacket
-from enocean.utils import to_hex_string
 
 from . import EnOceanGateway
-from .common import EEPInfo
+from .d2_01 import decode_interface_settings
+from .entity import NO_STATUS, EO4HAEntity, ParseResult
+from .send_queue import Priority
+from .trace import TRACER
 
 LOGGER = logging.getLogger('enocean')
 
 
-class EO4HANumber:
-    eep: EEPInfo
-    dev_id: list[int]
+class EO4HANumber(EO4HAEntity):
+    # _attr_native_value is no slot, it keeps the class default and the property cache of the Home Assistant
+    # NumberEntity, whose instances have a __dict__ anyway
+    __slots__ = ("channel", "shortcut")
+
     channel: int
     gateway: EnOceanGateway
     shortcut: str
     _attr_native_value: float|None
 
-    def parse_packet(self, packet: RadioPacket):
-        LOGGER.debug(f"switch, {repr(self.eep)}, Device-ID: {to_hex_string(self.dev_id)}")
+    def parse(self, packet: RadioPacket) -> ParseResult | None:
+        if TRACER.active:
+            TRACER.trace("parse", self.dev_id, self.eep, entity="number", shortcut=self.shortcut)
         match packet.rorg:
             case RORG.VLD:
                 return self._parse_d2_packet(packet)
 
     def _parse_d2_packet(self, packet):
         func = self.eep.func
-        func_type = self.eep.func_type
-        result = {
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
+        status = NO_STATUS
 
         if func == 0x01:
-            packet.parse_eep(rorg_func=self.eep.func, rorg_type=self.eep.func_type, command=packet.data[1])
-            if packet.parsed["CMD"]["raw_value"] == 13:
-                channel = packet.parsed["IO"]["raw_value"]
-                if channel == self.channel and self.shortcut in packet.parsed:
-                    result["status"] = packet.parsed[self.shortcut]["raw_value"]
+            settings = decode_interface_settings(packet)
+            if settings is not None and settings.IO == self.channel and self.shortcut in ("AOT", "DOT"):
+                # in seconds, like async_set_native_value() takes it
+                status = getattr(settings, self.shortcut) / 10
 
-        return result
+        return ParseResult(packet.dBm, packet.repeater_count, status)
 
     async def async_set_native_value(self, value: float) -> None:
         """Update the current value."""
@@ -59,6 +57,8 @@ class EO4HANumber:
                 rorg_func=self.eep.func,
                 rorg_type=self.eep.func_type,
                 command=0xB,
+                # AOT, DOT, etc. are set by different entities of the same channel
+                coalesce_key=(tuple(self.dev_id), self.channel, 0xB, self.shortcut),
                 destination=self.dev_id,
                 IO=self.channel,
                 AOT=aot,
@@ -73,6 +73,7 @@ class EO4HANumber:
                 rorg_func=self.eep.func,
                 rorg_type=self.eep.func_type,
                 command=0xC,
+                priority=Priority.STATUS_QUERY,
                 destination=self.dev_id,
                 IO=self.channel,
             )
@@ -85,6 +86,7 @@ class EO4HANumber:
                 rorg_func=self.eep.func,
                 rorg_type=self.eep.func_type,
                 command=0x3,
+                priority=Priority.STATUS_QUERY,
                 destination=self.dev_id,
                 IO=self.channel,
             )
@@ -0,0 +1,205 @@
+""" Templates for the packets sent by the bridge.
+
+    Packet.create() looks up the EEP profile, converts the data to bit lists
+    for every field and parses the built packet again. Commands of an
+    entity only differ in the values of the fields, e.g. OV, so a template
+    keeps the packet of the first call and afterward only patches the field
+    bits and the CRC. The D2-01 commands, which EEP.xml doesn't describe,
+    are encoded by d2_01.encode_command().
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Any
+
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.crc8 import calc
+from enocean.protocol.packet import Packet, RadioPacket
+
+from .d2_01 import encode_command
+from .decoders import field_position
+
+LOGGER = logging.getLogger('enocean.ha.packet_templates')
+
+DEFAULT_MAXSIZE = 1024
+# the defaults of Packet.create()
+_BROADCAST = [0xFF, 0xFF, 0xFF, 0xFF]
+_DEFAULT_SENDER = [0xDE, 0xAD, 0xBE, 0xEF]
+
+# field kinds
+_VALUE = 0
+_ENUM = 1
+_STATUS = 2
+
+
+class PrebuiltPacket(Packet):
+    """ Packet with an already built ESP3 frame.
+
+        Packet.__init__() is skipped, as it would parse the data again.
+    """
+
+    def __init__(self, packet_type: PACKET, rorg: int, data: list[int], optional: list[int], frame: list[int]):
+        # noinspection PyMissingConstructor
+        self.packet_type = packet_type
+        self.rorg = rorg
+        self.rorg_func = None
+        self.rorg_type = None
+        self.rorg_manufacturer = None
+        self.received = None
+        self.data = data
+        self.optional = optional
+        self.status = data[-1]
+        self.parsed = OrderedDict()
+        self.repeater_count = 0
+        self._profile = None
+        self._frame = frame
+
+    def build(self) -> list:
+        return self._frame
+
+
+def _compile_encoder(target) -> tuple:
+    """ Return (kind, first byte, last byte, shift, mask, extra) to set the field like EEP.set_values() """
+    if target.name == 'status':
+        size = int(target['size'])
+        return _STATUS, 0, 0, 8 - int(target['offset']) - size, (1 << size) - 1, None
+    first, last, shift, mask = field_position(target)
+    if target.name == 'value':
+        rng_min = float(target.find('range').find('min').text)
+        rng_max = float(target.find('range').find('max').text)
+        scl_min = float(target.find('scale').find('min').text)
+        scl_max = float(target.find('scale').find('max').text)
+        return _VALUE, first, last, shift, mask, (scl_min, rng_max - rng_min, scl_max - scl_min, rng_min)
+    # enum
+    values = set()
+    for item in target.find_all('item'):
+        try:
+            values.add(int(item['value']))
+        except (KeyError, ValueError):
+            pass
+    ranges = [
+        (int(rangeitem.get('start', -1)), int(rangeitem.get('end', -1)))
+        for rangeitem in target.find_all('rangeitem')
+    ]
+    descriptions = {}
+    for item in target.find_all('item'):
+        descriptions.setdefault(item.get('description'), item.get('value'))
+    return _ENUM, first, last, shift, mask, (values, ranges, descriptions)
+
+
+def _raw_value(kind: int, extra, value: Any) -> int:
+    if kind == _VALUE:
+        scl_min, rng_span, scl_span, rng_min = extra
+        return int((value - scl_min) * rng_span / scl_span + rng_min)
+    if kind == _STATUS:
+        return int(bool(value))
+    values, ranges, descriptions = extra
+    if isinstance(value, int):
+        if value in values or any(start <= value <= end for start, end in ranges):
+            return value
+        raise ValueError(f'Enum value "{value}" not found in EEP.')
+    if value not in descriptions:
+        raise ValueError(f'Enum description for value "{value}" not found in EEP.')
+    return int(descriptions[value])
+
+
+class PacketTemplate:
+    """ A packet for sending, in which only the values of the fields are replaced """
+
+    def __init__(self, packet: Packet, profile, fields: tuple[str, ...]):
+        self.packet_type = packet.packet_type
+        self.rorg = packet.rorg
+        self._data = list(packet.data)
+        self._optional = list(packet.optional)
+        frame = packet.build()
+        self._header = frame[:6]
+        self._encoders = []
+        for shortcut in fields:
+            target = profile.find(shortcut=shortcut) if profile is not None else None
+            if not target:
+                # EEP.set_values() ignores unknown fields as well
+                continue
+            kind, first, last, shift, mask, extra = _compile_encoder(target)
+            if kind == _STATUS:
+                first = last = len(self._data) - 1
+            self._encoders.append((shortcut, kind, first, last, shift, mask, extra))
+
+    def create(self, **values) -> PrebuiltPacket:
+        data = self._data.copy()
+        for shortcut, kind, first, last, shift, mask, extra in self._encoders:
+            raw_value = _raw_value(kind, extra, values[shortcut]) & mask
+            if first == last:
+                data[first] = (data[first] & ~(mask << shift) & 0xFF) | (raw_value << shift)
+            else:
+                size = last - first + 1
+                combined = int.from_bytes(bytes(data[first:last + 1]), "big")
+                combined = (combined & ~(mask << shift)) | (raw_value << shift)
+                data[first:last + 1] = combined.to_bytes(size, "big")
+        body = data + self._optional
+        frame = self._header + body
+        frame.append(calc(body))
+        return PrebuiltPacket(self.packet_type, self.rorg, data, self._optional, frame)
+
+
+class PacketTemplateCache:
+    """ Creates packets like Packet.create(), using a template per command.
+
+        The templates are keyed on EEP, command, direction, destination,
+        sender, learn flag and the names of the given fields. At most maxsize
+        templates are kept, the least recently used ones are dropped first.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._templates: OrderedDict[tuple, PacketTemplate] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def create(self, packet_type: PACKET, rorg: int, rorg_func: int, rorg_type: int, direction=None,
+               command: int | None = None, destination: list[int] | None = None, sender: list[int] | None = None,
+               learn: bool = False, **kwargs) -> Packet:
+        """ Same arguments and result as Packet.create() """
+        if rorg == RORG.VLD and rorg_func == 0x01:
+            data = encode_command(command, kwargs)
+            if data is not None:
+                return self._create_d2_01(packet_type, data, destination, sender)
+        key = (
+            packet_type, rorg, rorg_func, rorg_type, direction, command,
+            tuple(destination) if destination is not None else None,
+            tuple(sender) if sender is not None else None,
+            learn, tuple(kwargs)
+        )
+        template = self._templates.get(key)
+        if template is not None:
+            self.hits += 1
+            self._templates.move_to_end(key)
+            return template.create(**kwargs)
+
+        self.misses += 1
+        packet = Packet.create(
+            packet_type, rorg, rorg_func, rorg_type, direction, command, destination, sender, learn, **kwargs
+        )
+        profile = Packet.eep.find_profile(rorg, rorg_func, rorg_type, direction, command)
+        self._templates[key] = PacketTemplate(packet, profile, tuple(kwargs))
+        if len(self._templates) > self.maxsize:
+            self._templates.popitem(last=False)
+        return packet
+
+    @staticmethod
+    def _create_d2_01(packet_type: PACKET, data: list[int], destination: list[int] | None,
+                      sender: list[int] | None) -> RadioPacket:
+        """ Packet of a D2-01 command of d2_01.encode_command(), like Packet.create() would build it """
+        if packet_type != PACKET.RADIO_ERP1:
+            raise ValueError('Packet type not supported by this function.')
+        if destination is None:
+            LOGGER.warning('Replacing destination with broadcast address.')
+            destination = _BROADCAST
+        if sender is None:
+            LOGGER.warning('Replacing sender with default address.')
+            sender = _DEFAULT_SENDER
+        return RadioPacket(
+            packet_type, [RORG.VLD] + data + list(sender) + [0], [3] + list(destination) + [0xFF, 0]
+        )
@@ -0,0 +1,182 @@
+""" Staggered polling of the status of D2-01 actuators.
+
+    Each device is polled on its own timer. The first polls are spread over
+    window seconds, every interval gets some jitter, so the queries don't
+    reach the radio at the same time. A device, which sent a telegram on its
+    own since the last poll, is polled one interval after that telegram
+    instead. The interval grows by backoff up to max_interval as long as the
+    replies don't change, and drops back to min_interval on a change.
+    The channels of a device are queried with one telegram for all channels.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Callable, Iterable
+
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import RadioPacket
+
+from .channel_groups import ALL_CHANNELS
+from .common import dev_id_to_int
+from .d2_01 import CMD_QUERY_INTERFACE, CMD_QUERY_MEASUREMENT, CMD_QUERY_STATUS
+from .send_queue import Priority
+
+LOGGER = logging.getLogger('enocean.ha.polling')
+
+# further fields of the queries
+_QUERY_FIELDS = {CMD_QUERY_MEASUREMENT: {"qu": 1}}
+
+DEFAULT_WINDOW = 60.0
+DEFAULT_MIN_INTERVAL = 300.0
+DEFAULT_MAX_INTERVAL = 3600.0
+DEFAULT_BACKOFF = 2.0
+# relative jitter of each interval
+DEFAULT_JITTER = 0.1
+# telegrams within this many seconds after a poll are taken as its replies
+DEFAULT_REPLY_WINDOW = 5.0
+
+
+class _PolledDevice:
+    __slots__ = (
+        "dev_id", "rorg_type", "channels", "commands", "interval", "last_poll", "last_heard", "changed", "replies",
+        "timer",
+    )
+
+    def __init__(self, dev_id: list[int], rorg_type: int, channels: tuple[int, ...], commands: tuple[int, ...],
+                 interval: float):
+        self.dev_id = dev_id
+        self.rorg_type = rorg_type
+        self.channels = channels
+        self.commands = commands
+        self.interval = interval
+        self.last_poll: float | None = None
+        # time of the latest telegram, which was no reply to a poll
+        self.last_heard: float | None = None
+        # whether a telegram had new content since the last poll
+        self.changed = True
+        # (command, channel) -> content of the latest telegram
+        self.replies: dict[tuple[int, int], bytes] = {}
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class PollScheduler:
+    """ Polls the status of D2-01 actuators through send(), which takes the arguments of
+        EnOceanGateway.send_command(), but queues the query right away and raises, if it can't be built.
+
+        The gateway hands all received telegrams to received(). The queries
+        are sent with Priority.STATUS_QUERY, so the send queue paces them
+        behind the user commands. Only queued queries count as polls, the
+        others as failed.
+        All methods must be run in the event loop.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, send: Callable[..., object],
+                 window: float = DEFAULT_WINDOW, min_interval: float = DEFAULT_MIN_INTERVAL,
+                 max_interval: float = DEFAULT_MAX_INTERVAL, backoff: float = DEFAULT_BACKOFF,
+                 jitter: float = DEFAULT_JITTER, reply_window: float = DEFAULT_REPLY_WINDOW,
+                 clock: Callable[[], float] = time.monotonic, rng: random.Random | None = None):
+        self._loop = loop
+        self._send = send
+        self.window = window
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.reply_window = reply_window
+        self._clock = clock
+        self._random = rng if rng is not None else random.Random()
+        self._devices: dict[int, _PolledDevice] = {}
+        self.polls = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def add(self, dev_id: list[int], rorg_type: int, channels: Iterable[int],
+            commands: Iterable[int] = (CMD_QUERY_STATUS,)) -> None:
+        """ Poll the channels of a D2-01 device of the given TYPE, with the given query commands """
+        self.remove(dev_id)
+        device = _PolledDevice(
+            list(dev_id), rorg_type, tuple(sorted(set(channels))), tuple(commands), self.min_interval
+        )
+        self._devices[dev_id_to_int(dev_id)] = device
+        device.timer = self._loop.call_later(self._random.uniform(0.0, self.window), self._poll, device)
+
+    def remove(self, dev_id: list[int]) -> None:
+        device = self._devices.pop(dev_id_to_int(dev_id), None)
+        if device is not None and device.timer is not None:
+            device.timer.cancel()
+
+    def stop(self) -> None:
+        for device in self._devices.values():
+            if device.timer is not None:
+                device.timer.cancel()
+        self._devices.clear()
+
+    def interval(self, dev_id: list[int]) -> float | None:
+        """ Current poll interval of a device, None if it isn't polled """
+        device = self._devices.get(dev_id_to_int(dev_id))
+        return device.interval if device is not None else None
+
+    def received(self, packet: RadioPacket) -> None:
+        """ Note a telegram of a polled device, so its next poll is deferred or its interval is reset """
+        device = self._devices.get(dev_id_to_int(packet.sender))
+        if device is None or packet.rorg != RORG.VLD or len(packet.data) < 8:
+            return
+        now = self._clock()
+        key = (packet.data[1] & 0x0F, packet.data[2] & 0x1F)
+        # without the sender and status bytes
+        content = bytes(packet.data[1:-5])
+        if device.replies.get(key) != content:
+            device.replies[key] = content
+            device.changed = True
+        if device.last_poll is None or now - device.last_poll > self.reply_window:
+            device.last_heard = now
+
+    def _jittered(self, interval: float) -> float:
+        return interval * self._random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+
+    def _poll(self, device: _PolledDevice) -> None:
+        device.timer = None
+        now = self._clock()
+        if device.last_heard is not None and (device.last_poll is None or device.last_heard > device.last_poll):
+            # the device reported on its own, its state is fresh
+            delay = device.last_heard + device.interval - now
+            if delay > 0:
+                self.skipped += 1
+                device.timer = self._loop.call_later(
+                    delay * self._random.uniform(1.0, 1.0 + self.jitter), self._poll, device
+                )
+                return
+        if device.changed or device.last_poll is None:
+            device.interval = self.min_interval
+        else:
+            device.interval = min(device.interval * self.backoff, self.max_interval)
+        device.changed = False
+        device.last_poll = now
+        io = device.channels[0] if len(device.channels) == 1 else ALL_CHANNELS
+        for command in device.commands:
+            try:
+                self._send(
+                    packet_type=PACKET.RADIO_ERP1,
+                    rorg=RORG.VLD,
+                    rorg_func=0x01,
+                    rorg_type=device.rorg_type,
+                    command=command,
+                    priority=Priority.STATUS_QUERY,
+                    destination=device.dev_id,
+                    IO=io,
+                    **_QUERY_FIELDS.get(command, {}),
+                )
+            except (AttributeError, KeyError, TypeError, ValueError) as exception:
+                self.failed += 1
+                LOGGER.warning(f"Can't poll {dev_id_to_int(device.dev_id):08X} with CMD {command}: {repr(exception)}")
+                continue
+            self.polls += 1
+        device.timer = self._loop.call_later(self._jittered(device.interval), self._poll, device)
+
+    def stats(self) -> dict[str, int]:
+        return {"devices": len(self._devices), "polls": self.polls, "skipped": self.skipped, "failed": self.failed}
@@ -0,0 +1,158 @@
+""" Several dongles acting as one gateway, for buildings which need more than one for coverage. """
+
+import concurrent.futures
+import logging
+from functools import partial
+from typing import Callable, Iterable
+
+from enocean.protocol.packet import RadioPacket
+
+from .acks import CommandResult
+from .common import EO4HAError, dev_id_to_int
+from .dedup import DuplicateFilter
+from .gateway import EnOceanGateway
+from .send_queue import Priority
+
+LOGGER = logging.getLogger('enocean.ha.pool')
+
+
+class GatewayPool:
+    """ Merges the received telegrams of several gateways and sends through the best one.
+
+        All gateways share one DuplicateFilter, so a telegram heard by several
+        dongles reaches the receivers once, while the link quality tracker of
+        each gateway still records its own copy. The first copy is handed to
+        consume() of every gateway, so the pending commands, polls and meters
+        of a gateway see the telegrams heard by the other dongles, too. A command goes out through
+        the connected gateway, which heard the destination with the best
+        recent dBm, or through the least busy one for unknown destinations.
+        An unconfirmed command of a gateway, which got disconnected meanwhile,
+        is sent again through the best remaining one.
+        As each dongle sends with its own base id, actuators have to be
+        taught in to the base ids of all dongles they may be reached through.
+
+        Offers the send_command(), confirm_command() and receiver methods of
+        EnOceanGateway, so entities can use a pool as their gateway.
+    """
+
+    def __init__(self, gateways: Iterable[EnOceanGateway] = (), duplicate_filter: DuplicateFilter | None = None):
+        self.duplicate_filter = duplicate_filter if duplicate_filter is not None else DuplicateFilter()
+        self.gateways: list[EnOceanGateway] = []
+        # registered receivers, which are registered again with gateways added later
+        self._receivers: list[tuple[list[int], Callable[[RadioPacket], None]]] = []
+        self._device_channels: dict[int, tuple[list[int], tuple[int, ...]]] = {}
+        for gateway in gateways:
+            self.add_gateway(gateway)
+
+    def add_gateway(self, gateway: EnOceanGateway) -> None:
+        """ Add a gateway, which gets the shared duplicate filter and all registered receivers """
+        gateway.duplicate_filter = self.duplicate_filter
+        gateway.telegram_consumer = self.consume
+        for dev_id, receiver in self._receivers:
+            gateway.register_receiver(dev_id, receiver)
+        for dev_id, channels in self._device_channels.values():
+            gateway.set_device_channels(dev_id, channels)
+        self.gateways.append(gateway)
+
+    def remove_gateway(self, gateway: EnOceanGateway) -> None:
+        self.gateways.remove(gateway)
+        gateway.telegram_consumer = gateway.consume
+        for dev_id, receiver in self._receivers:
+            gateway.unregister_receiver(dev_id, receiver)
+
+    async def load(self) -> None:
+        for gateway in self.gateways:
+            await gateway.load()
+
+    def unload(self) -> bool:
+        for gateway in self.gateways:
+            gateway.unload()
+        return True
+
+    def best_gateway(self, dev_id: list[int] | None) -> EnOceanGateway:
+        """ The connected gateway with the best recent dBm of the device, raises EO4HAError if none is connected """
+        connected = [gateway for gateway in self.gateways if gateway.is_connected]
+        if not connected:
+            raise EO4HAError("No gateway of the pool is connected")
+        if dev_id is not None:
+            heard = [
+                (dBm, index) for index, gateway in enumerate(connected)
+                if (dBm := gateway.link_quality_tracker.recent_dBm(dev_id)) is not None
+            ]
+            if heard:
+                return connected[max(heard)[1]]
+        return min(connected, key=lambda gateway: len(gateway.send_queue))
+
+    def send_command(
+            self, packet_type, rorg, rorg_func, rorg_type, command, priority: Priority = Priority.USER, **kwargs
+    ) -> concurrent.futures.Future | None:
+        """ Send a command through the best gateway for its destination, see EnOceanGateway.send_command().
+
+            The sender is always the base id of the chosen dongle.
+            May be called from any thread.
+        """
+        kwargs.pop('sender', None)
+        send = partial(self._send, packet_type, rorg, rorg_func, rorg_type, command, priority, **kwargs)
+        gateway, future = send()
+        if future is None:
+            return None
+        result = concurrent.futures.Future()
+        future.add_done_callback(partial(self._command_done, result, gateway, send))
+        return result
+
+    def _send(self, *args, **kwargs) -> tuple[EnOceanGateway, concurrent.futures.Future | None]:
+        gateway = self.best_gateway(kwargs.get('destination'))
+        return gateway, gateway.send_command(*args, **kwargs)
+
+    def _command_done(self, result: concurrent.futures.Future, gateway: EnOceanGateway, send: Callable,
+                      future: concurrent.futures.Future):
+        if future.cancelled() or future.exception() is not None:
+            if future.cancelled():
+                result.cancel()
+            else:
+                result.set_exception(future.exception())
+            return
+        command_result: CommandResult = future.result()
+        if not command_result.confirmed and not gateway.is_connected:
+            try:
+                gateway, future = send()
+            except EO4HAError:
+                result.set_result(command_result)
+                return
+            LOGGER.info(f"Command failed over to the gateway {gateway.sender_id_str}")
+            future.add_done_callback(partial(self._command_done, result, gateway, send))
+            return
+        result.set_result(command_result)
+
+    def consume(self, packet: RadioPacket) -> None:
+        """ Hand a telegram to all gateways, it may reach any of the dongles first """
+        for gateway in self.gateways:
+            gateway.consume(packet)
+
+    def confirm_command(self, dev_id: list[int], channel: int, value: int | None = None):
+        for gateway in self.gateways:
+            gateway.confirm_command(dev_id, channel, value)
+
+    def register_receiver(self, dev_id: list[int], receiver: Callable[[RadioPacket], None]) -> Callable[[], None]:
+        """ Register a callback for the packets of a device with all gateways, must be run in the event loop """
+        self._receivers.append((list(dev_id), receiver))
+        for gateway in self.gateways:
+            gateway.register_receiver(dev_id, receiver)
+
+        def _unregister():
+            self.unregister_receiver(dev_id, receiver)
+
+        return _unregister
+
+    def unregister_receiver(self, dev_id: list[int], receiver: Callable[[RadioPacket], None]):
+        entry = (list(dev_id), receiver)
+        if entry not in self._receivers:
+            return
+        self._receivers.remove(entry)
+        for gateway in self.gateways:
+            gateway.unregister_receiver(dev_id, receiver)
+
+    def set_device_channels(self, dev_id: list[int], channels):
+        self._device_channels[dev_id_to_int(dev_id)] = (list(dev_id), tuple(channels))
+        for gateway in self.gateways:
+            gateway.set_device_channels(dev_id, channels)
@@ -0,0 +1,122 @@
+""" Bounded queue between the thread of the serial communicator and the event loop. """
+
+import asyncio
+import logging
+import threading
+from collections import Counter, deque
+from enum import Enum
+from typing import Callable
+
+from enocean.protocol.packet import Packet
+
+from .dedup import fingerprint
+
+LOGGER = logging.getLogger('enocean.ha.receive_queue')
+
+DEFAULT_QUEUE_SIZE = 256
+
+
+class OverflowPolicy(Enum):
+    """ What to drop, when a packet arrives while the queue is full """
+    # drop the oldest queued packet
+    DROP_OLDEST = "drop_oldest"
+    # drop a packet, which is queued more than once, and only then the oldest one
+    DROP_DUPLICATES = "drop_duplicates"
+
+
+class ReceiveQueue:
+    """ Collects the packets of the communicator thread and delivers them in batches.
+
+        put() may be called from any thread. The first packet of a batch
+        schedules one wake-up of the event loop, which then hands all packets
+        queued until then to the handler.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, handler: Callable[[Packet], None],
+                 maxsize: int = DEFAULT_QUEUE_SIZE, policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST):
+        self._loop = loop
+        self._handler = handler
+        self.maxsize = maxsize
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._packets: deque[Packet] = deque()
+        # number of queued packets per fingerprint, only used for DROP_DUPLICATES
+        self._fingerprints: Counter = Counter()
+        self._scheduled = False
+
+        self.received = 0
+        self.delivered = 0
+        self.batches = 0
+        self.dropped_oldest = 0
+        self.dropped_duplicates = 0
+        self.max_depth = 0
+
+    def __len__(self) -> int:
+        return len(self._packets)
+
+    def put(self, packet: Packet) -> None:
+        """ Queue a packet for the event loop. Thread-safe. """
+        with self._lock:
+            self.received += 1
+            if len(self._packets) >= self.maxsize and not self._make_room(packet):
+                return
+            self._packets.append(packet)
+            if self.policy is OverflowPolicy.DROP_DUPLICATES:
+                self._fingerprints[fingerprint(packet)] += 1
+            self.max_depth = max(self.max_depth, len(self._packets))
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._loop.call_soon_threadsafe(self._drain)
+
+    def _make_room(self, packet: Packet) -> bool:
+        """ Drop a packet according to the policy. Returns False, if the new packet should be dropped. """
+        if self.policy is OverflowPolicy.DROP_DUPLICATES:
+            if self._fingerprints[fingerprint(packet)]:
+                # the same telegram is already waiting
+                self.dropped_duplicates += 1
+                return False
+            for index, queued in enumerate(self._packets):
+                queued_fingerprint = fingerprint(queued)
+                if self._fingerprints[queued_fingerprint] > 1:
+                    del self._packets[index]
+                    self._fingerprints[queued_fingerprint] -= 1
+                    self.dropped_duplicates += 1
+                    return True
+        oldest = self._packets.popleft()
+        if self.policy is OverflowPolicy.DROP_DUPLICATES:
+            self._release(fingerprint(oldest))
+        self.dropped_oldest += 1
+        return True
+
+    def _release(self, key: tuple) -> None:
+        self._fingerprints[key] -= 1
+        if not self._fingerprints[key]:
+            del self._fingerprints[key]
+
+    def _drain(self) -> None:
+        """ Deliver all queued packets. Runs in the event loop. """
+        with self._lock:
+            packets = self._packets
+            self._packets = deque()
+            self._fingerprints.clear()
+            self._scheduled = False
+        self.batches += 1
+        for packet in packets:
+            self.delivered += 1
+            try:
+                self._handler(packet)
+            except Exception:  # one broken entity must not stop the delivery of the batch
+                LOGGER.exception(f"Error handling packet {packet}")
+
+    def stats(self) -> dict[str, int]:
+        """ Counters of the queue, e.g. for diagnostics """
+        return {
+            "received": self.received,
+            "delivered": self.delivered,
+            "batches": self.batches,
+            "dropped_oldest": self.dropped_oldest,
+            "dropped_duplicates": self.dropped_duplicates,
+            "max_depth": self.max_depth,
+            "depth": len(self._packets),
+        }
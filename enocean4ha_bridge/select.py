@@ -1,27 +1,31 @@
 import logging
 
-
-from enocean.utils import to_hex_string
 from enocean.protocol.constants import PACKET, RORG
 from enocean.protocol.packet import RadioPacket
 
 from . import EnOceanGateway
-from .common import EEPInfo
+from .d2_01 import decode_interface_settings
+from .entity import NO_STATUS, EO4HAEntity, ParseResult
+from .send_queue import Priority
+from .trace import TRACER
 
 LOGGER = logging.getLogger('enocean.ha.select')
 
 
-class EO4HASelect:
+class EO4HASelect(EO4HAEntity):
+    # _attr_current_option is no slot, it keeps the class default and the property cache of the Home Assistant
+    # SelectEntity, whose instances have a __dict__ anyway
+    __slots__ = ("channel", "shortcut", "select_options_dict")
+
     _attr_current_option: str|None
     channel: int|None
-    dev_id: list[int]
-    eep: EEPInfo
     gateway: EnOceanGateway
     select_options_dict: dict
     shortcut: str|None
 
-    def parse_packet(self, packet: RadioPacket):
-        LOGGER.debug(f"select, {repr(self.eep)}, Device-ID: {to_hex_string(self.dev_id)}")
+    def parse(self, packet: RadioPacket) -> ParseResult | None:
+        if TRACER.active:
+            TRACER.trace("parse", self.dev_id, self.eep, entity="select")
         match self.eep.rorg:
             case RORG.VLD:
                 return self._parse_d2_packet(packet)
@@ -29,19 +33,18 @@ class EO4HASelect:
     def _parse_d2_packet(self, packet):
         func = self.eep.func
         func_type = self.eep.func_type
-        result = {
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
+        status = NO_STATUS
 
-        if func == 0x01 and func_type == 0x12 and packet.data[1] == 13:
-            packet.parse_eep(rorg_func=func, rorg_type=func_type, command=13)
-            if self.shortcut in packet.parsed and self.channel == packet.parsed["IO"]["raw_value"]:
-                result["status"] = packet.parsed[self.shortcut]["value"]
+        if func == 0x01 and func_type == 0x12:
+            settings = decode_interface_settings(packet)
+            if settings is not None and settings.IO == self.channel and self.shortcut in ("EDT", "EDTS"):
+                raw_value = getattr(settings, self.shortcut)
+                # the option, which async_select_option() sends as this value
+                status = next(
+                    (option for option, value in self.select_options_dict.items() if value == raw_value), raw_value
+                )
 
-        return result
+        return ParseResult(packet.dBm, packet.repeater_count, status)
 
     async def async_select_option(self, option: str) -> None:
         """Change the selected option."""
@@ -53,6 +56,8 @@ class EO4HASelect:
                 rorg_func=self.eep.func,
                 rorg_type=self.eep.func_type,
                 command=0xB,
+                # AOT, DOT, etc. are set by different entities of the same channel
+                coalesce_key=(tuple(self.dev_id), self.channel, 0xB, self.shortcut),
                 destination=self.dev_id,
                 IO=self.channel,
                 **{self.shortcut: self.select_options_dict[option]}
@@ -66,6 +71,7 @@ class EO4HASelect:
                 rorg_func=self.eep.func,
                 rorg_type=self.eep.func_type,
                 command=0xC,
+                priority=Priority.STATUS_QUERY,
                 destination=self.dev_id,
                 IO=self.channel,
             )
@@ -78,6 +84,7 @@ class EO4HASelect:
                 rorg_func=self.eep.func,
                 rorg_type=self.eep.func_type,
                 command=0x3,
+                priority=Priority.STATUS_QUERY,
                 destination=self.dev_id,
                 IO=self.channel,
             )
@@ -113,6 +120,7 @@ class EO4HASelect:
                 rorg_func=self.eep.func,
                 rorg_type=self.eep.func_type,
                 command=0x6,
+                priority=Priority.STATUS_QUERY,
                 destination=self.dev_id,
                 IO=self.channel,
                 qu=1
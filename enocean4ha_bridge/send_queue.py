@@ -0,0 +1,182 @@
+""" Scheduler for the packets sent to the EnOcean dongle. """
+
+import asyncio
+import logging
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Callable, Hashable
+
+from enocean.protocol.packet import Packet
+
+LOGGER = logging.getLogger('enocean.ha.send_queue')
+
+# minimal gap between two frames, so the dongle doesn't drop any
+DEFAULT_MIN_INTERVAL = 0.05
+# the 868 MHz SRD band allows 1% transmission time
+DEFAULT_DUTY_CYCLE = 0.01
+# the duty cycle is averaged over one hour
+DUTY_CYCLE_WINDOW = 3600.0
+
+# Rough air time estimation of an ERP1 telegram: 125 kbit/s, every byte is
+# sent as 12 bits, some bytes of preamble and sync, and three subtelegrams.
+_BITRATE = 125000
+_BITS_PER_BYTE = 12
+_OVERHEAD_BYTES = 4
+_SUBTELEGRAMS = 3
+# rounding errors of the refilled budget, which mustn't delay a packet
+_BUDGET_TOLERANCE = 1e-9
+
+
+class Priority(IntEnum):
+    """ Lower values are sent first """
+    USER = 0
+    STATUS_QUERY = 1
+
+
+def airtime(packet: Packet) -> float:
+    """ Estimated transmission time of a packet in seconds """
+    return _SUBTELEGRAMS * (len(packet.data) + _OVERHEAD_BYTES) * _BITS_PER_BYTE / _BITRATE
+
+
+class _Pending:
+    __slots__ = ("packet", "key", "enqueued")
+
+    def __init__(self, packet: Packet, key: Hashable | None, enqueued: float):
+        self.packet = packet
+        self.key = key
+        self.enqueued = enqueued
+
+
+class SendQueue:
+    """ Paces the packets sent to the dongle.
+
+        - A packet put with the key of a still pending packet replaces it,
+          but keeps its place in the queue. So only the latest value of e.g.
+          a brightness slider is sent.
+        - Packets of Priority.USER are sent before Priority.STATUS_QUERY.
+        - Between two packets there are at least min_interval seconds, and
+          the estimated air time is kept within the duty cycle, by a token
+          bucket which holds the air time of one DUTY_CYCLE_WINDOW.
+
+        All methods must be run in the event loop.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, send: Callable[[Packet], None],
+                 min_interval: float = DEFAULT_MIN_INTERVAL, duty_cycle: float = DEFAULT_DUTY_CYCLE,
+                 clock: Callable[[], float] = time.monotonic):
+        self._loop = loop
+        self._send = send
+        self.min_interval = min_interval
+        self.duty_cycle = duty_cycle
+        self._clock = clock
+        self._queues: dict[Priority, deque[_Pending]] = {priority: deque() for priority in Priority}
+        self._pending: dict[Hashable, _Pending] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._next_send = 0.0
+        self._budget_capacity = duty_cycle * DUTY_CYCLE_WINDOW
+        self._budget = self._budget_capacity
+        self._budget_time = clock()
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def put(self, packet: Packet, key: Hashable | None = None, priority: Priority = Priority.USER) -> None:
+        """ Queue a packet. Packets with the same key (not None) are coalesced. """
+        self.enqueued += 1
+        pending = self._pending.get(key) if key is not None else None
+        if pending is not None:
+            pending.packet = packet
+            self.coalesced += 1
+            return
+        pending = _Pending(packet, key, self._clock())
+        if key is not None:
+            self._pending[key] = pending
+        self._queues[priority].append(pending)
+        self.max_depth = max(self.max_depth, len(self))
+        self._schedule()
+
+    def discard(self, key: Hashable) -> bool:
+        """ Drop the pending packet with the key, return True if there was one """
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return False
+        for queue in self._queues.values():
+            if pending in queue:
+                queue.remove(pending)
+                break
+        return True
+
+    def clear(self) -> None:
+        """ Drop all pending packets """
+        for queue in self._queues.values():
+            queue.clear()
+        self._pending.clear()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _refill(self, now: float) -> None:
+        self._budget = min(self._budget_capacity, self._budget + (now - self._budget_time) * self.duty_cycle)
+        self._budget_time = now
+
+    def _schedule(self) -> None:
+        if self._timer is not None or not len(self):
+            return
+        now = self._clock()
+        self._refill(now)
+        delay = max(0.0, self._next_send - now)
+        needed = airtime(self._peek().packet)
+        if needed > self._budget + _BUDGET_TOLERANCE:
+            delay = max(delay, (needed - self._budget) / self.duty_cycle)
+        self._timer = self._loop.call_later(delay, self._process)
+
+    def _peek(self) -> _Pending:
+        for priority in Priority:
+            if self._queues[priority]:
+                return self._queues[priority][0]
+
+    def _process(self) -> None:
+        self._timer = None
+        now = self._clock()
+        self._refill(now)
+        pending = self._peek()
+        needed = airtime(pending.packet)
+        if now >= self._next_send and needed <= self._budget + _BUDGET_TOLERANCE:
+            for priority in Priority:
+                if self._queues[priority]:
+                    self._queues[priority].popleft()
+                    break
+            if pending.key is not None:
+                del self._pending[pending.key]
+            self._budget -= needed
+            self._next_send = now + self.min_interval
+            wait = now - pending.enqueued
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.sent += 1
+            try:
+                self._send(pending.packet)
+            except Exception:  # keep the queue running
+                LOGGER.exception(f"Error sending packet {pending.packet}")
+        self._schedule()
+
+    def stats(self) -> dict[str, float]:
+        """ Counters of the queue, e.g. for diagnostics """
+        return {
+            "depth": len(self),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "coalesced": self.coalesced,
+            "sent": self.sent,
+            "average_wait": self.total_wait / self.sent if self.sent else 0.0,
+            "max_wait": self.max_wait,
+            "airtime_budget": self._budget,
+        }
@@ -2,53 +2,51 @@ import logging
 
 from enocean.protocol.constants import RORG
 from enocean.protocol.packet import RadioPacket
-from enocean.utils import to_hex_string
-from homeassistant.const import STATE_CLOSED, STATE_OPEN
 
-from .common import EEPInfo
-from .constants import STATE_TILT
+from .constants import STATE_CLOSED, STATE_OPEN, STATE_TILT
+from .entity import NO_STATUS, EO4HAEntity, ParseResult
+from .metering import decode_meter
+from .trace import TRACER
 
 LOGGER = logging.getLogger('enocean.ha.sensor')
 
+# A5-10-xx types with a plain temperature value
+A5_10_TEMPERATURE_TYPES = frozenset((*range(0x01, 0x1E), *range(0x20, 0x23)))
 
-class EO4HASensor:
-    """ Base class for all EO4HA sensors """
-    eep: EEPInfo
-    dev_id: list[int]
 
-    def parse_packet(self, packet: RadioPacket):
-        pass
+class EO4HASensor(EO4HAEntity):
+    """ Base class for all EO4HA sensors """
+    __slots__ = ()
 
 
 class EO4HAHumiditySensor(EO4HASensor):
+    __slots__ = ()
+    STATE_NAME = "HUM"
 
-    def parse_packet(self, packet: RadioPacket):
-        LOGGER.debug(f"humidity, {repr(self.eep)}, Device-ID: {to_hex_string(self.dev_id)}")
-        packet.parse_eep(rorg_func=self.eep.func, rorg_type=self.eep.func_type)
+    def parse(self, packet: RadioPacket) -> ParseResult | None:
+        if TRACER.active:
+            TRACER.trace("parse", self.dev_id, self.eep, entity="humidity")
         match self.eep.rorg:
             case RORG.BS4:
                 return self._parse_a5_packet(packet)
 
     def _parse_a5_packet(self, packet):
         func = self.eep.func
-        result = {
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
+        status = NO_STATUS
 
         if func  in [0x04, 0x10]:
-            result["status"] = packet.parsed["HUM"]["value"]
+            status = self.decoder(packet)["HUM"].value
 
-        return result
+        return ParseResult(packet.dBm, packet.repeater_count, status)
 
 
 class EO4HAIlluminanceSensor(EO4HASensor):
+    __slots__ = ()
+    STATE_NAME = "ILL"
 
-    def parse_packet(self, packet: RadioPacket):
-        LOGGER.debug(f"illuminance_sensor, {repr(self.eep)}, Device-ID: {to_hex_string(self.dev_id)}")
-        packet.parse_eep(rorg_func=self.eep.func, rorg_type=self.eep.func_type)
+    def parse(self, packet: RadioPacket) -> ParseResult | None:
+        if TRACER.active:
+            TRACER.trace("parse", self.dev_id, self.eep, entity="illuminance_sensor")
         match self.eep.rorg:
             case RORG.BS4:
                 return self._parse_a5_packet(packet)
@@ -56,40 +54,51 @@ class EO4HAIlluminanceSensor(EO4HASensor):
     def _parse_a5_packet(self, packet):
         func = self.eep.func
         func_type = self.eep.func_type
-        result = {
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
+        status = NO_STATUS
 
         match func:
             case 0x08 | 0x07 if func_type == 0x03:
-                result["status"] = packet.parsed["ILL"]["value"]
+                status = self.decoder(packet)["ILL"].value
 
-        return result
+        return ParseResult(packet.dBm, packet.repeater_count, status)
 
 
 class EO4HAPowerSensor(EO4HASensor):
+    __slots__ = ()
+    STATE_NAME = "PWR"
 
     def parse_packet(self, packet: RadioPacket):
+        """ Return the current power, raises LookupError for other packets """
+        result = self.parse(packet)
+        if not result.has_status:
+            raise LookupError
+        return result.status
+
+    def parse(self, packet: RadioPacket) -> ParseResult:
+        """ The current power as status, a counter reading as energy_kwh attribute """
         if packet.rorg != RORG.BS4:
             raise ValueError
-        LOGGER.debug(f"power_sensor, {repr(self.eep)}")
-        packet.parse_eep(rorg_func=self.eep.func, rorg_type=self.eep.func_type)
+        if TRACER.active:
+            TRACER.trace("parse", self.dev_id, self.eep, entity="power_sensor")
         if self.eep.func == 0x12 and self.eep.func_type == 0x01:
-            if packet.parsed["DT"]["raw_value"] == 1:
-                # this packet reports the current value
-                raw_val = packet.parsed["MR"]["raw_value"]
-                divisor = packet.parsed["DIV"]["raw_value"]
-                return raw_val / (10.0**divisor)
+            reading = decode_meter(packet)
+            if reading is not None:
+                if reading.cumulative:
+                    return ParseResult(
+                        packet.dBm, packet.repeater_count,
+                        attributes=(("energy_kwh", reading.value), ("tariff", reading.tariff))
+                    )
+                return ParseResult(packet.dBm, packet.repeater_count, reading.value, (("tariff", reading.tariff),))
         raise LookupError
 
 
 class EO4HATemperatureSensor(EO4HASensor):
+    __slots__ = ()
+    STATE_NAME = "TMP"
 
-    def parse_packet(self, packet: RadioPacket):
-        LOGGER.debug(f"temperature_sensor, {repr(self.eep)}, Device-ID: {to_hex_string(self.dev_id)}")
+    def parse(self, packet: RadioPacket) -> ParseResult | None:
+        if TRACER.active:
+            TRACER.trace("parse", self.dev_id, self.eep, entity="temperature_sensor")
         match self.eep.rorg:
             case RORG.BS4:
                 return self._parse_a5_packet(packet)
@@ -97,27 +106,22 @@ class EO4HATemperatureSensor(EO4HASensor):
     def _parse_a5_packet(self, packet):
         func = self.eep.func
         func_type = self.eep.func_type
-        result = {
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
-
-        if func in [0x02, 0x08] or (func == 0x04 and func_type in [0x03, 0x04]) or (func == 0x10 and func_type in [*range(0x01,0x1E), *range(0x20,0x23)]):
-            packet.parse_eep(rorg_func=func, rorg_type=func_type)
-            result["status"] = packet.parsed["TMP"]["value"]
+        status = NO_STATUS
+
+        if func in [0x02, 0x08] or (func == 0x04 and func_type in [0x03, 0x04]) or (func == 0x10 and func_type in A5_10_TEMPERATURE_TYPES):
+            parsed = self.decoder(packet)
+            status = parsed["TMP"].value
         elif func == 0x04 and func_type in [0x01, 0x02]:
-            packet.parse_eep(rorg_func=func, rorg_type=func_type)
-            if packet.parsed["TSN"]["raw_value"] == 1:
-                result["status"] = packet.parsed["TMP"]["value"]
+            parsed = self.decoder(packet)
+            if parsed["TSN"].raw_value == 1:
+                status = parsed["TMP"].value
         elif func == 0x10 and func_type == 0x1F:
-            packet.parse_eep(rorg_func=func, rorg_type=func_type)
-            if packet.parsed["TMP_F"]["raw_value"] == 1:
-                result["status"] = packet.parsed["TMP"]["value"]
+            parsed = self.decoder(packet)
+            if parsed["TMP_F"].raw_value == 1:
+                status = parsed["TMP"].value
         elif func == 0x20 and func_type == 0x06:
-            packet.parse_eep(rorg_func=func, rorg_type=func_type, direction=1)
-            if packet.parsed["TSL"]["raw_value"] == 0:
+            parsed = self.decoder(packet)
+            if parsed["TSL"].raw_value == 0:
                 range_min = 0.0; range_max = 80.0
                 scale_min =0.0; scale_max = 40.0
             else:
@@ -125,48 +129,45 @@ class EO4HATemperatureSensor(EO4HASensor):
                 scale_min = 0.0; scale_max = 80.0
             temp_scale = float(scale_max - scale_min)
             temp_range = float(range_max - range_min)
-            result["status"] = (temp_scale / temp_range) * (float(packet.parsed["TMP"]["raw_value"]) - range_min) + scale_min
+            status = (temp_scale / temp_range) * (float(parsed["TMP"].raw_value) - range_min) + scale_min
 
-        return result
+        return ParseResult(packet.dBm, packet.repeater_count, status)
 
 
 class EO4HAWindowHandleSensor(EO4HASensor):
+    __slots__ = ()
+    STATE_NAME = "WIN"
 
-    def parse_packet(self, packet: RadioPacket):
-        LOGGER.debug(f"window_handle_sensor, {repr(self.eep)}, Device-ID: {to_hex_string(self.dev_id)}")
-        packet.parse_eep(rorg_func=self.eep.func, rorg_type=self.eep.func_type)
+    def parse(self, packet: RadioPacket) -> ParseResult | None:
+        if TRACER.active:
+            TRACER.trace("parse", self.dev_id, self.eep, entity="window_handle_sensor")
         match self.eep.rorg:
             case RORG.RPS:
                 return self._parse_f6_packet(packet)
 
     def _parse_f6_packet(self, packet):
         func = self.eep.func
-        func_type = self.eep.func_type
-        result = {
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
+        status = NO_STATUS
 
         if func == 0x10:
             action = (packet.data[1] & 0x70) >> 4
             if action == 0x07:
-                result["status"] = STATE_CLOSED
+                status = STATE_CLOSED
             elif action in (0x04, 0x06):
-                result["status"] = STATE_OPEN
+                status = STATE_OPEN
             elif action == 0x05:
-                result["status"] = STATE_TILT
+                status = STATE_TILT
 
-        return result
+        return ParseResult(packet.dBm, packet.repeater_count, status)
 
 
 class EO4HAShortcutSensor(EO4HASensor):
-
+    # no slot for shortcut, which keeps its class default
     shortcut: str|None = None
 
-    def parse_packet(self, packet: RadioPacket):
-        LOGGER.debug(f"Shortcut-Sensor, {repr(self.eep)}, Device-ID: {to_hex_string(self.dev_id)}")
+    def parse(self, packet: RadioPacket) -> ParseResult | None:
+        if TRACER.active:
+            TRACER.trace("parse", self.dev_id, self.eep, entity="shortcut_sensor", shortcut=self.shortcut)
         match packet.rorg:
             case RORG.BS4:
                 return self._parse_a5_packet(packet)
@@ -174,17 +175,11 @@ class EO4HAShortcutSensor(EO4HASensor):
     def _parse_a5_packet(self, packet):
         func = self.eep.func
         func_type = self.eep.func_type
-        result = {
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
 
         if func == 0x20 and func_type == 0x06:
-            packet.parse_eep(rorg_func=func, rorg_type=func_type, direction=1)
-            if self.shortcut in packet.parsed:
-                if self.shortcut == "LO" and packet.parsed["LOM"]["raw_value"] == 1:
+            parsed = self.decoder(packet)
+            if self.shortcut in parsed:
+                if self.shortcut == "LO" and parsed["LOM"].raw_value == 1:
                     range_min = 0.0
                     range_max = 80.0
                     scale_min = 0.0
@@ -192,13 +187,15 @@ class EO4HAShortcutSensor(EO4HASensor):
                     temp_scale = float(scale_max - scale_min)
                     temp_range = float(range_max - range_min)
                     val = (temp_scale / temp_range) * (
-                                float(packet.parsed["LO"]["raw_value"]) - range_min) + scale_min
-                    result["status"] = f"{val} °C"
-                elif self.shortcut == "LO" and packet.parsed["LOM"]["raw_value"] == 0:
-                    val = packet.parsed["LO"]["raw_value"]
-                    result["status"] = f"{val if val <= 5 else val - 128} °C"
+                                float(parsed["LO"].raw_value) - range_min) + scale_min
+                    status = f"{val} °C"
+                elif self.shortcut == "LO" and parsed["LOM"].raw_value == 0:
+                    val = parsed["LO"].raw_value
+                    status = f"{val if val <= 5 else val - 128} °C"
                 else:
-                    result["status"] = packet.parsed[self.shortcut]["value"]
-                result["extra_state_attr"]["raw_value"] = packet.parsed[self.shortcut]["raw_value"]
+                    status = parsed[self.shortcut].value
+                return ParseResult(
+                    packet.dBm, packet.repeater_count, status, (("raw_value", parsed[self.shortcut].raw_value),)
+                )
 
-        return result
+        return ParseResult(packet.dBm, packet.repeater_count)
@@ -0,0 +1,334 @@
+""" Simulated USB300 dongle on a pseudo-terminal, for tests without hardware.
+
+    The gateway opens the path of the simulator like a real dongle:
+
+        async with VirtualDongle() as dongle:
+            dongle.add_actuator([0x01, 0x94, 0xE3, 0xB9], channels=2)
+            dongle.add_traffic((0xA5, 0x02, 0x05), [0x01, 0x82, 0x5D, 0xAB], interval=0.1)
+            gateway = EnOceanGateway(hass, dongle.path, use_asyncio=True)
+            await gateway.load()
+
+    The simulator answers the base id and version commands, confirms every
+    radio telegram, plays D2-01 actuators, which answer CMD 1, 3, 0xB and
+    0xC, and emits scripted or random telegrams of other devices.
+    It runs in the event loop, or standalone for soak tests of another process:
+
+        python -m enocean4ha_bridge.simulator --actuator 0194E3B9/2 --traffic A5-02-05/01825DAB/0.1
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import pty
+import random
+import tty
+from typing import Any, Iterable, NamedTuple
+
+from enocean.protocol.constants import COMMON_COMMAND, PACKET, PARSE_RESULT, RETURN_CODE, RORG
+from enocean.protocol.packet import Packet
+from enocean.utils import to_hex_string
+
+from .common import EEPInfo, dev_id_to_int
+from .frames import generate_frames
+
+LOGGER = logging.getLogger('enocean.ha.simulator')
+
+DEFAULT_BASE_ID = [0xFF, 0x80, 0x00, 0x00]
+DEFAULT_DBM = 0x40
+# application version, API version, chip id, chip version and description of CO_RD_VERSION
+VERSION = (
+    [0x02, 0x0B, 0x01, 0x00], [0x02, 0x06, 0x03, 0x00], [0x01, 0x00, 0x00, 0x00], [0x45, 0x4F, 0x01, 0x03],
+    b"EO4HA simulator\0"
+)
+
+# D2-01 commands, EEP.xml doesn't describe all of them, so they are handled on the bit level
+CMD_SET_OUTPUT = 0x01
+CMD_STATUS_QUERY = 0x03
+CMD_STATUS_RESPONSE = 0x04
+CMD_SET_EXTERNAL_INTERFACE = 0x0B
+CMD_EXTERNAL_INTERFACE_QUERY = 0x0C
+CMD_EXTERNAL_INTERFACE_RESPONSE = 0x0D
+ALL_CHANNELS = 0x1E
+# error level "not supported" of the status response
+_ERROR_LEVEL_NOT_SUPPORTED = 0x60
+# AOT, DOT, DAT, EDT and the timer settings of a channel
+_DEFAULT_INTERFACE_SETTINGS = [0x00, 0x12, 0x00, 0x34, 0x41]
+
+
+class SimulatorStats(NamedTuple):
+    # ESP3 frames received from and sent to the host
+    frames_in: int
+    frames_out: int
+    # actuator commands received and answered, and commands lost on purpose
+    commands: int
+    replies: int
+    lost: int
+
+    def as_dict(self) -> dict[str, int]:
+        return self._asdict()
+
+
+class SimulatedActuator:
+    """ D2-01 actuator with output values and external interface settings per channel """
+
+    def __init__(self, dev_id: list[int], channels: int = 1, reply_delay: float = 0.0, loss: float = 0.0):
+        self.dev_id = list(dev_id)
+        self.outputs = [0] * channels
+        self.interface_settings = [list(_DEFAULT_INTERFACE_SETTINGS) for _ in range(channels)]
+        # seconds until the answer, and the probability of a lost command
+        self.reply_delay = reply_delay
+        self.loss = loss
+
+    def _channels(self, io: int) -> range:
+        if io == ALL_CHANNELS:
+            return range(len(self.outputs))
+        return range(io, min(io + 1, len(self.outputs)))
+
+    def handle(self, data: list[int]) -> list[list[int]]:
+        """ Apply a command (the user data of a VLD telegram) and return the user data of the answers """
+        command = data[1] & 0x0F
+        io = data[2] & 0x1F
+        if command == CMD_SET_OUTPUT and len(data) > 3:
+            for channel in self._channels(io):
+                self.outputs[channel] = data[3] & 0x7F
+            return [self._status(channel) for channel in self._channels(io)]
+        if command == CMD_STATUS_QUERY:
+            return [self._status(channel) for channel in self._channels(io)]
+        if command == CMD_SET_EXTERNAL_INTERFACE:
+            for channel in self._channels(io):
+                self.interface_settings[channel] = list(data[3:3 + len(_DEFAULT_INTERFACE_SETTINGS)])
+            return []
+        if command == CMD_EXTERNAL_INTERFACE_QUERY:
+            return [
+                [RORG.VLD, CMD_EXTERNAL_INTERFACE_RESPONSE, channel] + self.interface_settings[channel]
+                for channel in self._channels(io)
+            ]
+        return []
+
+    def _status(self, channel: int) -> list[int]:
+        return [RORG.VLD, CMD_STATUS_RESPONSE, _ERROR_LEVEL_NOT_SUPPORTED | channel, self.outputs[channel]]
+
+
+class VirtualDongle:
+    """ ESP3 dongle on the master side of a pseudo-terminal, path is the side for the gateway.
+
+        Must be started and used in the event loop.
+    """
+
+    def __init__(self, base_id: list[int] = DEFAULT_BASE_ID, seed: int = 0):
+        self.base_id = list(base_id)
+        self._random = random.Random(seed)
+        self._master: int | None = None
+        self._slave: int | None = None
+        self._buffer = bytearray()
+        self._out = bytearray()
+        self._actuators: dict[int, SimulatedActuator] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.frames_in = self.frames_out = 0
+        self.commands = self.replies = self.lost = 0
+
+    @property
+    def path(self) -> str:
+        if self._slave is None:
+            raise RuntimeError("VirtualDongle isn't started")
+        return os.ttyname(self._slave)
+
+    @property
+    def stats(self) -> SimulatorStats:
+        return SimulatorStats(self.frames_in, self.frames_out, self.commands, self.replies, self.lost)
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self._loop.add_reader(self._master, self._read_ready)
+        LOGGER.info(f"Virtual dongle {to_hex_string(self.base_id)} at {self.path}")
+
+    def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        if self._master is not None:
+            self._loop.remove_reader(self._master)
+            self._loop.remove_writer(self._master)
+            os.close(self._master)
+            os.close(self._slave)
+            self._master = self._slave = None
+
+    async def __aenter__(self) -> "VirtualDongle":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.stop()
+
+    def add_actuator(self, dev_id: list[int], channels: int = 1, reply_delay: float = 0.0,
+                     loss: float = 0.0) -> SimulatedActuator:
+        actuator = SimulatedActuator(dev_id, channels, reply_delay, loss)
+        self._actuators[dev_id_to_int(dev_id)] = actuator
+        return actuator
+
+    def add_traffic(self, eep: Iterable[int], sender: list[int], interval: float, command: int | None = None,
+                    fields: dict[str, Any] | None = None, variants: int = 64) -> None:
+        """ Send a telegram with random values of the profile every interval seconds """
+        frames = generate_frames(
+            EEPInfo(*eep), variants, command, fields, self._random.randrange(1 << 32), sender, self.base_id
+        )
+        self._spawn(self._traffic(itertools.cycle(frames), interval))
+
+    def play(self, script: Iterable[tuple[float, bytes]]) -> asyncio.Task:
+        """ Send ESP3 frames after the given delays in seconds, e.g. the records of a capture file """
+        return self._spawn(self._play(script))
+
+    def send_telegram(self, data: list[int], sender: list[int], status: int = 0, dBm: int = DEFAULT_DBM,
+                      destination: list[int] | None = None) -> None:
+        """ Send a received radio telegram (user data including the RORG) to the host """
+        optional = [0x01] + list(destination or [0xFF, 0xFF, 0xFF, 0xFF]) + [dBm, 0x00]
+        self._write(bytes(Packet(PACKET.RADIO_ERP1, list(data) + list(sender) + [status], optional).build()))
+
+    def _spawn(self, coroutine) -> asyncio.Task:
+        task = self._loop.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _traffic(self, frames: Iterable[bytes], interval: float) -> None:
+        for frame in frames:
+            await asyncio.sleep(interval)
+            self._write(frame)
+
+    async def _play(self, script: Iterable[tuple[float, bytes]]) -> None:
+        for delay, frame in script:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._write(frame)
+
+    def _write(self, frame: bytes) -> None:
+        if self._master is None:
+            return
+        self.frames_out += 1
+        if self._out:
+            self._out.extend(frame)
+            return
+        try:
+            written = os.write(self._master, frame)
+        except BlockingIOError:
+            written = 0
+        if written < len(frame):
+            # the host doesn't read fast enough, keep the rest until the pty is writable again
+            self._out.extend(frame[written:])
+            self._loop.add_writer(self._master, self._write_ready)
+
+    def _write_ready(self) -> None:
+        try:
+            written = os.write(self._master, self._out)
+        except BlockingIOError:
+            return
+        del self._out[:written]
+        if not self._out:
+            self._loop.remove_writer(self._master)
+
+    def _read_ready(self) -> None:
+        try:
+            self._buffer.extend(os.read(self._master, 4096))
+        except (BlockingIOError, OSError):
+            return
+        while True:
+            status, remaining, packet = Packet.parse_msg(self._buffer)
+            self._buffer = bytearray(remaining)
+            if status == PARSE_RESULT.INCOMPLETE:
+                return
+            if status == PARSE_RESULT.OK and packet is not None:
+                self.frames_in += 1
+                self._handle(packet)
+
+    def _respond(self, data: list[int], optional: list[int] | None = None) -> None:
+        self._write(bytes(Packet(PACKET.RESPONSE, data, optional or []).build()))
+
+    def _handle(self, packet: Packet) -> None:
+        if packet.packet_type == PACKET.COMMON_COMMAND:
+            match packet.data[0]:
+                case COMMON_COMMAND.CO_RD_IDBASE:
+                    # the remaining write cycles of the base id
+                    self._respond([RETURN_CODE.OK] + self.base_id, [0xFF])
+                case COMMON_COMMAND.CO_RD_VERSION:
+                    app_version, api_version, chip_id, chip_version, description = VERSION
+                    self._respond(
+                        [RETURN_CODE.OK] + app_version + api_version + chip_id + chip_version + list(description)
+                    )
+                case _:
+                    self._respond([RETURN_CODE.NOT_SUPPORTED])
+            return
+        if packet.packet_type != PACKET.RADIO_ERP1:
+            self._respond([RETURN_CODE.NOT_SUPPORTED])
+            return
+
+        self._respond([RETURN_CODE.OK])
+        actuator = self._actuators.get(dev_id_to_int(packet.optional[1:5])) if len(packet.optional) >= 5 else None
+        if actuator is None or packet.data[0] != RORG.VLD:
+            return
+        self.commands += 1
+        if actuator.loss and self._random.random() < actuator.loss:
+            self.lost += 1
+            return
+        # the sender of the command, usually the base id of the dongle
+        destination = list(packet.data[-5:-1])
+        answers = actuator.handle(list(packet.data[:-5]))
+        if actuator.reply_delay:
+            self._loop.call_later(actuator.reply_delay, self._answer, actuator, answers, destination)
+        else:
+            self._answer(actuator, answers, destination)
+
+    def _answer(self, actuator: SimulatedActuator, answers: list[list[int]], destination: list[int]) -> None:
+        for data in answers:
+            self.replies += 1
+            self.send_telegram(data, actuator.dev_id, dBm=self._random.randrange(0x30, 0x60), destination=destination)
+
+
+def _dev_id(text: str) -> list[int]:
+    return list(bytes.fromhex(text.replace(":", "")))
+
+
+async def _run(args: argparse.Namespace) -> None:
+    async with VirtualDongle(_dev_id(args.base_id), args.seed) as dongle:
+        for actuator in args.actuator:
+            dev_id, _, channels = actuator.partition("/")
+            dongle.add_actuator(_dev_id(dev_id), int(channels or 1), args.reply_delay, args.loss)
+        for traffic in args.traffic:
+            eep, dev_id, interval = traffic.split("/")
+            dongle.add_traffic([int(part, 16) for part in eep.split("-")], _dev_id(dev_id), float(interval))
+        print(dongle.path, flush=True)
+        try:
+            while True:
+                await asyncio.sleep(args.report or 3600)
+                if args.report:
+                    LOGGER.info(f"{dongle.stats}")
+        finally:
+            LOGGER.info(f"{dongle.stats}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0].strip())
+    parser.add_argument("--base-id", default="FF800000")
+    parser.add_argument("--actuator", action="append", default=[], help="D2-01 actuator as DEVID[/CHANNELS]")
+    parser.add_argument("--traffic", action="append", default=[], help="random telegrams as EEP/DEVID/INTERVAL")
+    parser.add_argument("--reply-delay", type=float, default=0.0, help="seconds until an actuator answers")
+    parser.add_argument("--loss", type=float, default=0.0, help="probability of a lost actuator command")
+    parser.add_argument("--report", type=float, default=0.0, help="log the counters every REPORT seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,159 @@
+""" Snapshot of the last known state of the entities, to restore them right after a restart.
+
+    The file starts with SNAPSHOT_MAGIC, followed by fixed-size records:
+    sender (4 bytes), RORG, FUNC, TYPE, channel (0xFF for none), the name
+    of the state within the entities of the same channel (e.g. the
+    shortcut), the time of the state (double), the type and length of the
+    value and the value itself. A changed state overwrites the record of
+    its key in place, so each update writes a single record. On load the
+    file is memory-mapped.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Iterable, NamedTuple
+
+from .common import dev_id_to_int
+
+LOGGER = logging.getLogger('enocean.ha.snapshot')
+
+SNAPSHOT_MAGIC = b"EO4HASNP\x01\x00\x00\x00\x00\x00\x00\x00"
+# states, which didn't change, are written again after this many seconds, to update their time
+DEFAULT_MIN_INTERVAL = 60.0
+
+_NAME_SIZE = 8
+_VALUE_SIZE = 38
+_RECORD = struct.Struct(f"<4s3sB{_NAME_SIZE}sdBB{_VALUE_SIZE}s")
+_NO_CHANNEL = 0xFF
+_NONE, _BOOL, _INT, _FLOAT, _STR, _JSON = range(6)
+_INT_VALUE = struct.Struct("<q")
+_FLOAT_VALUE = struct.Struct("<d")
+
+
+class SnapshotEntry(NamedTuple):
+    value: Any
+    timestamp: float
+
+
+def _encode(value: Any) -> tuple[int, bytes]:
+    if value is None:
+        return _NONE, b""
+    if isinstance(value, bool):
+        return _BOOL, bytes([value])
+    if isinstance(value, int):
+        return _INT, _INT_VALUE.pack(value)
+    if isinstance(value, float):
+        return _FLOAT, _FLOAT_VALUE.pack(value)
+    if isinstance(value, str):
+        return _STR, value.encode()
+    return _JSON, json.dumps(value, separators=(",", ":")).encode()
+
+
+def _decode(kind: int, data: bytes) -> Any:
+    if kind == _BOOL:
+        return bool(data[0])
+    if kind == _INT:
+        return _INT_VALUE.unpack(data)[0]
+    if kind == _FLOAT:
+        return _FLOAT_VALUE.unpack(data)[0]
+    if kind == _STR:
+        return data.decode()
+    if kind == _JSON:
+        return json.loads(data)
+    return None
+
+
+def _key(dev_id: list[int] | bytes, eep: Iterable[int], channel: int | None, name: str) -> tuple:
+    return dev_id_to_int(dev_id), tuple(eep)[:3], _NO_CHANNEL if channel is None else channel, name
+
+
+class StateSnapshot:
+    """ The last state per (sender, EEP, channel, name), kept in memory and in a snapshot file.
+
+        update() may be called from any thread.
+    """
+
+    def __init__(self, path: str, min_interval: float = DEFAULT_MIN_INTERVAL):
+        self.path = path
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._entries: dict[tuple, SnapshotEntry] = {}
+        # key -> offset of its record in the file
+        self._offsets: dict[tuple, int] = {}
+        self._load()
+        self._file = open(path, "r+b")
+        self.writes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < len(SNAPSHOT_MAGIC):
+            with open(self.path, "wb") as file:
+                file.write(SNAPSHOT_MAGIC)
+            return
+        with open(self.path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                raise ValueError(f"{self.path} is no state snapshot")
+            end = len(SNAPSHOT_MAGIC) + (len(data) - len(SNAPSHOT_MAGIC)) // _RECORD.size * _RECORD.size
+            for offset in range(len(SNAPSHOT_MAGIC), end, _RECORD.size):
+                sender, eep, channel, name, timestamp, kind, length, value = _RECORD.unpack_from(data, offset)
+                try:
+                    key = (int.from_bytes(sender, "big"), tuple(eep), channel, name.rstrip(b"\0").decode())
+                    self._entries[key] = SnapshotEntry(_decode(kind, value[:length]), timestamp)
+                except (ValueError, IndexError, struct.error) as exception:
+                    LOGGER.warning(f"Skipping broken snapshot record at {offset}: {exception}")
+                    continue
+                self._offsets[key] = offset
+        if end < os.path.getsize(self.path):
+            # a record was cut off, e.g. by a power loss, the next one is appended in its place
+            LOGGER.warning(f"Dropping the incomplete last record of {self.path}")
+            os.truncate(self.path, end)
+        LOGGER.debug(f"Loaded {len(self._entries)} states from {self.path}")
+
+    def get(self, dev_id: list[int] | bytes, eep: Iterable[int], channel: int | None = None,
+            name: str = "") -> SnapshotEntry | None:
+        return self._entries.get(_key(dev_id, eep, channel, name))
+
+    def update(self, dev_id: list[int] | bytes, eep: Iterable[int], channel: int | None, value: Any,
+               name: str = "", timestamp: float | None = None) -> bool:
+        """ Remember a state, returns True if its record was written """
+        key = _key(dev_id, eep, channel, name)
+        timestamp = time.time() if timestamp is None else timestamp
+        previous = self._entries.get(key)
+        if previous is not None and previous.value == value and timestamp - previous.timestamp < self.min_interval:
+            return False
+        kind, data = _encode(value)
+        encoded_name = name.encode()
+        if len(data) > _VALUE_SIZE or len(encoded_name) > _NAME_SIZE:
+            LOGGER.debug(f"State {name} {value!r} is too long for the snapshot")
+            return False
+        record = _RECORD.pack(
+            key[0].to_bytes(4, "big"), bytes(key[1]), key[2], encoded_name, timestamp, kind, len(data), data
+        )
+        with self._lock:
+            if self._file.closed:
+                return False
+            offset = self._offsets.get(key)
+            if offset is None:
+                offset = self._offsets[key] = self._file.seek(0, os.SEEK_END)
+            os.pwrite(self._file.fileno(), record, offset)
+            self._entries[key] = SnapshotEntry(value, timestamp)
+            self.writes += 1
+        return True
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                os.fsync(self._file.fileno())
+                self._file.close()
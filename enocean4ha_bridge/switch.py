@@ -5,19 +5,20 @@ from typing import Any
 
 from enocean.protocol.constants import PACKET, RORG
 from enocean.protocol.packet import RadioPacket
-from enocean.utils import to_hex_string
 
 from . import EnOceanGateway
-from .common import EEPInfo
+from .entity import NO_STATUS, EO4HAEntity, ParseResult
+from .metering import decode_meter
+from .trace import TRACER
 
 LOGGER = logging.getLogger('enocean.ha.switch')
 
 
-class EO4HASwitch:
+class EO4HASwitch(EO4HAEntity):
+    __slots__ = ("channel",)
+
     gateway: EnOceanGateway
     channel: int|None
-    eep: EEPInfo
-    dev_id: list[int]
 
     # noinspection PyUnusedLocal
     def turn_on(self, **kwargs: Any) -> None:
@@ -50,8 +51,9 @@ class EO4HASwitch:
                 OV=0x00,  # Output value. 0x00 = OFF
             )
 
-    def parse_packet(self, packet: RadioPacket):
-        LOGGER.debug(f"switch, {repr(self.eep)}, Device-ID: {to_hex_string(self.dev_id)}")
+    def parse(self, packet: RadioPacket) -> ParseResult | None:
+        if TRACER.active:
+            TRACER.trace("parse", self.dev_id, self.eep, entity="switch")
         match packet.rorg:
             case RORG.BS4:
                 return self._parse_a5_packet(packet)
@@ -61,45 +63,34 @@ class EO4HASwitch:
     def _parse_a5_packet(self, packet):
         func = self.eep.func
         func_type = self.eep.func_type
-        result = {
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
 
         if func == 0x12 and func_type == 0x01:
-            packet.parse_eep(rorg_func=self.eep.func, rorg_type=self.eep.func_type)
-            if packet.parsed["DT"]["raw_value"] == 1:  # ==> means meter reading is current value
-                watts = packet.parsed["MR"]["raw_value"] / (10 ** packet.parsed["DIV"]["raw_value"])
-                result["status"] = bool(watts > 1)
-                result["extra_state_attr"].update({'current_value': watts})
+            reading = decode_meter(packet)
+            if reading is not None and not reading.cumulative:
+                watts = reading.value
+                return ParseResult(packet.dBm, packet.repeater_count, bool(watts > 1), (('current_value', watts),))
 
-        return result
+        return ParseResult(packet.dBm, packet.repeater_count)
 
     def _parse_d2_packet(self, packet):
         func = self.eep.func
-        func_type = self.eep.func_type
-        result = {
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
+        status = NO_STATUS
+        attributes = ()
 
         if func == 0x01:
-            packet.parse_eep(rorg_func=self.eep.func, rorg_type=self.eep.func_type, command=packet.data[1])
-            if packet.parsed["CMD"]["raw_value"] == 4:
-                channel = packet.parsed["IO"]["raw_value"]
-                output = packet.parsed["OV"]["raw_value"]
+            parsed = self.decoder(packet)
+            if parsed["CMD"].raw_value == 4:
+                channel = parsed["IO"].raw_value
+                output = parsed["OV"].raw_value
                 if channel == self.channel:
-                    result["status"] = bool(output > 0)
-                    result["extra_state_attr"].update({
-                        "error_level": packet.parsed["EL"]["value"],
-                        "over_current": packet.parsed["OC"]["value"],
-                        "power_failure": packet.parsed["PF"]["value"],
-                        "power_failure_detection": packet.parsed["PFD"]["value"],
-                    })
-            elif packet.parsed["CMD"]["raw_value"] == 7:
-                LOGGER.debug(packet.parsed)
-        return result
+                    status = bool(output > 0)
+                    attributes = (
+                        ("error_level", parsed["EL"].value),
+                        ("over_current", parsed["OC"].value),
+                        ("power_failure", parsed["PF"].value),
+                        ("power_failure_detection", parsed["PFD"].value),
+                    )
+            elif parsed["CMD"].raw_value == 7:
+                if TRACER.active:
+                    TRACER.trace("status", self.dev_id, self.eep, entity="switch", command=7, parsed=parsed)
+        return ParseResult(packet.dBm, packet.repeater_count, status, attributes)
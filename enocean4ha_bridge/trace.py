@@ -0,0 +1,109 @@
+""" Tracing of the per packet path into a ring buffer, instead of the log.
+
+    The call sites check TRACER.active first, so with tracing disabled no
+    message is built at all:
+
+        if TRACER.active:
+            TRACER.trace("parse", self.dev_id, self.eep, entity="switch")
+
+    Tracing can be enabled for all devices, single devices or single EEPs
+    at runtime, and the buffer is dumped on demand.
+"""
+
+import logging
+import time
+from collections import deque
+from typing import Any, Iterable, NamedTuple
+
+from enocean.utils import to_hex_string
+
+from .common import EEPInfo, dev_id_to_int
+
+LOGGER = logging.getLogger('enocean.ha.trace')
+
+DEFAULT_TRACE_SIZE = 1024
+
+
+class TraceRecord(NamedTuple):
+    time: float
+    event: str
+    dev_id: int | None
+    eep: EEPInfo | None
+    details: dict[str, Any]
+
+    def __str__(self):
+        dev_id = to_hex_string(list(self.dev_id.to_bytes(4, "big"))) if self.dev_id is not None else "-"
+        eep = repr(EEPInfo(*self.eep)) if self.eep is not None else "-"
+        details = ", ".join(f"{name}={value}" for name, value in self.details.items())
+        timestamp = f"{time.strftime('%H:%M:%S', time.localtime(self.time))}.{int(self.time % 1 * 1000):03d}"
+        return f"{timestamp} {self.event} {dev_id} {eep} {details}"
+
+
+class Tracer:
+    """ Ring buffer of the trace records of the enabled devices and EEPs """
+
+    def __init__(self, maxsize: int = DEFAULT_TRACE_SIZE):
+        self._records: deque[TraceRecord] = deque(maxlen=maxsize)
+        self._all = False
+        self._devices: set[int] = set()
+        self._eeps: set[tuple[int, int, int]] = set()
+        # checked by the call sites before anything else is done
+        self.active = False
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def maxsize(self) -> int:
+        return self._records.maxlen
+
+    def enable(self, dev_id: list[int] | None = None, eep: Iterable[int] | None = None) -> None:
+        """ Trace a device, an EEP (rorg, func, type), or everything if neither is given """
+        if dev_id is None and eep is None:
+            self._all = True
+        if dev_id is not None:
+            self._devices.add(dev_id_to_int(dev_id))
+        if eep is not None:
+            self._eeps.add(tuple(eep))
+        self.active = True
+
+    def disable(self, dev_id: list[int] | None = None, eep: Iterable[int] | None = None) -> None:
+        """ Stop tracing a device, an EEP, or everything if neither is given """
+        if dev_id is None and eep is None:
+            self._all = False
+            self._devices.clear()
+            self._eeps.clear()
+        if dev_id is not None:
+            self._devices.discard(dev_id_to_int(dev_id))
+        if eep is not None:
+            self._eeps.discard(tuple(eep))
+        self.active = self._all or bool(self._devices) or bool(self._eeps)
+
+    def traced(self, dev_id: list[int] | None, eep: tuple[int, int, int] | None = None) -> bool:
+        if self._all:
+            return True
+        if dev_id is not None and dev_id_to_int(dev_id) in self._devices:
+            return True
+        return eep is not None and eep in self._eeps
+
+    def trace(self, event: str, dev_id: list[int] | None = None, eep: tuple[int, int, int] | None = None,
+              **details: Any) -> None:
+        """ Add a record, if the device or the EEP is traced """
+        if self.traced(dev_id, eep):
+            self._records.append(TraceRecord(
+                time.time(), event, dev_id_to_int(dev_id) if dev_id is not None else None, eep, details
+            ))
+
+    def dump(self, clear: bool = False) -> list[TraceRecord]:
+        """ Return the buffered records, the oldest first """
+        records = list(self._records)
+        if clear:
+            self._records.clear()
+        return records
+
+    def dump_to_log(self, logger: logging.Logger = LOGGER, level: int = logging.INFO, clear: bool = False) -> None:
+        for record in self.dump(clear):
+            logger.log(level, str(record))
+
+
+TRACER = Tracer()
@@ -5,19 +5,19 @@ from typing import Any
 
 from enocean.protocol.constants import PACKET, RORG
 from enocean.protocol.packet import RadioPacket
-from enocean.utils import to_hex_string
 
 from . import EnOceanGateway
-from .common import EEPInfo
+from .entity import EO4HAEntity, ParseResult
+from .trace import TRACER
 
 LOGGER = logging.getLogger('enocean.ha.valve')
 
 
-class EO4HAValve:
+class EO4HAValve(EO4HAEntity):
+    __slots__ = ("channel",)
+
     gateway: EnOceanGateway
     channel: int|None
-    eep: EEPInfo
-    dev_id: list[int]
 
     # noinspection PyUnusedLocal
     def turn_on(self, **kwargs: Any) -> None:
@@ -50,8 +50,9 @@ class EO4HAValve:
                 OV=0x00,  # Output value. 0x00 = OFF
             )
 
-    def parse_packet(self, packet: RadioPacket):
-        LOGGER.debug(f"valve, {repr(self.eep)}, Device-ID: {to_hex_string(self.dev_id)}")
+    def parse(self, packet: RadioPacket) -> ParseResult | None:
+        if TRACER.active:
+            TRACER.trace("parse", self.dev_id, self.eep, entity="valve")
         match self.eep.rorg:
             case RORG.BS4:
                 return self._parse_a5_packet(packet)
@@ -59,18 +60,11 @@ class EO4HAValve:
     def _parse_a5_packet(self, packet):
         func = self.eep.func
         func_type = self.eep.func_type
-        result = {
-            "extra_state_attr": {
-                "dBm": packet.dBm,
-                "repeater_count": packet.repeater_count
-            }
-        }
 
         if func == 0x20 and func_type == 0x06:
-            packet.parse_eep(rorg_func=self.eep.func, rorg_type=self.eep.func_type, direction=1)
-            result["status"] = packet.parsed["CV"]["raw_value"]
-            result["extra_state_attr"].update({
-                "CV": packet.parsed["CV"]["raw_value"],
-            })
+            parsed = self.decoder(packet)
+            return ParseResult(
+                packet.dBm, packet.repeater_count, parsed["CV"].raw_value, (("CV", parsed["CV"].raw_value),)
+            )
 
-        return result
+        return ParseResult(packet.dBm, packet.repeater_count)
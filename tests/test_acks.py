@@ -0,0 +1,133 @@
+import asyncio
+import concurrent.futures
+
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import Packet, RadioPacket
+
+from enocean4ha_bridge.acks import AckTracker
+from enocean4ha_bridge.channel_groups import ALL_CHANNELS
+
+DEV_ID = [0x01, 0x94, 0xE3, 0xB9]
+BASE_ID = [0xFF, 0x80, 0x00, 0x00]
+
+
+def set_output(channel: int, value: int) -> RadioPacket:
+    return RadioPacket(
+        PACKET.RADIO_ERP1, [RORG.VLD, 0x01, channel, value] + BASE_ID + [0x00], [0x03] + DEV_ID + [0xFF, 0x00]
+    )
+
+
+def status(channel: int, value: int) -> RadioPacket:
+    return RadioPacket(
+        PACKET.RADIO_ERP1, [RORG.VLD, 0x04, 0x60 | channel, value] + DEV_ID + [0x00], [0x00] + BASE_ID + [0x40, 0x00]
+    )
+
+
+def test_status_telegram_confirms_command():
+    async def run():
+        tracker = AckTracker(asyncio.get_running_loop(), timeout=1.0)
+        future = concurrent.futures.Future()
+        tracker.track(DEV_ID, 0, future, lambda: None)
+        tracker.transmitted(set_output(0, 100))
+        tracker.received(status(0, 100))
+        return future.result(0), tracker.stats()
+
+    result, stats = asyncio.run(run())
+    assert result.confirmed
+    assert result.attempts == 1
+    assert result.value == 100
+    assert stats["confirmed"] == 1
+    assert stats["pending"] == 0
+
+
+def test_status_of_other_channel_is_ignored():
+    async def run():
+        tracker = AckTracker(asyncio.get_running_loop(), timeout=1.0)
+        future = concurrent.futures.Future()
+        tracker.track(DEV_ID, 0, future, lambda: None)
+        tracker.transmitted(set_output(0, 100))
+        tracker.received(status(1, 100))
+        done = future.done()
+        tracker.cancel_all()
+        return done
+
+    assert not asyncio.run(run())
+
+
+def test_late_status_after_timeout_before_resend():
+    async def run():
+        tracker = AckTracker(asyncio.get_running_loop(), timeout=0.01)
+        future = concurrent.futures.Future()
+        resent = []
+        tracker.track(DEV_ID, 0, future, lambda: resent.append(True))
+        tracker.transmitted(set_output(0, 100))
+        await asyncio.sleep(0.05)
+        # the retransmission is queued, but not sent yet, when the late status arrives
+        tracker.received(status(0, 100))
+        tracker.transmitted(set_output(0, 100))
+        return resent, future.result(0), tracker.stats()
+
+    resent, result, stats = asyncio.run(run())
+    assert resent == [True]
+    assert result.confirmed
+    assert result.attempts == 1
+    assert stats == {"pending": 0, "confirmed": 1, "retried": 1, "failed": 0}
+
+
+def test_unanswered_command_fails_after_retries():
+    async def run():
+        loop = asyncio.get_running_loop()
+        tracker = AckTracker(loop, timeout=0.01, retries=1, backoff=1.0)
+        future = concurrent.futures.Future()
+        tracker.track(DEV_ID, 0, future, lambda: loop.call_soon(tracker.transmitted, set_output(0, 100)))
+        tracker.transmitted(set_output(0, 100))
+        return await asyncio.wait_for(asyncio.wrap_future(future), 1.0)
+
+    result = asyncio.run(run())
+    assert not result.confirmed
+    assert result.attempts == 2
+
+
+def test_confirm_from_status_packet_of_parse_msg():
+    packet = Packet.create(PACKET.RADIO_ERP1, RORG.VLD, 0x01, 0x12, command=4, sender=DEV_ID, IO=2, OV=42)
+    _, _, received = Packet.parse_msg(bytearray(packet.build()))
+
+    async def run():
+        tracker = AckTracker(asyncio.get_running_loop(), timeout=1.0)
+        future = concurrent.futures.Future()
+        tracker.track(DEV_ID, 2, future, lambda: None)
+        tracker.transmitted(set_output(2, 42))
+        tracker.received(received)
+        return future.result(0)
+
+    assert asyncio.run(run()).value == 42
+
+
+def test_status_of_all_channels_confirms_each_channel():
+    async def run():
+        tracker = AckTracker(asyncio.get_running_loop(), timeout=1.0)
+        futures = [concurrent.futures.Future() for _ in range(3)]
+        for channel, future in enumerate(futures):
+            tracker.track(DEV_ID, channel, future, lambda: None)
+        tracker.transmitted(set_output(ALL_CHANNELS, 100))
+        tracker.received(status(ALL_CHANNELS, 100))
+        return [future.result(0) for future in futures], tracker.stats()
+
+    results, stats = asyncio.run(run())
+    assert all(result.confirmed and result.value == 100 for result in results)
+    assert stats["confirmed"] == 3
+    assert stats["pending"] == 0
+
+
+def test_status_of_a_channel_confirms_command_for_all_channels():
+    async def run():
+        tracker = AckTracker(asyncio.get_running_loop(), timeout=1.0)
+        future = concurrent.futures.Future()
+        tracker.track(DEV_ID, ALL_CHANNELS, future, lambda: None)
+        tracker.transmitted(set_output(ALL_CHANNELS, 0))
+        tracker.received(status(1, 0))
+        return future.result(0), tracker.stats()
+
+    result, stats = asyncio.run(run())
+    assert result.confirmed
+    assert stats["pending"] == 0
@@ -0,0 +1,101 @@
+import pytest
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import RadioPacket
+
+from enocean4ha_bridge import EO4HATemperatureSensor
+from enocean4ha_bridge.capture import CAPTURE_MAGIC, CAPTURE_RECORD, CaptureFormatError, PacketRecorder
+from enocean4ha_bridge.common import EEPInfo
+from enocean4ha_bridge.dedup import DuplicateFilter
+
+np = pytest.importorskip("numpy")
+from enocean4ha_bridge.analysis import TelegramTable  # noqa: E402
+
+SENSOR = [0x01, 0x82, 0x5D, 0xAB]
+ROCKER = [0xFE, 0xF1, 0x2A, 0x07]
+TEMPERATURE = EEPInfo(0xA5, 0x02, 0x05)
+
+
+def radio_packet(data: list[int], sender: list[int], status: int = 0x00, dBm: int = 0x40) -> RadioPacket:
+    return RadioPacket(PACKET.RADIO_ERP1, data + sender + [status], [0x00, 0xFF, 0xFF, 0xFF, 0xFF, dBm, 0x00])
+
+
+@pytest.fixture
+def packets():
+    """ (receive time, packet): a temperature sensor every 60 s, each telegram also heard via a repeater,
+        and a rocker with a teach-in like 4BS telegram
+    """
+    packets = []
+    for index in range(10):
+        data = [RORG.BS4, 0x00, 0x00, 0xFF - index * 10, 0x08]
+        packets.append((index * 60.0, radio_packet(data, SENSOR, dBm=0x40 + index)))
+        packets.append((index * 60.0 + 0.1, radio_packet(data, SENSOR, status=0x01, dBm=0x50)))
+    packets.append((5.0, radio_packet([RORG.RPS, 0x30], ROCKER, status=0x30, dBm=0x45)))
+    packets.append((6.0, radio_packet([RORG.BS4, 0x00, 0x00, 0x80, 0x00], SENSOR)))
+    return sorted(packets, key=lambda entry: entry[0])
+
+
+@pytest.fixture
+def capture(tmp_path, packets):
+    path = str(tmp_path / "capture.bin")
+    recorder = PacketRecorder(path)
+    for timestamp, packet in packets:
+        recorder.record(packet, timestamp)
+    recorder.close()
+    return path
+
+
+def test_capture_and_packets_give_the_same_table(capture, packets):
+    from_capture = TelegramTable.from_capture(capture)
+    from_packets = TelegramTable.from_packets(packets)
+    assert len(from_capture) == len(packets)
+    for column in ("timestamp", "sender", "rorg", "status", "dBm", "length", "payload", "repeater_count"):
+        assert np.array_equal(getattr(from_capture, column), getattr(from_packets, column)), column
+
+
+def test_truncated_capture(capture):
+    with open(capture, "r+b") as file:
+        file.truncate(len(CAPTURE_MAGIC) + CAPTURE_RECORD.size + 3)
+    with pytest.raises(CaptureFormatError):
+        TelegramTable.from_capture(capture)
+
+
+def test_duplicates_match_the_duplicate_filter(packets):
+    table = TelegramTable.from_packets(packets)
+    clock = iter(timestamp for timestamp, _ in packets)
+    duplicate_filter = DuplicateFilter(clock=lambda: next(clock))
+    expected = [duplicate_filter.is_duplicate(packet) for _, packet in packets]
+    assert table.duplicates().tolist() == expected
+    assert sum(expected) == 10
+
+
+def test_sender_statistics(packets):
+    statistics = TelegramTable.from_packets(packets).sender_statistics()
+    assert statistics.sender.tolist() == [0x01825DAB, 0xFEF12A07]
+    assert statistics.copies.tolist() == [21, 1]
+    assert statistics.telegrams.tolist() == [11, 1]
+    assert statistics.duplicate_ratio[0] == pytest.approx(10 / 21)
+    # 11 telegrams within 540.1 s
+    assert statistics.telegrams_per_hour[0] == pytest.approx(10 * 3600 / 540.1)
+    assert (statistics.min_dBm[0], statistics.max_dBm[0]) == (-0x50, -0x40)
+    assert statistics.median_dBm[1] == -0x45
+    assert statistics.repeater_counts[0, :2].tolist() == [11, 10]
+
+
+def test_decode_matches_the_entity(packets):
+    table = TelegramTable.from_packets(packets)
+    values = table.decode(TEMPERATURE, "TMP", sender=0x01825DAB)
+    sensor = EO4HATemperatureSensor.__new__(EO4HATemperatureSensor)
+    sensor.dev_id = SENSOR
+    sensor.eep = TEMPERATURE
+    for value, (_, packet) in zip(values, packets):
+        result = sensor.parse(packet) if packet.rorg == RORG.BS4 and packet.data[4] & 0x08 else None
+        if result is None:
+            assert np.isnan(value)
+        else:
+            assert value == pytest.approx(result.status)
+
+
+def test_dBm_histogram(packets):
+    table = TelegramTable.from_packets(packets)
+    counts, edges = table.dBm_histogram(bins=[-0x60, -0x4A, 0], sender=0x01825DAB)
+    assert counts.tolist() == [10, 11]
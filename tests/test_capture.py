@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import RadioPacket
+
+from enocean4ha_bridge import EnOceanGateway, EO4HABinarySensor, EO4HASwitch
+from enocean4ha_bridge.capture import CaptureFormatError, PacketRecorder, ReplayDriver, read_capture
+from enocean4ha_bridge.common import EEPInfo
+from enocean4ha_bridge.simulator import VirtualDongle
+
+ROCKER = [0xFE, 0xF1, 0x2A, 0x07]
+ACTUATOR = [0x01, 0x94, 0xE3, 0xB9]
+OPTIONAL = [0x00, 0xFF, 0xFF, 0xFF, 0xFF, 0x40, 0x00]
+
+
+def rocker(action: int, status: int) -> RadioPacket:
+    return RadioPacket(PACKET.RADIO_ERP1, [RORG.RPS, action] + ROCKER + [status], list(OPTIONAL))
+
+
+def actuator_status(channel: int, value: int) -> RadioPacket:
+    return RadioPacket(PACKET.RADIO_ERP1, [RORG.VLD, 0x04, 0x60 | channel, value] + ACTUATOR + [0x00], list(OPTIONAL))
+
+
+@pytest.fixture
+def capture(tmp_path):
+    path = str(tmp_path / "capture.bin")
+    recorder = PacketRecorder(path)
+    for index in range(10):
+        recorder.record(rocker(0x30, 0x30), 1000.0 + index)
+        recorder.record(rocker(0x00, 0x20), 1000.2 + index)
+        recorder.record(actuator_status(0, index * 10), 1000.5 + index)
+    recorder.close()
+    return path
+
+
+def test_read_capture(capture):
+    records = list(read_capture(capture))
+    assert len(records) == 30
+    assert records[0][0] == 1000.0
+    assert bytes(rocker(0x30, 0x30).build()) == records[0][1]
+
+
+def test_read_capture_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"no capture")
+    with pytest.raises(CaptureFormatError):
+        list(read_capture(str(path)))
+
+
+def test_replay_rocker_switch_and_actuator(capture):
+    async def run():
+        async with VirtualDongle() as dongle:
+            gateway = EnOceanGateway(SimpleNamespace(loop=asyncio.get_running_loop()), dongle.path)
+            button = EO4HABinarySensor(gateway, ROCKER, [0xF6, 0x02, 0x01], "A0")
+            switch = EO4HASwitch.__new__(EO4HASwitch)
+            switch.gateway = gateway
+            switch.dev_id = ACTUATOR
+            switch.eep = EEPInfo(0xD2, 0x01, 0x12)
+            switch.channel = 0
+            driver = ReplayDriver(gateway, [button, switch])
+            try:
+                return await driver.run(capture, speed=None), driver.clock()
+            finally:
+                gateway.unload()
+
+    report, clock = asyncio.run(run())
+    assert report.frames == report.telegrams == 30
+    assert clock == 1009.5
+    calls = {name: calls for name, (calls, _) in report.entity_times.items()}
+    assert calls == {"EO4HABinarySensor FE:F1:2A:07": 20, "EO4HASwitch 01:94:E3:B9 #0": 10}
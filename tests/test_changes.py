@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import RadioPacket
+
+from enocean4ha_bridge import EO4HATemperatureSensor
+from enocean4ha_bridge.changes import ChangeDetector
+from enocean4ha_bridge.common import EEPInfo
+
+SENSOR = [0x01, 0x82, 0x5D, 0xAB]
+OPTIONAL = [0x00, 0xFF, 0xFF, 0xFF, 0xFF, 0x40, 0x00]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def detector(**kwargs):
+    clock = Clock()
+    return ChangeDetector(clock=clock, **kwargs), clock
+
+
+def test_first_value_is_reported():
+    changes, clock = detector()
+    assert changes.update(None)
+    assert not changes.update(None)
+    changes.reset()
+    assert changes.update(None)
+
+
+def test_deadband():
+    changes, clock = detector(deadband=0.2)
+    assert changes.update(21.0)
+    assert not changes.update(21.2)
+    assert changes.update(21.3)
+    # the value is compared to the last reported one, so slow drifts are reported as well
+    assert not changes.update(21.45)
+    assert changes.update(21.55)
+    assert changes.update(21.0)
+    assert changes.suppressed == 2
+
+
+def test_other_values_must_be_equal():
+    changes, clock = detector(deadband=1.0)
+    assert changes.update("open")
+    assert not changes.update("open")
+    assert changes.update("closed")
+    # booleans are no numbers, which differ within the deadband
+    assert changes.update(True)
+    assert changes.update(False)
+    assert not changes.update(False)
+
+
+def test_heartbeat():
+    changes, clock = detector(deadband=0.5, heartbeat=900.0)
+    changes.update(21.0)
+    clock.now = 899.0
+    assert not changes.update(21.0)
+    clock.now = 900.0
+    assert changes.update(21.0)
+    # the heartbeat starts again with each reported value
+    clock.now = 1500.0
+    assert changes.update(22.0)
+    clock.now = 2399.0
+    assert not changes.update(22.0)
+
+
+def test_without_heartbeat():
+    changes, clock = detector(heartbeat=None)
+    changes.update(21.0)
+    clock.now = 1e9
+    assert not changes.update(21.0)
+
+
+def temperature(raw_value: int) -> RadioPacket:
+    return RadioPacket(PACKET.RADIO_ERP1, [RORG.BS4, 0x00, 0x00, raw_value, 0x08] + SENSOR + [0x00], list(OPTIONAL))
+
+
+def test_entity_marks_repeated_readings():
+    sensor = EO4HATemperatureSensor.__new__(EO4HATemperatureSensor)
+    sensor.gateway = SimpleNamespace()
+    sensor.dev_id = SENSOR
+    sensor.eep = EEPInfo(0xA5, 0x02, 0x05)
+    changes, clock = detector(deadband=0.2)
+    sensor.change_detector = changes
+    assert "changed" not in sensor.parse_packet(temperature(0x80))
+    # 40 / 255 degrees per step
+    assert sensor.parse_packet(temperature(0x81))["changed"] is False
+    state = sensor.parse_packet(temperature(0x7E))
+    assert "changed" not in state
+    assert state["status"] == sensor.parse(temperature(0x7E)).status
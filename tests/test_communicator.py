@@ -0,0 +1,98 @@
+import asyncio
+import os
+import pty
+import tty
+
+import pytest
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import RadioPacket
+
+from enocean4ha_bridge.communicator import AsyncSerialCommunicator
+from enocean4ha_bridge.simulator import VirtualDongle
+
+BASE_ID = [0xFF, 0x81, 0x22, 0x00]
+SENDER = [0x01, 0x82, 0x5D, 0xAB]
+
+
+@pytest.fixture
+def silent_port():
+    """ Path of a pseudo-terminal, on which nobody answers """
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    yield os.ttyname(slave)
+    os.close(master)
+    os.close(slave)
+
+
+def test_base_id():
+    async def run():
+        async with VirtualDongle(base_id=BASE_ID) as dongle:
+            communicator = AsyncSerialCommunicator(dongle.path)
+            await communicator.start()
+            try:
+                base_id = await communicator.get_base_id()
+                frames_in = dongle.stats.frames_in
+                # the base id is asked only once
+                cached = await communicator.get_base_id()
+                return base_id, cached, dongle.stats.frames_in - frames_in, communicator.base_id
+            finally:
+                communicator.stop()
+
+    base_id, cached, requests, property_base_id = asyncio.run(run())
+    assert base_id == cached == property_base_id == BASE_ID
+    assert requests == 0
+
+
+def test_base_id_timeout(silent_port, caplog):
+    async def run():
+        communicator = AsyncSerialCommunicator(silent_port)
+        await communicator.start()
+        try:
+            return await communicator.get_base_id(timeout=0.05), communicator.base_id
+        finally:
+            communicator.stop()
+
+    assert asyncio.run(run()) == (None, None)
+    assert "didn't send its base id" in caplog.text
+
+
+def test_stop_ends_pending_base_id_request(silent_port):
+    async def run():
+        communicator = AsyncSerialCommunicator(silent_port)
+        await communicator.start()
+        request = asyncio.ensure_future(communicator.get_base_id(timeout=5.0))
+        await asyncio.sleep(0.01)
+        communicator.stop()
+        return await asyncio.wait_for(request, 1.0), communicator.is_running
+
+    assert asyncio.run(run()) == (None, False)
+
+
+def test_received_packets_reach_callback():
+    async def run():
+        received = []
+        async with VirtualDongle() as dongle:
+            communicator = AsyncSerialCommunicator(dongle.path, callback=received.append)
+            await communicator.start()
+            try:
+                for value in range(3):
+                    dongle.send_telegram([RORG.BS1, 0x08 | value], SENDER)
+                for _ in range(100):
+                    if len(received) >= 3:
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                communicator.stop()
+        return received
+
+    received = asyncio.run(run())
+    assert all(isinstance(packet, RadioPacket) for packet in received)
+    assert [packet.data[1] for packet in received] == [0x08, 0x09, 0x0A]
+    assert all(packet.sender == SENDER for packet in received)
+
+
+def test_send_needs_running_communicator(silent_port):
+    communicator = AsyncSerialCommunicator(silent_port)
+    assert not communicator.is_running
+    packet = RadioPacket(PACKET.RADIO_ERP1, [RORG.BS1, 0x08] + SENDER + [0x00], [0x03] + [0xFF] * 5 + [0x00])
+    assert not communicator.send(packet)
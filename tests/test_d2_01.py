@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import RadioPacket
+
+from enocean4ha_bridge import EO4HANumber, EO4HASelect, EO4HAShortcutSensor
+from enocean4ha_bridge.common import EEPInfo
+from enocean4ha_bridge.d2_01 import TIMER_UNCHANGED, InterfaceSettings, decode_interface_settings
+
+ACTUATOR = [0x01, 0x94, 0xE3, 0xB9]
+OPTIONAL = [0x00, 0xFF, 0xFF, 0xFF, 0xFF, 0x40, 0x00]
+EDT_OPTIONS = {"not used": 0, "switch": 1, "push button": 2, "auto detect": 3}
+
+
+def interface_response(channel: int, aot: int, dot: int, flags: int) -> RadioPacket:
+    data = [RORG.VLD, 0x0D, channel, aot >> 8, aot & 0xFF, dot >> 8, dot & 0xFF, flags]
+    return RadioPacket(PACKET.RADIO_ERP1, data + ACTUATOR + [0x00], list(OPTIONAL))
+
+
+def entity(cls, **attributes):
+    entity = cls.__new__(cls)
+    entity.gateway = None
+    entity.dev_id = ACTUATOR
+    entity.eep = EEPInfo(0xD2, 0x01, 0x12)
+    for name, value in attributes.items():
+        setattr(entity, name, value)
+    return entity
+
+
+def test_decode_interface_settings():
+    assert decode_interface_settings(interface_response(1, 0x0012, 0xFFFF, 0xA0)) == InterfaceSettings(
+        1, 0x12, 0xFFFF, 2, 1
+    )
+
+
+def test_decode_interface_settings_ignores_other_commands():
+    status = RadioPacket(PACKET.RADIO_ERP1, [RORG.VLD, 0x04, 0x60, 0x64] + ACTUATOR + [0x00], list(OPTIONAL))
+    assert decode_interface_settings(status) is None
+
+
+def test_number_parses_timer_in_seconds():
+    number = entity(EO4HANumber, channel=0, shortcut="DOT")
+    assert number.parse(interface_response(0, 0x0012, 0x0034, 0x40)).status == 5.2
+    assert not number.parse(interface_response(1, 0x0012, 0x0034, 0x40)).has_status
+
+
+def test_select_parses_option():
+    select = entity(EO4HASelect, channel=0, shortcut="EDT", select_options_dict=EDT_OPTIONS)
+    assert select.parse(interface_response(0, 0x0012, 0x0034, 0x80)).status == "push button"
+
+
+def test_home_assistant_attributes_keep_class_defaults():
+    class NumberEntity:
+        """ Stands in for the Home Assistant NumberEntity with its class default """
+        _attr_native_value = None
+
+    class Number(EO4HANumber, NumberEntity):
+        pass
+
+    commands = []
+    number = entity(Number, channel=0, shortcut="DOT")
+    number.gateway = SimpleNamespace(send_command=lambda **command: commands.append(command))
+    assert number._attr_native_value is None
+    asyncio.run(number.async_set_native_value(2.5))
+    assert number._attr_native_value == 2.5
+    assert commands[0]["DOT"] == 25
+    assert commands[0]["AOT"] == TIMER_UNCHANGED
+
+
+def test_shortcut_sensor_default():
+    sensor = EO4HAShortcutSensor.__new__(EO4HAShortcutSensor)
+    assert sensor.shortcut is None
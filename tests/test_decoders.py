@@ -0,0 +1,154 @@
+import random
+
+import pytest
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import Packet, RadioPacket
+
+from enocean4ha_bridge.common import EEPInfo, parse_cache, parse_eep
+from enocean4ha_bridge.decoders import SUPPORTED_FUNCS, field_position, get_decoder
+
+SENDER = [0x05, 0x11, 0x22, 0x33]
+OPTIONAL = [0x00, 0xFF, 0xFF, 0xFF, 0xFF, 0x40, 0x00]
+
+
+def radio_packet(data: list[int], status: int = 0x00) -> RadioPacket:
+    return RadioPacket(PACKET.RADIO_ERP1, data + SENDER + [status], list(OPTIONAL))
+
+
+def test_parse_eep_is_cached(monkeypatch):
+    calls = []
+    parse = Packet.parse_eep
+
+    def counting_parse(packet, *args, **kwargs):
+        calls.append(kwargs)
+        return parse(packet, *args, **kwargs)
+
+    monkeypatch.setattr(Packet, "parse_eep", counting_parse)
+    packet = radio_packet([RORG.BS4, 0x00, 0x00, 0x80, 0x08])
+    parsed = parse_eep(packet, 0x02, 0x05)
+    assert parse_eep(packet, 0x02, 0x05) is parsed
+    assert len(calls) == 1
+    assert parsed["TMP"]["raw_value"] == 0x80
+    # another profile is parsed again
+    parse_eep(packet, 0x02, 0x14)
+    assert len(calls) == 2
+
+
+def test_decoders_share_the_parse_cache():
+    packet = radio_packet([RORG.BS4, 0x00, 0x00, 0x80, 0x08])
+    decoder = get_decoder(EEPInfo(0xA5, 0x02, 0x05))
+    assert get_decoder(EEPInfo(0xA5, 0x02, 0x05)) is decoder
+    decoded = decoder(packet)
+    assert decoder(packet) is decoded
+    assert decoded["TMP"].raw_value == 0x80
+    parsed = parse_eep(packet, 0x02, 0x05)
+    # both results are kept side by side
+    assert len(parse_cache(packet)) == 2
+    assert decoder(packet) is decoded
+    assert parse_eep(packet, 0x02, 0x05) is parsed
+
+
+def _profiles():
+    """ (eep, direction, command) of every profile of the supported FUNCs in EEP.xml """
+    profiles = []
+    for rorg, func in sorted(SUPPORTED_FUNCS):
+        for func_type, profile in sorted(Packet.eep.telegrams.get(rorg, {}).get(func, {}).items()):
+            eep = EEPInfo(rorg, func, func_type)
+            directions = sorted({int(data['direction']) for data in profile.find_all('data') if data.get('direction')})
+            if profile.find('command', recursive=False) is None:
+                commands = [None]
+            else:
+                commands = sorted({int(data['command']) for data in profile.find_all('data') if data.get('command')})
+            for direction in directions or [None]:
+                profiles.extend((eep, direction, command) for command in commands)
+    return profiles
+
+
+def _profile_id(profile) -> str:
+    eep, direction, command = profile
+    return "-".join(
+        [f"{eep.rorg:02X}-{eep.func:02X}-{eep.func_type:02X}"]
+        + ([f"direction{direction}"] if direction is not None else [])
+        + ([f"cmd{command}"] if command is not None else [])
+    )
+
+
+PROFILES = _profiles()
+
+
+def _fields(eep: EEPInfo, direction, command) -> dict[str, int]:
+    """ shortcut -> the index of the last byte in packet.data, 0 for status fields """
+    profile = Packet.eep.find_profile(eep.rorg, eep.func, eep.func_type, direction, command)
+    return {
+        field['shortcut']: field_position(field)[1] if field.name != 'status' else 0
+        for field in profile.contents if field.name in ('value', 'enum', 'status')
+    }
+
+
+def _telegrams(eep: EEPInfo, length: int, command) -> list[tuple[list[int], int]]:
+    """ (data, status) with all bits cleared, all bits set, and random bits """
+    rng = random.Random(f"{eep!r} {command}")
+    telegrams = [([0x00] * length, 0x00), ([0xFF] * length, 0xFF)]
+    telegrams += [([rng.randrange(256) for _ in range(length)], rng.randrange(256)) for _ in range(30)]
+    if command is not None:
+        for data, _ in telegrams:
+            data[0] = data[0] & 0xF0 | command
+    return telegrams
+
+
+def _reference(data: list[int], status: int, eep: EEPInfo, direction, command) -> dict[str, tuple]:
+    packet = radio_packet(data, status)
+    provides = packet.parse_eep(eep.func, eep.func_type, direction, command)
+    return {shortcut: (packet.parsed[shortcut]['raw_value'], packet.parsed[shortcut]['value']) for shortcut in provides}
+
+
+def _decoded(data: list[int], status: int, eep: EEPInfo, direction) -> dict[str, tuple]:
+    decoded = get_decoder(eep, direction)(radio_packet(data, status))
+    return {shortcut: (field.raw_value, field.value) for shortcut, field in decoded.items()}
+
+
+@pytest.mark.parametrize("profile", PROFILES, ids=map(_profile_id, PROFILES))
+def test_decoder_matches_parse_eep(profile):
+    eep, direction, command = profile
+    # RPS, 1BS and 4BS telegrams have a fixed size, VLD ones end with the last field
+    length = {RORG.RPS: 1, RORG.BS1: 1, RORG.BS4: 4}.get(eep.rorg) or max(_fields(eep, direction, command).values())
+    for data, status in _telegrams(eep, length, command):
+        assert _decoded([eep.rorg] + data, status, eep, direction) == _reference(
+            [eep.rorg] + data, status, eep, direction, command
+        ), (data, status)
+
+
+@pytest.mark.parametrize(
+    "profile", [profile for profile in PROFILES if profile[0].rorg == RORG.VLD],
+    ids=map(_profile_id, [profile for profile in PROFILES if profile[0].rorg == RORG.VLD])
+)
+def test_decoder_skips_fields_after_short_frame(profile):
+    """ Packet.parse_eep() reads the bits of a short VLD frame, which are there, or fails. The decoder
+        leaves out the fields, which don't fit into the frame.
+    """
+    eep, direction, command = profile
+    fields = _fields(eep, direction, command)
+    length = max(fields.values())
+    for data, status in _telegrams(eep, length, command):
+        full = _decoded([eep.rorg] + data, status, eep, direction)
+        for end in range(1, length):
+            assert _decoded([eep.rorg] + data[:end], status, eep, direction) == {
+                shortcut: value for shortcut, value in full.items() if fields[shortcut] <= end
+            }
+
+
+def test_status_fields():
+    # T21 and NU of a pressed rocker
+    data, status = [RORG.RPS, 0x30], 0x30
+    decoded = _decoded(data, status, EEPInfo(0xF6, 0x02, 0x01), None)
+    assert decoded["T21"] == (1, True)
+    assert decoded["NU"] == (1, True)
+    assert decoded == _reference(data, status, EEPInfo(0xF6, 0x02, 0x01), None, None)
+
+
+def test_enum_range_items():
+    # IO of CMD 4 is an enum with a range item for the channels
+    data = [RORG.VLD, 0x04, 0x65, 0x64]
+    decoded = _decoded(data, 0x00, EEPInfo(0xD2, 0x01, 0x12), None)
+    assert decoded["IO"] == (5, "Output channel 5 (to load)")
+    assert decoded == _reference(data, 0x00, EEPInfo(0xD2, 0x01, 0x12), None, 4)
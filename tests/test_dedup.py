@@ -0,0 +1,80 @@
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import Packet, RadioPacket
+
+from enocean4ha_bridge.dedup import DuplicateFilter, LinkQuality, fingerprint
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def telegram(sender: list[int], value: int = 0x08, repeated: int = 0, dBm: int = 60) -> RadioPacket:
+    return RadioPacket(
+        PACKET.RADIO_ERP1, [RORG.BS1, value] + sender + [repeated], [0x00, 0xFF, 0xFF, 0xFF, 0xFF, dBm, 0x00]
+    )
+
+
+SENDER = [0x01, 0x82, 0x5D, 0xAB]
+OTHER = [0x01, 0x82, 0x5D, 0xAC]
+
+
+def duplicate_filter(**kwargs):
+    clock = Clock()
+    return DuplicateFilter(clock=clock, **kwargs), clock
+
+
+def test_fingerprint_ignores_the_repeater_count():
+    original = telegram(SENDER)
+    assert fingerprint(telegram(SENDER, repeated=0x01)) == fingerprint(original)
+    assert fingerprint(telegram(SENDER, repeated=0x0F)) == fingerprint(original)
+    assert fingerprint(telegram(SENDER, repeated=0x20)) != fingerprint(original)
+    assert fingerprint(telegram(SENDER, value=0x09)) != fingerprint(original)
+    assert fingerprint(telegram(OTHER)) != fingerprint(original)
+    # other packets are compared as a whole
+    response = Packet(PACKET.RESPONSE, [0x00])
+    assert fingerprint(response) == (PACKET.RESPONSE, (0x00,))
+
+
+def test_window():
+    dedup, clock = duplicate_filter()
+    assert not dedup.is_duplicate(telegram(SENDER))
+    clock.now = 0.5
+    assert dedup.is_duplicate(telegram(SENDER, repeated=0x01))
+    clock.now = 1.1
+    # too late for a copy, the sender repeated its telegram
+    assert not dedup.is_duplicate(telegram(SENDER))
+    # another telegram of the sender replaces the latest one
+    assert not dedup.is_duplicate(telegram(SENDER, value=0x09))
+    assert not dedup.is_duplicate(telegram(SENDER))
+    assert dedup.duplicates == 1
+
+
+def test_best_copy_is_kept():
+    dedup, clock = duplicate_filter()
+    dedup.is_duplicate(telegram(SENDER, dBm=80))
+    dedup.is_duplicate(telegram(SENDER, repeated=0x01, dBm=60))
+    dedup.is_duplicate(telegram(SENDER, repeated=0x02, dBm=70))
+    # dBm is the negated RSSI, the highest is the strongest signal
+    assert dedup.link_quality(SENDER) == LinkQuality(-60, 1)
+    assert dedup.copies(SENDER) == 3
+    assert dedup.link_quality(OTHER) is None
+    assert dedup.copies(OTHER) == 0
+
+
+def test_least_recently_heard_sender_is_dropped():
+    dedup, clock = duplicate_filter(maxsize=2)
+    third = [0x01, 0x82, 0x5D, 0xAD]
+    dedup.is_duplicate(telegram(SENDER))
+    dedup.is_duplicate(telegram(OTHER))
+    # a copy counts as heard
+    assert dedup.is_duplicate(telegram(SENDER))
+    dedup.is_duplicate(telegram(third))
+    assert len(dedup) == 2
+    assert dedup.copies(OTHER) == 0
+    assert dedup.copies(SENDER) == 2
+    assert not dedup.is_duplicate(telegram(OTHER))
+    assert dedup.copies(SENDER) == 0
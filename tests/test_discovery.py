@@ -0,0 +1,100 @@
+import asyncio
+import os
+
+import pytest
+
+from enocean4ha_bridge.discovery import DongleCandidate, DongleDiscovery
+
+CANDIDATES = [
+    DongleCandidate("/dev/serial/by-id/usb-EnOcean_GmbH_USB300-if00-port0", "/dev/ttyUSB0", "USB300"),
+    DongleCandidate("/dev/ttyAMA0", "/dev/ttyAMA0", "EnOcean Pi"),
+]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def watched(tmp_path):
+    directory = tmp_path / "dev"
+    directory.mkdir()
+    return directory
+
+
+def changed(directory) -> None:
+    """ A device was plugged in or removed """
+    stat = os.stat(directory)
+    os.utime(directory, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def discovery(directory, valid: set[str]):
+    calls = {"scan": 0, "probe": []}
+    clock = Clock()
+
+    def scan():
+        calls["scan"] += 1
+        return list(CANDIDATES)
+
+    def probe(path):
+        calls["probe"].append(path)
+        return path in valid
+
+    return DongleDiscovery((str(directory),), scan, probe, failure_ttl=5.0, clock=clock), calls, clock
+
+
+def test_scan_is_cached_until_a_change(watched):
+    dongles, calls, _ = discovery(watched, set())
+    assert dongles.detect() == CANDIDATES
+    assert dongles.detect() == CANDIDATES
+    assert calls["scan"] == 1
+    changed(watched)
+    dongles.detect()
+    assert calls["scan"] == 2
+    dongles.invalidate()
+    dongles.detect()
+    assert calls["scan"] == 3
+
+
+def test_valid_probe_is_cached_until_a_change(watched):
+    dongles, calls, clock = discovery(watched, {CANDIDATES[0].path})
+    assert dongles.validate(CANDIDATES[0].path)
+    clock.now = 3600.0
+    assert dongles.validate(CANDIDATES[0].path)
+    assert len(calls["probe"]) == 1
+    changed(watched)
+    assert dongles.validate(CANDIDATES[0].path)
+    assert len(calls["probe"]) == 2
+
+
+def test_failed_probe_is_repeated(watched):
+    valid = set()
+    dongles, calls, clock = discovery(watched, valid)
+    assert not dongles.validate("/dev/ttyUSB1")
+    clock.now = 4.0
+    assert not dongles.validate("/dev/ttyUSB1")
+    assert len(calls["probe"]) == 1
+    # the port was busy, and can be opened now
+    valid.add("/dev/ttyUSB1")
+    clock.now = 5.0
+    assert dongles.validate("/dev/ttyUSB1")
+    assert len(calls["probe"]) == 2
+
+
+def test_async_detect_returns_the_valid_candidates(watched):
+    valid = {CANDIDATES[1].path}
+    dongles, calls, clock = discovery(watched, valid)
+    assert asyncio.run(dongles.async_detect()) == [CANDIDATES[1]]
+    assert sorted(calls["probe"]) == sorted(candidate.path for candidate in CANDIDATES)
+    assert asyncio.run(dongles.async_detect()) == [CANDIDATES[1]]
+    assert len(calls["probe"]) == 2
+    valid.add(CANDIDATES[0].path)
+    clock.now = 10.0
+    assert asyncio.run(dongles.async_detect()) == CANDIDATES
+    assert calls["scan"] == 1
+    assert asyncio.run(dongles.async_validate(CANDIDATES[0].path))
+    assert len(calls["probe"]) == 3
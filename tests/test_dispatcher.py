@@ -0,0 +1,82 @@
+import asyncio
+import subprocess
+import sys
+from types import ModuleType, SimpleNamespace
+
+from enocean4ha_bridge.dispatcher import (
+    HomeAssistantDispatcher, LocalDispatcher, create_dispatcher, is_home_assistant,
+)
+
+
+class HomeAssistant:
+    """ Stands in for homeassistant.core.HomeAssistant """
+
+
+HomeAssistant.__module__ = "homeassistant.core"
+
+
+class CustomHomeAssistant(HomeAssistant):
+    pass
+
+
+def test_is_home_assistant():
+    assert is_home_assistant(HomeAssistant())
+    assert is_home_assistant(CustomHomeAssistant())
+    assert not is_home_assistant(SimpleNamespace(loop=None))
+    assert not is_home_assistant(None)
+
+
+def test_create_dispatcher(monkeypatch):
+    calls = []
+    helpers = ModuleType("homeassistant.helpers.dispatcher")
+    helpers.async_dispatcher_connect = lambda hass, signal, target: calls.append(("connect", hass, signal)) or "handle"
+    helpers.async_dispatcher_send = lambda hass, signal, *args: calls.append(("send", hass, signal, args))
+    monkeypatch.setitem(sys.modules, "homeassistant.helpers.dispatcher", helpers)
+    hass = HomeAssistant()
+    dispatcher = create_dispatcher(hass)
+    assert isinstance(dispatcher, HomeAssistantDispatcher)
+    assert dispatcher.connect("signal", print) == "handle"
+    dispatcher.send("signal", 1, 2)
+    assert calls == [("connect", hass, "signal"), ("send", hass, "signal", (1, 2))]
+    assert isinstance(create_dispatcher(SimpleNamespace(loop=None)), LocalDispatcher)
+
+
+def test_local_dispatcher():
+    async def run():
+        dispatcher = LocalDispatcher()
+        received = []
+
+        async def coroutine(value):
+            received.append(("coroutine", value))
+
+        def broken(value):
+            raise ValueError("broken target")
+
+        disconnect = dispatcher.connect("signal", lambda value: received.append(("target", value)))
+        dispatcher.connect("signal", broken)
+        dispatcher.connect("signal", coroutine)
+        dispatcher.connect("other", lambda value: received.append(("other", value)))
+        # a broken target doesn't stop the others, coroutines run as tasks
+        dispatcher.send("signal", 1)
+        await asyncio.sleep(0)
+        disconnect()
+        disconnect()
+        dispatcher.send("signal", 2)
+        await asyncio.sleep(0)
+        dispatcher.send("unknown", 3)
+        return received
+
+    assert asyncio.run(run()) == [("target", 1), ("coroutine", 1), ("coroutine", 2)]
+
+
+def test_bridge_imports_without_home_assistant():
+    # a fresh interpreter, in which homeassistant can't be imported even if it's installed
+    code = (
+        "import sys\n"
+        "sys.modules['homeassistant'] = None\n"
+        "import enocean4ha_bridge\n"
+        "from enocean4ha_bridge.dispatcher import LocalDispatcher, create_dispatcher\n"
+        "assert isinstance(create_dispatcher(object()), LocalDispatcher)\n"
+        "assert [name for name in sys.modules if name.startswith('homeassistant.')] == []\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
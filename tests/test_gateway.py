@@ -0,0 +1,110 @@
+import asyncio
+from types import SimpleNamespace
+
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import RadioPacket
+
+from enocean4ha_bridge import EnOceanGateway
+from enocean4ha_bridge.constants import SIGNAL_RECEIVE_MESSAGE
+from enocean4ha_bridge.simulator import VirtualDongle
+
+SENSOR = [0x01, 0x82, 0x5D, 0xAB]
+UNKNOWN = [0x01, 0x82, 0x5D, 0xAC]
+OPTIONAL = [0x00, 0xFF, 0xFF, 0xFF, 0xFF, 0x40, 0x00]
+TEMPERATURE_DATA = [RORG.BS4, 0x00, 0x00, 0x80, 0x08]
+# the learn bit of DB0 is cleared
+TEACH_IN_DATA = [RORG.BS4, 0x08, 0x28, 0x46, 0x80]
+
+
+def telegram(data: list[int], sender: list[int] = SENSOR, repeated: int = 0) -> RadioPacket:
+    return RadioPacket(PACKET.RADIO_ERP1, data + sender + [repeated], list(OPTIONAL))
+
+
+def run_with_gateway(test):
+    """ Run test(gateway, calls) with a gateway, whose routing steps append their names to calls """
+    async def run():
+        async with VirtualDongle() as dongle:
+            gateway = EnOceanGateway(SimpleNamespace(loop=asyncio.get_running_loop()), dongle.path, use_asyncio=True)
+            calls = []
+
+            def traced(name, method):
+                def wrapper(*args):
+                    calls.append(name)
+                    return method(*args)
+                return wrapper
+
+            gateway.duplicate_filter.is_duplicate = traced("dedup", gateway.duplicate_filter.is_duplicate)
+            gateway.link_quality_tracker.record = traced("link_quality", gateway.link_quality_tracker.record)
+            gateway.ack_tracker.received = traced("ack", gateway.ack_tracker.received)
+            gateway.poll_scheduler.received = traced("poll", gateway.poll_scheduler.received)
+            gateway.metering.received = traced("metering", gateway.metering.received)
+            gateway.dispatcher.connect(SIGNAL_RECEIVE_MESSAGE, lambda packet: calls.append("broadcast"))
+            return test(gateway, calls)
+
+    return asyncio.run(run())
+
+
+def test_known_sender():
+    def test(gateway, calls):
+        gateway.register_receiver(SENSOR, lambda packet: calls.append("receiver"))
+        gateway.route_packet(telegram(TEMPERATURE_DATA))
+        return calls
+
+    assert run_with_gateway(test) == ["dedup", "link_quality", "ack", "poll", "metering", "receiver"]
+
+
+def test_copy_only_updates_the_link_quality():
+    def test(gateway, calls):
+        gateway.register_receiver(SENSOR, lambda packet: calls.append("receiver"))
+        gateway.route_packet(telegram(TEMPERATURE_DATA))
+        del calls[:]
+        gateway.route_packet(telegram(TEMPERATURE_DATA, repeated=1))
+        return calls, gateway.link_quality_tracker.stats(SENSOR).samples
+
+    calls, samples = run_with_gateway(test)
+    assert calls == ["dedup", "link_quality"]
+    assert samples == 2
+
+
+def test_unknown_sender_is_broadcast():
+    def test(gateway, calls):
+        gateway.register_receiver(SENSOR, lambda packet: calls.append("receiver"))
+        gateway.route_packet(telegram(TEMPERATURE_DATA, UNKNOWN))
+        return calls
+
+    assert run_with_gateway(test) == ["dedup", "link_quality", "ack", "poll", "metering", "broadcast"]
+
+
+def test_teach_in_is_broadcast():
+    def test(gateway, calls):
+        gateway.register_receiver(SENSOR, lambda packet: calls.append("receiver"))
+        gateway.route_packet(telegram(TEACH_IN_DATA))
+        return calls
+
+    assert run_with_gateway(test)[-2:] == ["receiver", "broadcast"]
+
+
+def test_telegram_consumer_replaces_consume():
+    def test(gateway, calls):
+        gateway.telegram_consumer = lambda packet: calls.append("consumer")
+        gateway.route_packet(telegram(TEMPERATURE_DATA))
+        return calls
+
+    assert run_with_gateway(test) == ["dedup", "link_quality", "consumer", "broadcast"]
+
+
+def test_receivers_may_unregister_while_called():
+    def test(gateway, calls):
+        received = []
+
+        def once(packet):
+            received.append("once")
+            unregister()
+
+        unregister = gateway.register_receiver(SENSOR, once)
+        gateway.register_receiver(SENSOR, lambda packet: received.append("always"))
+        gateway.route_packet(telegram(TEMPERATURE_DATA))
+        gateway.route_packet(telegram([RORG.BS4, 0x00, 0x00, 0x81, 0x08]))
+        return received
+
+    assert run_with_gateway(test) == ["once", "always", "always"]
@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import RadioPacket
+
+from enocean4ha_bridge import EO4HATemperatureSensor
+from enocean4ha_bridge.common import EEPInfo
+from enocean4ha_bridge.link_quality import LinkQualitySummary, LinkQualityTracker
+
+SENDER = [0x01, 0x82, 0x5D, 0xAB]
+OTHER = [0x01, 0x82, 0x5D, 0xAC]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def telegram(dBm: int, repeated: int = 0, sender: list[int] = SENDER) -> RadioPacket:
+    # optional[5] holds the RSSI, packet.dBm is its negative
+    return RadioPacket(
+        PACKET.RADIO_ERP1, [RORG.BS1, 0x08] + sender + [repeated], [0x00, 0xFF, 0xFF, 0xFF, 0xFF, -dBm, 0x00]
+    )
+
+
+def tracker(**kwargs):
+    clock = Clock()
+    return LinkQualityTracker(clock=clock, **kwargs), clock
+
+
+def test_summary():
+    links, clock = tracker()
+    assert links.stats(SENDER) is None
+    for now, dBm, repeated, duplicate in [(0.0, -70, 0, False), (0.1, -60, 1, True), (60.0, -80, 0, False)]:
+        clock.now = now
+        links.record(telegram(dBm, repeated), duplicate)
+    assert links.stats(SENDER) == LinkQualitySummary(3, -80, -70.0, -60, {0: 2, 1: 1}, 60.0, 60.0)
+    assert links.stats(SENDER).as_dict() == {
+        "min_dBm": -80, "avg_dBm": -70.0, "max_dBm": -60, "repeater_histogram": {0: 2, 1: 1}, "last_seen": 60.0,
+        "telegrams_per_hour": 60.0,
+    }
+
+
+def test_ring_buffer_wraps_around():
+    links, clock = tracker(size=4)
+    for index in range(10):
+        clock.now = index * 10.0
+        links.record(telegram(-50 - index, repeated=index % 2))
+    summary = links.stats(SENDER)
+    # only the latest 4 copies are kept
+    assert (summary.samples, summary.min_dBm, summary.max_dBm, summary.avg_dBm) == (4, -59, -56, -57.5)
+    assert summary.repeater_histogram == {0: 2, 1: 2}
+    assert summary.last_seen == 90.0
+    assert summary.telegrams_per_hour == pytest.approx(360.0)
+
+
+def test_recent_dBm():
+    links, clock = tracker(size=4)
+    assert links.recent_dBm(SENDER) is None
+    links.record(telegram(-60))
+    assert links.recent_dBm(SENDER) == -60.0
+    for dBm in (-70, -80, -90, -50):
+        links.record(telegram(dBm))
+    assert links.recent_dBm(SENDER) == -72.5
+    assert links.recent_dBm(SENDER, samples=2) == -70.0
+    assert links.recent_dBm(SENDER, samples=1) == -50.0
+
+
+def test_summary_is_refreshed_after_the_interval():
+    links, clock = tracker(refresh_interval=300.0)
+    links.record(telegram(-60))
+    summary = links.summary(SENDER)
+    clock.now = 299.0
+    links.record(telegram(-80))
+    assert links.summary(SENDER) is summary
+    clock.now = 300.0
+    assert links.summary(SENDER).samples == 2
+    assert links.summary(OTHER) is None
+
+
+def test_least_recently_heard_sender_is_dropped():
+    third = [0x01, 0x82, 0x5D, 0xAD]
+    links, clock = tracker(maxsize=2)
+    links.record(telegram(-60))
+    links.record(telegram(-60, sender=OTHER))
+    links.record(telegram(-60))
+    links.record(telegram(-60, sender=third))
+    assert len(links) == 2
+    assert links.stats(OTHER) is None
+    assert links.stats(SENDER).samples == 2
+    links.forget(SENDER)
+    assert links.stats(SENDER) is None
+    assert len(links) == 1
+
+
+def test_entity_reports_the_summary():
+    links, clock = tracker()
+    links.summary_attributes = True
+    sensor = EO4HATemperatureSensor.__new__(EO4HATemperatureSensor)
+    sensor.gateway = SimpleNamespace(link_quality_tracker=links)
+    sensor.dev_id = SENDER
+    sensor.eep = EEPInfo(0xA5, 0x02, 0x05)
+    packet = RadioPacket(PACKET.RADIO_ERP1, [RORG.BS4, 0x00, 0x00, 0x80, 0x08] + SENDER + [0x00], [0x00] * 5 + [60, 0])
+    # a sender without summary reports the link quality of the telegram
+    assert sensor.parse_packet(packet)["extra_state_attr"] == {"dBm": -60, "repeater_count": 0}
+    links.record(packet)
+    assert sensor.parse_packet(packet)["extra_state_attr"] == links.stats(SENDER).as_dict()
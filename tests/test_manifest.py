@@ -0,0 +1,126 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import RadioPacket
+
+from enocean4ha_bridge import EO4HABinarySensor, EO4HANumber, EO4HASwitch, EO4HATemperatureSensor
+from enocean4ha_bridge.common import EEPInfo, EO4HAEEPNotSupportedError, EO4HAError
+from enocean4ha_bridge.manifest import build_entities, load_manifest, parse_manifest
+
+ACTUATOR = "01:94:E3:B9"
+SENSOR = [0x05, 0x11, 0x22, 0x33]
+OPTIONAL = [0x00, 0xFF, 0xFF, 0xFF, 0xFF, 0x40, 0x00]
+
+DEVICES = [
+    {
+        "id": ACTUATOR, "eep": "D2-01-12", "poll": True,
+        "entities": [
+            {"platform": "switch", "channel": 0},
+            {"platform": "switch", "channel": 1},
+            {"platform": "number", "channel": 0, "shortcut": "AOT"},
+        ],
+    },
+    {"id": "FE:F1:2A:07", "eep": "F6-02-01", "entities": [{"platform": "binary_sensor", "button": "A0"}]},
+    {"id": SENSOR, "eep": [0xA5, 0x02, 0x05], "entities": [{"platform": "sensor", "kind": "temperature"}]},
+]
+
+
+def gateway():
+    calls = SimpleNamespace(receivers=[], channels={}, polled=[], meters=[])
+    return SimpleNamespace(
+        calls=calls,
+        register_receiver=lambda dev_id, receiver: calls.receivers.append((tuple(dev_id), receiver)),
+        set_device_channels=lambda dev_id, channels: calls.channels.__setitem__(tuple(dev_id), set(channels)),
+        poll_device=lambda dev_id, eep, channels: calls.polled.append((tuple(dev_id), eep, set(channels))),
+        add_meter=lambda dev_id: calls.meters.append(tuple(dev_id)),
+    )
+
+
+def test_parse_manifest():
+    entries = parse_manifest(DEVICES)
+    assert [entry.dev_id for entry in entries] == [[0x01, 0x94, 0xE3, 0xB9], [0xFE, 0xF1, 0x2A, 0x07], SENSOR]
+    assert entries[0].eep == EEPInfo(0xD2, 0x01, 0x12)
+    assert [entry.poll for entry in entries] == [True, False, False]
+
+
+def test_unsupported_eeps_are_reported_together():
+    devices = DEVICES + [
+        # a supported FUNC with a TYPE, which EEP.xml doesn't describe
+        {"id": "05:11:22:34", "eep": "A5-02-7F"},
+        {"id": "05:11:22:35", "eep": "A5-02-7F"},
+        {"id": "05:11:22:36", "eep": "A5-3F-7F"},
+    ]
+    with pytest.raises(EO4HAEEPNotSupportedError) as error:
+        parse_manifest(devices)
+    assert error.value.eeps == (EEPInfo(0xA5, 0x02, 0x7F), EEPInfo(0xA5, 0x3F, 0x7F))
+
+
+@pytest.mark.parametrize("device", [
+    {"eep": "F6-02-01"},
+    {"id": "01:02:03", "eep": "F6-02-01"},
+    {"id": ACTUATOR, "eep": "D2-01"},
+    {"id": ACTUATOR, "eep": "D2-01-12", "entities": [{"platform": "cover", "channel": 0}]},
+    {"id": ACTUATOR, "eep": "D2-01-12", "entities": [{"platform": "sensor", "kind": "pressure"}]},
+    {"id": ACTUATOR, "eep": "D2-01-12", "entities": [{"platform": "switch"}]},
+    {"id": ACTUATOR, "eep": "D2-01-12", "entities": [{"platform": "switch", "channel": "first"}]},
+    {"id": ACTUATOR, "eep": "D2-01-12", "entities": [{"platform": "number", "channel": 0}]},
+    {"id": ACTUATOR, "eep": "D2-01-12", "entities": [{"platform": "select", "channel": 0, "shortcut": "AOT"}]},
+    {"id": "05:11:22:33", "eep": "A5-20-06", "entities": [{"platform": "sensor"}]},
+    {"id": "FE:F1:2A:07", "eep": "F6-02-01", "entities": [{"platform": "binary_sensor", "button": "C0"}]},
+], ids=[
+    "no id", "short id", "short eep", "unknown platform", "unknown sensor kind", "no channel", "invalid channel",
+    "number without shortcut", "select with other shortcut", "shortcut sensor without shortcut", "unknown button",
+])
+def test_invalid_device(device):
+    with pytest.raises(EO4HAError, match="Invalid device 0"):
+        parse_manifest([device])
+
+
+def test_build_entities():
+    hub = gateway()
+    entities = build_entities(hub, parse_manifest(DEVICES), receiver=lambda entity: entity.parse_packet)
+    assert [type(entity) for entity in entities] == [
+        EO4HASwitch, EO4HASwitch, EO4HANumber, EO4HABinarySensor, EO4HATemperatureSensor
+    ]
+    switch, other_switch, number, binary_sensor, sensor = entities
+    assert (switch.channel, other_switch.channel, number.channel, number.shortcut) == (0, 1, 0, "AOT")
+    assert binary_sensor.button == 1
+    # the entities of an EEP share their EEPInfo and decoder
+    assert switch.eep is number.eep
+    assert switch.decoder is number.decoder
+    assert len(hub.calls.receivers) == 5
+    assert hub.calls.channels == {(0x01, 0x94, 0xE3, 0xB9): {0, 1}}
+    assert hub.calls.polled == [((0x01, 0x94, 0xE3, 0xB9), EEPInfo(0xD2, 0x01, 0x12), {0, 1})]
+    assert hub.calls.meters == []
+
+    packet = RadioPacket(PACKET.RADIO_ERP1, [RORG.BS4, 0x00, 0x00, 0x80, 0x08] + SENSOR + [0x00], list(OPTIONAL))
+    assert sensor.parse(packet).status == pytest.approx(20.0, abs=0.1)
+
+
+def test_replaced_classes_get_all_attributes():
+    class Switch(EO4HASwitch):
+        def __init__(self, hass):
+            raise AssertionError("not called")
+
+    devices = [{"id": "05:11:22:33", "eep": "A5-12-01", "entities": [{"platform": "switch"}]}]
+    hub = gateway()
+    entity, = build_entities(hub, parse_manifest(devices), classes={"switch": Switch})
+    assert type(entity) is Switch
+    assert entity.channel is None
+    # A5-12-01 is an electricity meter
+    assert hub.calls.meters == [(0x05, 0x11, 0x22, 0x33)]
+
+
+def test_load_manifest(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"devices": DEVICES}))
+    assert len(load_manifest(gateway(), str(path))) == 5
+
+
+def test_manifest_without_devices(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"sensors": DEVICES}))
+    with pytest.raises(EO4HAError, match="no device list"):
+        load_manifest(gateway(), str(path))
@@ -0,0 +1,155 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import RadioPacket
+
+from enocean4ha_bridge import EnOceanGateway, MeteringPipeline, MeterStatistics
+from enocean4ha_bridge.constants import SIGNAL_METER_STATISTICS
+from enocean4ha_bridge.metering import MeterReading, decode_meter
+from enocean4ha_bridge.simulator import VirtualDongle
+
+METER = [0x05, 0x12, 0x01, 0x01]
+OPTIONAL = [0x00, 0xFF, 0xFF, 0xFF, 0xFF, 0x40, 0x00]
+
+
+def meter_data(value: int, tariff: int = 0, power: bool = False, divisor: int = 0) -> list[int]:
+    db0 = tariff << 4 | 0x08 | (0x04 if power else 0) | divisor
+    return [RORG.BS4, value >> 16 & 0xFF, value >> 8 & 0xFF, value & 0xFF, db0]
+
+
+def meter_packet(*args, **kwargs) -> RadioPacket:
+    return RadioPacket(PACKET.RADIO_ERP1, meter_data(*args, **kwargs) + METER + [0x00], list(OPTIONAL))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def pipeline(**kwargs):
+    clock = Clock()
+    emitted = []
+    metering = MeteringPipeline(lambda dev_id, statistics: emitted.append(statistics), clock=clock, **kwargs)
+    metering.add_meter(METER)
+    return metering, clock, emitted
+
+
+def receive(metering, clock, now, *args, **kwargs):
+    clock.now = now
+    return metering.received(meter_packet(*args, **kwargs))
+
+
+def test_decode_meter():
+    assert decode_meter(meter_packet(12345, tariff=2, divisor=1)) == MeterReading(2, True, 1234.5)
+    assert decode_meter(meter_packet(230, power=True)) == MeterReading(0, False, 230.0)
+
+
+def test_decode_meter_ignores_other_telegrams():
+    teach_in = RadioPacket(PACKET.RADIO_ERP1, [RORG.BS4, 0x48, 0x08, 0x0D, 0x80] + METER + [0x00], list(OPTIONAL))
+    switch = RadioPacket(PACKET.RADIO_ERP1, [RORG.RPS, 0x30] + METER + [0x30], list(OPTIONAL))
+    assert decode_meter(teach_in) is None
+    assert decode_meter(switch) is None
+
+
+def test_unregistered_meter_is_ignored():
+    metering, clock, emitted = pipeline()
+    metering.remove_meter(METER)
+    assert receive(metering, clock, 10.0, 100) is None
+    assert metering.readings == 0
+
+
+def test_counter_interval():
+    metering, clock, emitted = pipeline(interval=60.0)
+    receive(metering, clock, 10.0, 1000, divisor=1)
+    receive(metering, clock, 50.0, 1005, divisor=1)
+    assert emitted == []
+    # the first reading of the next interval finishes the previous one
+    receive(metering, clock, 70.0, 1012, divisor=1)
+    assert emitted == [MeterStatistics(0, 0.0, 60.0, pytest.approx(0.5), pytest.approx(0.5), None, None, None, 0)]
+    assert metering.energy(METER) == pytest.approx(1.2)
+    # a smaller counter was reset
+    receive(metering, clock, 80.0, 3, divisor=1)
+    assert metering.energy(METER) == pytest.approx(1.5)
+
+
+def test_power_is_integrated():
+    metering, clock, emitted = pipeline(interval=7200.0, max_gap=2000.0)
+    receive(metering, clock, 0.0, 1000, power=True)
+    receive(metering, clock, 1800.0, 3000, power=True)
+    # too long without a reading, the meter was offline
+    receive(metering, clock, 4500.0, 0, power=True)
+    assert metering.energy(METER) == pytest.approx(1.0)
+    assert metering.power(METER) == 0.0
+    metering.flush(7200.0)
+    statistics, = emitted
+    assert statistics.energy_kwh == pytest.approx(1.0)
+    assert (statistics.mean_w, statistics.min_w, statistics.max_w, statistics.samples) == (
+        pytest.approx(4000 / 3), 0.0, 3000.0, 3
+    )
+
+
+def test_tariffs_are_channels():
+    metering, clock, emitted = pipeline(interval=60.0)
+    receive(metering, clock, 0.0, 100, tariff=0)
+    receive(metering, clock, 1.0, 500, tariff=1)
+    receive(metering, clock, 30.0, 102, tariff=0)
+    receive(metering, clock, 31.0, 510, tariff=1)
+    metering.flush(60.0)
+    assert [(statistics.tariff, statistics.energy_kwh) for statistics in emitted] == [(0, 2.0), (1, 10.0)]
+
+
+def test_flush_emits_finished_intervals_only():
+    metering, clock, emitted = pipeline(interval=60.0)
+    receive(metering, clock, 10.0, 100)
+    metering.flush(59.0)
+    assert emitted == []
+    metering.flush(125.0)
+    assert [(statistics.start, statistics.end) for statistics in emitted] == [(0.0, 60.0)]
+    # intervals without readings are skipped
+    receive(metering, clock, 130.0, 105)
+    metering.flush(180.0)
+    assert [(statistics.start, statistics.end) for statistics in emitted][1:] == [(120.0, 180.0)]
+    assert metering.emitted == 2
+
+
+def test_rolling_window():
+    metering, clock, emitted = pipeline(interval=60.0, windows=2)
+    for index, (counter, power) in enumerate([(100, 10), (103, 20), (107, 30)]):
+        receive(metering, clock, index * 60.0, counter)
+        receive(metering, clock, index * 60.0 + 1.0, power, tariff=1, power=True)
+    metering.flush(180.0)
+    assert len(emitted) == 6
+    # only the last two intervals are kept
+    assert metering.rolling(METER) == MeterStatistics(0, 60.0, 180.0, 7.0, 7.0, None, None, None, 0)
+    assert metering.rolling(METER, tariff=1)[5:] == (25.0, 20.0, 30.0, 2)
+    assert metering.rolling([0x05, 0x12, 0x01, 0x02]) is None
+
+
+def test_gateway_flushes_meters():
+    async def run():
+        async with VirtualDongle() as dongle:
+            gateway = EnOceanGateway(SimpleNamespace(loop=asyncio.get_running_loop()), dongle.path, use_asyncio=True)
+            emitted = []
+            gateway.dispatcher.connect(SIGNAL_METER_STATISTICS, lambda dev_id, statistics: emitted.append(dev_id))
+            await gateway.load()
+            gateway.metering.interval = 0.1
+            try:
+                gateway.add_meter(METER)
+                dongle.send_telegram(meter_data(100), METER)
+                # no further reading, the timer of the gateway finishes the interval
+                for _ in range(100):
+                    if emitted:
+                        break
+                    await asyncio.sleep(0.01)
+                return emitted, gateway.metering.readings
+            finally:
+                gateway.unload()
+
+    emitted, readings = asyncio.run(run())
+    assert readings == 1
+    assert emitted == [METER]
@@ -0,0 +1,142 @@
+import random
+
+import pytest
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import Packet
+
+from enocean4ha_bridge.common import EEPInfo
+from enocean4ha_bridge.d2_01 import CMD_QUERY_INTERFACE, CMD_QUERY_STATUS, CMD_SET_INTERFACE
+from enocean4ha_bridge.decoders import SUPPORTED_FUNCS
+from enocean4ha_bridge.packet_templates import PacketTemplateCache
+
+SENDER = [0xFF, 0x81, 0x22, 0x00]
+DESTINATION = [0x01, 0x94, 0xE3, 0xB9]
+
+
+def _profiles():
+    """ (eep, direction, command) of every profile of the supported FUNCs in EEP.xml """
+    profiles = []
+    for rorg, func in sorted(SUPPORTED_FUNCS):
+        for func_type, profile in sorted(Packet.eep.telegrams.get(rorg, {}).get(func, {}).items()):
+            eep = EEPInfo(rorg, func, func_type)
+            for data in profile.find_all('data'):
+                direction = int(data['direction']) if data.get('direction') else None
+                command = int(data['command']) if data.get('command') else None
+                profiles.append((eep, direction, command))
+    return profiles
+
+
+def _profile_id(profile) -> str:
+    eep, direction, command = profile
+    return "-".join(
+        [f"{eep.rorg:02X}-{eep.func:02X}-{eep.func_type:02X}"]
+        + ([f"direction{direction}"] if direction is not None else [])
+        + ([f"cmd{command}"] if command is not None else [])
+    )
+
+
+PROFILES = _profiles()
+
+
+def _random_value(target, rng: random.Random):
+    """ A value of the field, as the entities pass them to send_command(), None if it can't be set """
+    if target.name == 'status':
+        return rng.random() < 0.5
+    if target.name == 'value':
+        scale = target.find('scale')
+        return rng.uniform(float(scale.find('min').text), float(scale.find('max').text))
+    # EEP.set_values() can't set items with hexadecimal values
+    choices = [int(item['value']) for item in target.find_all('item') if item['value'].isdigit()]
+    choices += [
+        rng.randint(int(rangeitem['start']), int(rangeitem['end'])) for rangeitem in target.find_all('rangeitem')
+    ]
+    descriptions = [
+        item['description'] for item in target.find_all('item') if item.get('description') and item['value'].isdigit()
+    ]
+    if descriptions and rng.random() < 0.3:
+        return rng.choice(descriptions)
+    return rng.choice(choices) if choices else None
+
+
+def _values(eep: EEPInfo, direction, command, rng: random.Random) -> dict:
+    profile = Packet.eep.find_profile(eep.rorg, eep.func, eep.func_type, direction, command)
+    values = {
+        target['shortcut']: _random_value(target, rng)
+        for target in profile.find_all(['value', 'enum', 'status'], recursive=False)
+        if target.get('shortcut') and target['shortcut'] != 'CMD'
+    }
+    return {shortcut: value for shortcut, value in values.items() if value is not None}
+
+
+@pytest.mark.parametrize("profile", PROFILES, ids=map(_profile_id, PROFILES))
+def test_template_matches_packet_create(profile):
+    eep, direction, command = profile
+    cache = PacketTemplateCache()
+    rng = random.Random(_profile_id(profile))
+    for _ in range(20):
+        values = _values(eep, direction, command, rng)
+        args = (PACKET.RADIO_ERP1, eep.rorg, eep.func, eep.func_type, direction, command, DESTINATION, SENDER)
+        expected = Packet.create(*args, **values)
+        created = cache.create(*args, **values)
+        assert bytes(created.build()) == bytes(expected.build()), values
+        assert (created.data, created.optional, created.status) == (expected.data, expected.optional, expected.status)
+    # one template for all the values
+    assert (cache.misses, cache.hits, len(cache)) == (1, 19, 1)
+
+
+def test_learn_telegram():
+    cache = PacketTemplateCache()
+    for learn in (True, False, True):
+        args = (PACKET.RADIO_ERP1, RORG.BS4, 0x02, 0x05, None, None, DESTINATION, SENDER, learn)
+        assert bytes(cache.create(*args, TMP=21.5).build()) == bytes(Packet.create(*args, TMP=21.5).build())
+    assert len(cache) == 2
+
+
+def test_invalid_enum_value():
+    cache = PacketTemplateCache()
+    args = (PACKET.RADIO_ERP1, RORG.VLD, 0x01, 0x12, None, 0x01, DESTINATION, SENDER)
+    cache.create(*args, DV=0, IO=0, OV=100)
+    # like Packet.create()
+    with pytest.raises(ValueError):
+        Packet.create(*args, DV=7, IO=0, OV=100)
+    with pytest.raises(ValueError):
+        cache.create(*args, DV=7, IO=0, OV=100)
+    with pytest.raises(ValueError):
+        cache.create(*args, DV="unknown", IO=0, OV=100)
+
+
+@pytest.mark.parametrize("command, fields, data", [
+    (CMD_QUERY_STATUS, {"IO": 0x1E}, [0x03, 0x1E]),
+    (CMD_QUERY_INTERFACE, {"IO": 1}, [0x0C, 0x01]),
+    (CMD_SET_INTERFACE, {"IO": 1, "AOT": 300}, [0x0B, 0x01, 0x01, 0x2C, 0xFF, 0xFF, 0x00]),
+    (CMD_SET_INTERFACE, {"IO": 0, "DOT": 0, "EDT": 2, "EDTS": 1}, [0x0B, 0x00, 0xFF, 0xFF, 0x00, 0x00, 0xA0]),
+])
+def test_d2_01_commands(command, fields, data):
+    """ The commands, which EEP.xml doesn't describe, are framed like Packet.create() frames a VLD telegram """
+    packet = PacketTemplateCache().create(
+        PACKET.RADIO_ERP1, RORG.VLD, 0x01, 0x12, command=command, destination=DESTINATION, sender=SENDER, **fields
+    )
+    expected = Packet(PACKET.RADIO_ERP1, [RORG.VLD] + data + SENDER + [0x00], [0x03] + DESTINATION + [0xFF, 0x00])
+    assert bytes(packet.build()) == bytes(expected.build())
+
+
+def test_least_recently_used_template_is_dropped():
+    cache = PacketTemplateCache(maxsize=2)
+
+    def create(destination):
+        return cache.create(
+            PACKET.RADIO_ERP1, RORG.VLD, 0x01, 0x12, command=0x01, destination=destination, sender=SENDER,
+            DV=0, IO=0, OV=100
+        )
+
+    others = ([0x01, 0x94, 0xE3, 0xBA], [0x01, 0x94, 0xE3, 0xBB])
+    create(DESTINATION)
+    create(others[0])
+    create(DESTINATION)
+    create(others[1])
+    assert len(cache) == 2
+    assert cache.misses == 3
+    create(DESTINATION)
+    assert cache.misses == 3
+    create(others[0])
+    assert cache.misses == 4
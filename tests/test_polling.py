@@ -0,0 +1,52 @@
+import asyncio
+from types import SimpleNamespace
+
+from enocean4ha_bridge import EnOceanGateway, PollScheduler
+from enocean4ha_bridge.common import EEPInfo
+from enocean4ha_bridge.d2_01 import CMD_QUERY_INTERFACE, CMD_QUERY_STATUS
+from enocean4ha_bridge.simulator import VirtualDongle
+
+ACTUATOR = [0x01, 0x94, 0xE3, 0xB9]
+
+
+def test_failed_queries_are_no_polls():
+    def send(**command):
+        raise ValueError("no profile")
+
+    async def run():
+        scheduler = PollScheduler(asyncio.get_running_loop(), send, window=0.0)
+        scheduler.add(ACTUATOR, 0x12, [0, 1])
+        await asyncio.sleep(0.05)
+        scheduler.stop()
+        return scheduler.stats()
+
+    assert asyncio.run(run()) == {"devices": 0, "polls": 0, "skipped": 0, "failed": 1}
+
+
+def test_poll_reaches_actuator():
+    async def run():
+        async with VirtualDongle() as dongle:
+            dongle.add_actuator(ACTUATOR, channels=2)
+            gateway = EnOceanGateway(SimpleNamespace(loop=asyncio.get_running_loop()), dongle.path, use_asyncio=True)
+            replies = []
+            gateway.register_receiver(ACTUATOR, lambda packet: replies.append(packet.data[1] & 0x0F))
+            await gateway.load()
+            gateway.poll_scheduler.window = 0.0
+            try:
+                gateway.poll_device(
+                    ACTUATOR, EEPInfo(0xD2, 0x01, 0x12), [0, 1], (CMD_QUERY_STATUS, CMD_QUERY_INTERFACE)
+                )
+                for _ in range(100):
+                    if len(replies) >= 4:
+                        break
+                    await asyncio.sleep(0.01)
+                return gateway.poll_scheduler.stats(), dongle.stats, sorted(replies)
+            finally:
+                gateway.unload()
+
+    stats, dongle_stats, replies = asyncio.run(run())
+    assert stats["polls"] == 2
+    assert stats["failed"] == 0
+    assert dongle_stats.commands == 2
+    # CMD 4 and CMD 0xD of both channels
+    assert replies == [0x4, 0x4, 0xD, 0xD]
@@ -0,0 +1,135 @@
+import asyncio
+import contextlib
+from types import SimpleNamespace
+
+import pytest
+from enocean.protocol.constants import PACKET, RORG
+
+from enocean4ha_bridge import EnOceanGateway, GatewayPool
+from enocean4ha_bridge.common import EO4HAError
+from enocean4ha_bridge.simulator import VirtualDongle
+
+BASE_IDS = ([0xFF, 0x81, 0x22, 0x00], [0xFF, 0x92, 0x33, 0x00])
+ACTUATOR = [0x01, 0x94, 0xE3, 0xB9]
+METER = [0x05, 0x12, 0x01, 0x01]
+SENSOR = [0x01, 0x82, 0x5D, 0xAB]
+# A5-12-01 counter reading of 100 kWh
+METER_DATA = [RORG.BS4, 0x00, 0x00, 0x64, 0x08]
+TEMPERATURE_DATA = [RORG.BS4, 0x00, 0x00, 0x80, 0x08]
+
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+
+
+def run_with_pool(test):
+    """ Run test(dongles, gateways, pool) with a loaded pool of two gateways on simulated dongles """
+    async def run():
+        async with contextlib.AsyncExitStack() as stack:
+            dongles = [await stack.enter_async_context(VirtualDongle(base_id=base_id)) for base_id in BASE_IDS]
+            hass = SimpleNamespace(loop=asyncio.get_running_loop())
+            gateways = [EnOceanGateway(hass, dongle.path, use_asyncio=True) for dongle in dongles]
+            pool = GatewayPool(gateways)
+            await pool.load()
+            try:
+                return await test(dongles, gateways, pool)
+            finally:
+                pool.unload()
+
+    return asyncio.run(run())
+
+
+def set_output(pool, value: int):
+    return pool.send_command(
+        PACKET.RADIO_ERP1, RORG.VLD, 0x01, 0x12, 0x01, destination=ACTUATOR, DV=0, IO=0, OV=value
+    )
+
+
+def test_telegram_reaches_receivers_once():
+    async def test(dongles, gateways, pool):
+        received = []
+        pool.register_receiver(SENSOR, received.append)
+        for dongle in dongles:
+            dongle.send_telegram(TEMPERATURE_DATA, SENSOR)
+        await wait_for(lambda: all(gateway.link_quality_tracker.recent_dBm(SENSOR) for gateway in gateways))
+        await asyncio.sleep(0.05)
+        return received, [gateway.link_quality_tracker.recent_dBm(SENSOR) for gateway in gateways]
+
+    received, dBm = run_with_pool(test)
+    assert len(received) == 1
+    # each gateway records its own copy
+    assert None not in dBm
+
+
+def test_other_dongle_feeds_the_meter_of_a_gateway():
+    async def test(dongles, gateways, pool):
+        gateways[0].add_meter(METER)
+        # the second dongle hears the telegram first, the copy of the first one is a duplicate
+        dongles[1].send_telegram(METER_DATA, METER)
+        await wait_for(lambda: gateways[1].link_quality_tracker.recent_dBm(METER) is not None)
+        dongles[0].send_telegram(METER_DATA, METER)
+        await wait_for(lambda: gateways[0].link_quality_tracker.recent_dBm(METER) is not None)
+        return gateways[0].metering.readings, pool.duplicate_filter.copies(METER)
+
+    readings, copies = run_with_pool(test)
+    assert readings == 1
+    assert copies == 2
+
+
+def test_best_gateway():
+    async def test(dongles, gateways, pool):
+        unknown = pool.best_gateway(ACTUATOR)
+        dongles[0].send_telegram(TEMPERATURE_DATA, ACTUATOR, dBm=80)
+        dongles[1].send_telegram(TEMPERATURE_DATA, ACTUATOR, dBm=50)
+        await wait_for(lambda: all(gateway.link_quality_tracker.recent_dBm(ACTUATOR) for gateway in gateways))
+        best = pool.best_gateway(ACTUATOR)
+        for gateway in gateways:
+            gateway._communicator.stop()
+        with pytest.raises(EO4HAError):
+            pool.best_gateway(ACTUATOR)
+        return gateways.index(unknown), gateways.index(best)
+
+    # the least busy gateway for an unknown device, the one with the strongest signal otherwise
+    assert run_with_pool(test) == (0, 1)
+
+
+def test_command_fails_over():
+    async def test(dongles, gateways, pool):
+        lost = dongles[0].add_actuator(ACTUATOR, loss=1.0)
+        actuator = dongles[1].add_actuator(ACTUATOR)
+        dongles[0].send_telegram(TEMPERATURE_DATA, ACTUATOR, dBm=50)
+        await wait_for(lambda: gateways[0].link_quality_tracker.recent_dBm(ACTUATOR) is not None)
+        for gateway in gateways:
+            gateway.ack_tracker.timeout = 0.05
+            gateway.ack_tracker.backoff = 1.0
+        future = set_output(pool, 100)
+        await wait_for(lambda: dongles[0].stats.commands)
+        # the first dongle is unplugged before the actuator answered
+        gateways[0]._communicator.stop()
+        result = await asyncio.wait_for(asyncio.wrap_future(future), 2.0)
+        return result, lost.outputs, actuator.outputs
+
+    result, lost_outputs, outputs = run_with_pool(test)
+    assert result.confirmed
+    assert result.value == 100
+    assert lost_outputs == [0]
+    assert outputs == [100]
+
+
+def test_removed_gateway_leaves_the_pool():
+    async def test(dongles, gateways, pool):
+        received = []
+        pool.register_receiver(SENSOR, received.append)
+        pool.remove_gateway(gateways[1])
+        dongles[1].send_telegram(TEMPERATURE_DATA, SENSOR)
+        await wait_for(lambda: gateways[1].link_quality_tracker.recent_dBm(SENSOR) is not None)
+        await asyncio.sleep(0.05)
+        gateways[1].unload()
+        return received, gateways[1].telegram_consumer == gateways[1].consume
+
+    received, own_consumer = run_with_pool(test)
+    assert received == []
+    assert own_consumer
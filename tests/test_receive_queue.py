@@ -0,0 +1,120 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import RadioPacket
+
+from enocean4ha_bridge.receive_queue import OverflowPolicy, ReceiveQueue
+
+SENDER = [0x01, 0x82, 0x5D, 0xAB]
+OPTIONAL = [0x00, 0xFF, 0xFF, 0xFF, 0xFF, 0x40, 0x00]
+
+
+def telegram(value: int, repeated: int = 0) -> RadioPacket:
+    return RadioPacket(PACKET.RADIO_ERP1, [RORG.BS1, value] + SENDER + [repeated], list(OPTIONAL))
+
+
+def queue(maxsize: int, policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST):
+    """ A queue with a loop, which only records the scheduled callbacks """
+    scheduled = []
+    delivered = []
+    loop = SimpleNamespace(call_soon_threadsafe=scheduled.append)
+    return ReceiveQueue(loop, lambda packet: delivered.append(packet.data[1]), maxsize, policy), scheduled, delivered
+
+
+def test_batch_is_scheduled_once():
+    receive_queue, scheduled, delivered = queue(8)
+    for value in range(3):
+        receive_queue.put(telegram(value))
+    assert len(scheduled) == 1
+    scheduled.pop()()
+    assert delivered == [0, 1, 2]
+    # the next packet schedules the next batch
+    receive_queue.put(telegram(3))
+    assert len(scheduled) == 1
+    scheduled.pop()()
+    assert delivered == [0, 1, 2, 3]
+    assert receive_queue.stats() == {
+        "received": 4, "delivered": 4, "batches": 2, "dropped_oldest": 0, "dropped_duplicates": 0, "max_depth": 3,
+        "depth": 0,
+    }
+
+
+def test_drop_oldest():
+    receive_queue, scheduled, delivered = queue(3)
+    for value in range(5):
+        receive_queue.put(telegram(value))
+    scheduled.pop()()
+    assert delivered == [2, 3, 4]
+    assert receive_queue.dropped_oldest == 2
+    assert receive_queue.dropped_duplicates == 0
+
+
+def test_drop_duplicates_drops_the_new_copy():
+    receive_queue, scheduled, delivered = queue(3, OverflowPolicy.DROP_DUPLICATES)
+    for value in range(3):
+        receive_queue.put(telegram(value))
+    # a repeated copy of a waiting telegram differs only in the repeater count
+    receive_queue.put(telegram(1, repeated=1))
+    scheduled.pop()()
+    assert delivered == [0, 1, 2]
+    assert (receive_queue.dropped_duplicates, receive_queue.dropped_oldest) == (1, 0)
+
+
+def test_drop_duplicates_drops_a_queued_copy_first():
+    receive_queue, scheduled, delivered = queue(3, OverflowPolicy.DROP_DUPLICATES)
+    receive_queue.maxsize = 8
+    for value in (0, 1, 1):
+        receive_queue.put(telegram(value))
+    receive_queue.maxsize = 3
+    receive_queue.put(telegram(2))
+    # without copies left, the oldest one goes
+    receive_queue.put(telegram(3))
+    scheduled.pop()()
+    assert delivered == [1, 2, 3]
+    assert (receive_queue.dropped_duplicates, receive_queue.dropped_oldest) == (1, 1)
+
+
+def test_broken_handler_does_not_stop_the_batch():
+    delivered = []
+
+    def handler(packet):
+        if packet.data[1] == 1:
+            raise ValueError("broken entity")
+        delivered.append(packet.data[1])
+
+    scheduled = []
+    receive_queue = ReceiveQueue(SimpleNamespace(call_soon_threadsafe=scheduled.append), handler)
+    for value in range(3):
+        receive_queue.put(telegram(value))
+    scheduled.pop()()
+    assert delivered == [0, 2]
+    assert receive_queue.delivered == 3
+
+
+def test_packets_of_threads_reach_the_event_loop():
+    async def run():
+        loop = asyncio.get_running_loop()
+        delivered = []
+        receive_queue = ReceiveQueue(loop, lambda packet: delivered.append(threading.current_thread()), 1024)
+        threads = [
+            threading.Thread(target=lambda: [receive_queue.put(telegram(value)) for value in range(100)])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for _ in range(100):
+            if len(delivered) == 400:
+                break
+            await asyncio.sleep(0.01)
+        return delivered, receive_queue.stats()
+
+    delivered, stats = asyncio.run(run())
+    assert len(delivered) == 400
+    # all packets are handled in the thread of the event loop
+    assert set(delivered) == {threading.main_thread()}
+    assert stats["batches"] <= 400
+    assert stats["dropped_oldest"] == stats["dropped_duplicates"] == 0
@@ -0,0 +1,141 @@
+import pytest
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import RadioPacket
+
+from enocean4ha_bridge.send_queue import Priority, SendQueue, airtime
+
+
+class FakeLoop:
+    """ Runs the timers of the queue in simulated time """
+
+    def __init__(self):
+        self.now = 0.0
+        self._timers = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def call_later(self, delay, callback):
+        timer = FakeTimer(self.now + delay, callback)
+        self._timers.append(timer)
+        return timer
+
+    def run(self, until: float = float("inf")) -> None:
+        while True:
+            timers = [timer for timer in self._timers if not timer.cancelled and timer.when <= until]
+            if not timers:
+                return
+            timer = min(timers, key=lambda timer: timer.when)
+            self._timers.remove(timer)
+            self.now = max(self.now, timer.when)
+            timer.callback()
+
+
+class FakeTimer:
+    def __init__(self, when, callback):
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def command(value: int) -> RadioPacket:
+    return RadioPacket(
+        PACKET.RADIO_ERP1, [RORG.BS1, value, 0xFF, 0x81, 0x22, 0x00, 0x00], [0x03, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0x00]
+    )
+
+
+def send_queue(**kwargs):
+    loop = FakeLoop()
+    sent = []
+    queue = SendQueue(loop, lambda packet: sent.append((loop.now, packet.data[1])), clock=loop, **kwargs)
+    return queue, loop, sent
+
+
+def test_user_commands_are_sent_first():
+    queue, loop, sent = send_queue(min_interval=0.0)
+    queue.put(command(1), priority=Priority.STATUS_QUERY)
+    queue.put(command(2), priority=Priority.STATUS_QUERY)
+    queue.put(command(3))
+    loop.run()
+    assert [value for _, value in sent] == [3, 1, 2]
+
+
+def test_coalesced_packet_keeps_its_place():
+    queue, loop, sent = send_queue(min_interval=0.0)
+    queue.put(command(1), key="dimmer")
+    queue.put(command(2), key="switch")
+    queue.put(command(3), key="dimmer")
+    assert len(queue) == 2
+    loop.run()
+    # the latest value of the dimmer is sent before the switch
+    assert [value for _, value in sent] == [3, 2]
+    assert (queue.enqueued, queue.coalesced, queue.sent) == (3, 1, 2)
+    # once sent, the key starts a new packet
+    queue.put(command(4), key="dimmer")
+    loop.run()
+    assert sent[-1][1] == 4
+
+
+def test_discard():
+    queue, loop, sent = send_queue(min_interval=0.0)
+    queue.put(command(1), key=("actuator", 0))
+    queue.put(command(2), key=("actuator", 1))
+    assert queue.discard(("actuator", 0))
+    assert not queue.discard(("actuator", 0))
+    assert not queue.discard("unknown")
+    # a discarded key is queued behind the packets put before
+    queue.put(command(3), key=("actuator", 0))
+    loop.run()
+    assert [value for _, value in sent] == [2, 3]
+
+
+def test_min_interval():
+    queue, loop, sent = send_queue(min_interval=0.05)
+    for value in range(3):
+        queue.put(command(value))
+    loop.run()
+    assert [time for time, _ in sent] == pytest.approx([0.0, 0.05, 0.1])
+    assert queue.stats()["max_wait"] == pytest.approx(0.1)
+    assert queue.stats()["average_wait"] == pytest.approx(0.05)
+
+
+def test_duty_cycle():
+    # the bucket holds the air time of 36 packets, and refills one packet in 100 s
+    needed = airtime(command(0))
+    queue, loop, sent = send_queue(min_interval=0.0, duty_cycle=needed / 100.0)
+    assert queue.stats()["airtime_budget"] == pytest.approx(36 * needed)
+    for value in range(40):
+        queue.put(command(value))
+    loop.run(until=1.0)
+    assert len(sent) == 36
+    loop.run()
+    assert [time for time, _ in sent[36:]] == pytest.approx([100.0, 200.0, 300.0, 400.0])
+
+
+def test_clear():
+    queue, loop, sent = send_queue()
+    queue.put(command(1), key="dimmer")
+    queue.clear()
+    loop.run()
+    assert sent == []
+    assert len(queue) == 0
+    assert not queue.discard("dimmer")
+
+
+def test_failing_send_keeps_the_queue_running():
+    loop = FakeLoop()
+    sent = []
+
+    def send(packet):
+        if packet.data[1] == 1:
+            raise OSError("dongle unplugged")
+        sent.append(packet.data[1])
+
+    queue = SendQueue(loop, send, min_interval=0.0, clock=loop)
+    for value in range(3):
+        queue.put(command(value))
+    loop.run()
+    assert sent == [0, 2]
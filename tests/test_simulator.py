@@ -0,0 +1,153 @@
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+from enocean.protocol.constants import PACKET, RORG
+
+from enocean4ha_bridge import EnOceanGateway, EO4HASwitch
+from enocean4ha_bridge.common import EEPInfo
+from enocean4ha_bridge.simulator import SimulatedActuator, VirtualDongle
+
+BASE_ID = [0xFF, 0x81, 0x22, 0x00]
+ACTUATOR = [0x01, 0x94, 0xE3, 0xB9]
+SENSORS = [[0x01, 0x82, 0x5D, 0xA0 + index] for index in range(4)]
+
+both_communicators = pytest.mark.parametrize("use_asyncio", [False, True], ids=["thread", "asyncio"])
+
+
+def switch(gateway, channel: int) -> EO4HASwitch:
+    entity = EO4HASwitch.__new__(EO4HASwitch)
+    entity.gateway = gateway
+    entity.dev_id = ACTUATOR
+    entity.eep = EEPInfo(0xD2, 0x01, 0x12)
+    entity.channel = channel
+    return entity
+
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+
+
+def set_output(gateway, channel: int, value: int):
+    return gateway.send_command(
+        PACKET.RADIO_ERP1, RORG.VLD, 0x01, 0x12, 0x01, destination=ACTUATOR, DV=0, IO=channel, OV=value
+    )
+
+
+def run_with_gateway(use_asyncio: bool, test, **gateway_arguments):
+    """ Run test(dongle, gateway) with a loaded gateway on a simulated dongle """
+    async def run():
+        async with VirtualDongle(base_id=BASE_ID) as dongle:
+            gateway = EnOceanGateway(
+                SimpleNamespace(loop=asyncio.get_running_loop()), dongle.path, use_asyncio=use_asyncio,
+                **gateway_arguments
+            )
+            await gateway.load()
+            try:
+                return await test(dongle, gateway)
+            finally:
+                gateway.unload()
+
+    return asyncio.run(run())
+
+
+def test_actuator_answers():
+    actuator = SimulatedActuator(ACTUATOR, channels=2)
+    assert actuator.handle([RORG.VLD, 0x01, 0x1E, 0x64]) == [
+        [RORG.VLD, 0x04, 0x60, 0x64], [RORG.VLD, 0x04, 0x61, 0x64]
+    ]
+    assert actuator.handle([RORG.VLD, 0x03, 0x01]) == [[RORG.VLD, 0x04, 0x61, 0x64]]
+    actuator.handle([RORG.VLD, 0x0B, 0x00, 0x00, 0x19, 0xFF, 0xFF, 0x80])
+    assert actuator.handle([RORG.VLD, 0x0C, 0x00]) == [[RORG.VLD, 0x0D, 0x00, 0x00, 0x19, 0xFF, 0xFF, 0x80]]
+
+
+@both_communicators
+def test_base_id(use_asyncio):
+    async def test(dongle, gateway):
+        return gateway.sender_id, gateway.is_connected
+
+    assert run_with_gateway(use_asyncio, test) == (BASE_ID, True)
+
+
+@both_communicators
+def test_command_is_confirmed(use_asyncio):
+    async def test(dongle, gateway):
+        dongle.add_actuator(ACTUATOR, channels=2, reply_delay=0.01)
+        entities = [switch(gateway, channel) for channel in range(2)]
+        states = {}
+        for entity in entities:
+            gateway.register_receiver(
+                ACTUATOR, lambda packet, entity=entity: states.__setitem__(entity.channel, entity.parse_packet(packet))
+            )
+        result = await asyncio.wait_for(asyncio.wrap_future(set_output(gateway, 1, 100)), 2.0)
+        await wait_for(lambda: 1 in states)
+        return result, states
+
+    result, states = run_with_gateway(use_asyncio, test)
+    assert result.confirmed
+    assert result.value == 100
+    assert states[1]["status"] is True
+    # the status of channel 1 is no state of channel 0
+    assert "status" not in states.get(0, {})
+
+
+@both_communicators
+def test_lost_command_is_sent_again(use_asyncio):
+    async def test(dongle, gateway):
+        actuator = dongle.add_actuator(ACTUATOR, loss=1.0)
+        gateway.ack_tracker.timeout = 0.05
+        gateway.ack_tracker.backoff = 1.0
+        result = await asyncio.wait_for(asyncio.wrap_future(set_output(gateway, 0, 100)), 2.0)
+        # the thread of the SerialCommunicator may still be writing the last attempt
+        await wait_for(lambda: dongle.stats.lost == 3)
+        return result, dongle.stats, actuator.outputs
+
+    result, stats, outputs = run_with_gateway(use_asyncio, test)
+    assert not result.confirmed
+    assert result.attempts == 3
+    assert stats.lost == 3
+    assert outputs == [0]
+
+
+@both_communicators
+def test_soak(use_asyncio):
+    """ Chatty devices don't keep the commands from being confirmed, nor their telegrams from their receivers """
+    async def test(dongle, gateway):
+        dongle.add_actuator(ACTUATOR, channels=2)
+        received = Counter()
+        for sensor in SENSORS:
+            gateway.register_receiver(sensor, lambda packet: received.update([tuple(packet.sender)]))
+            dongle.add_traffic((0xA5, 0x02, 0x05), sensor, interval=0.005)
+        results = []
+        for value in range(20):
+            future = set_output(gateway, value % 2, value)
+            results.append(await asyncio.wait_for(asyncio.wrap_future(future), 2.0))
+        return received, results
+
+    received, results = run_with_gateway(use_asyncio, test, receive_queue_size=1024)
+    assert all(result.confirmed for result in results)
+    assert [result.value for result in results] == list(range(20))
+    assert set(received) == {tuple(sensor) for sensor in SENSORS}
+
+
+@pytest.mark.parametrize("values, outputs, commands", [
+    # the command for all channels overrides the older one of channel 0, but not the newer one
+    ([(0, 100), (0x1E, 0), (0, 50)], [50, 0], 2),
+    # the newer command for all channels overrides the one of channel 0
+    ([(0x1E, 0), (0, 100), (0x1E, 20)], [20, 20], 1),
+], ids=["channel-last", "all-channels-last"])
+def test_all_channels_command_keeps_order(values, outputs, commands):
+    async def test(dongle, gateway):
+        actuator = dongle.add_actuator(ACTUATOR, channels=2)
+        for channel, value in values:
+            set_output(gateway, channel, value)
+        await wait_for(lambda: dongle.stats.commands >= commands and actuator.outputs == outputs)
+        # no further command changes the outputs
+        await asyncio.sleep(0.2)
+        return actuator.outputs, dongle.stats.commands
+
+    assert run_with_gateway(True, test) == (outputs, commands)
@@ -0,0 +1,113 @@
+import os
+
+import pytest
+
+from enocean4ha_bridge.snapshot import SNAPSHOT_MAGIC, SnapshotEntry, StateSnapshot
+
+SENSOR = [0x01, 0x82, 0x5D, 0xAB]
+ACTUATOR = [0x01, 0x94, 0xE3, 0xB9]
+TEMPERATURE = (0xA5, 0x02, 0x05)
+SWITCH = (0xD2, 0x01, 0x12)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "snapshot.bin")
+
+
+def test_round_trip(path):
+    snapshot = StateSnapshot(path)
+    snapshot.update(SENSOR, TEMPERATURE, None, 21.5, "TMP", timestamp=100.0)
+    snapshot.update(ACTUATOR, SWITCH, 0, True, timestamp=101.0)
+    snapshot.update(ACTUATOR, SWITCH, 1, 75, timestamp=102.0)
+    snapshot.update(ACTUATOR, SWITCH, 1, 300, "AOT", timestamp=103.0)
+    snapshot.update(ACTUATOR, SWITCH, 1, "push button", "EDT", timestamp=104.0)
+    snapshot.update(ACTUATOR, SWITCH, 2, {"pushed": 1, "which": 0}, timestamp=105.0)
+    snapshot.update(ACTUATOR, SWITCH, 3, None, timestamp=106.0)
+    snapshot.close()
+
+    loaded = StateSnapshot(path)
+    assert len(loaded) == 7
+    assert loaded.get(SENSOR, TEMPERATURE, name="TMP") == SnapshotEntry(21.5, 100.0)
+    assert loaded.get(SENSOR, TEMPERATURE) is None
+    assert loaded.get(ACTUATOR, SWITCH, 0) == SnapshotEntry(True, 101.0)
+    assert loaded.get(ACTUATOR, SWITCH, 1) == SnapshotEntry(75, 102.0)
+    assert loaded.get(ACTUATOR, SWITCH, 1, "AOT") == SnapshotEntry(300, 103.0)
+    assert loaded.get(ACTUATOR, SWITCH, 1, "EDT") == SnapshotEntry("push button", 104.0)
+    assert loaded.get(ACTUATOR, SWITCH, 2) == SnapshotEntry({"pushed": 1, "which": 0}, 105.0)
+    assert loaded.get(ACTUATOR, SWITCH, 3) == SnapshotEntry(None, 106.0)
+    loaded.close()
+
+
+def test_changed_state_is_written_in_place(path):
+    snapshot = StateSnapshot(path, min_interval=60.0)
+    snapshot.update(SENSOR, TEMPERATURE, None, 21.5, "TMP", timestamp=100.0)
+    size = os.path.getsize(path)
+    assert snapshot.update(SENSOR, TEMPERATURE, None, 22.0, "TMP", timestamp=110.0)
+    # the same value is written again after min_interval only
+    assert not snapshot.update(SENSOR, TEMPERATURE, None, 22.0, "TMP", timestamp=169.0)
+    assert snapshot.update(SENSOR, TEMPERATURE, None, 22.0, "TMP", timestamp=170.0)
+    assert os.path.getsize(path) == size
+    assert snapshot.writes == 3
+    snapshot.close()
+    assert StateSnapshot(path).get(SENSOR, TEMPERATURE, name="TMP") == SnapshotEntry(22.0, 170.0)
+
+
+def test_too_long_state_is_not_kept(path):
+    snapshot = StateSnapshot(path)
+    assert not snapshot.update(SENSOR, TEMPERATURE, None, "x" * 39, timestamp=100.0)
+    assert not snapshot.update(SENSOR, TEMPERATURE, None, 21.5, "TEMPERATURE", timestamp=100.0)
+    assert len(snapshot) == 0
+    assert os.path.getsize(path) == len(SNAPSHOT_MAGIC)
+    snapshot.close()
+    assert not snapshot.update(SENSOR, TEMPERATURE, None, 21.5, timestamp=100.0)
+
+
+def test_other_file_is_refused(path):
+    with open(path, "wb") as file:
+        file.write(b"no snapshot at all")
+    with pytest.raises(ValueError):
+        StateSnapshot(path)
+
+
+def test_broken_record_is_skipped(path):
+    snapshot = StateSnapshot(path)
+    snapshot.update(SENSOR, TEMPERATURE, None, 21.5, timestamp=100.0)
+    snapshot.update(ACTUATOR, SWITCH, 0, {"pushed": 1}, timestamp=101.0)
+    snapshot.close()
+    with open(path, "r+b") as file:
+        data = bytearray(file.read())
+        # the JSON of the second record
+        index = data.index(b'{"pushed"')
+        data[index] = ord("[")
+        file.seek(0)
+        file.write(data)
+
+    loaded = StateSnapshot(path)
+    assert len(loaded) == 1
+    assert loaded.get(SENSOR, TEMPERATURE) == SnapshotEntry(21.5, 100.0)
+    # the broken record gets a new one
+    loaded.update(ACTUATOR, SWITCH, 0, False, timestamp=102.0)
+    loaded.close()
+    assert StateSnapshot(path).get(ACTUATOR, SWITCH, 0) == SnapshotEntry(False, 102.0)
+
+
+def test_truncated_file(path):
+    snapshot = StateSnapshot(path)
+    snapshot.update(SENSOR, TEMPERATURE, None, 21.5, timestamp=100.0)
+    snapshot.update(ACTUATOR, SWITCH, 0, True, timestamp=101.0)
+    snapshot.close()
+    # e.g. a power loss while the second record was appended
+    os.truncate(path, os.path.getsize(path) - 10)
+
+    loaded = StateSnapshot(path)
+    assert len(loaded) == 1
+    loaded.update(ACTUATOR, SWITCH, 1, 50, timestamp=102.0)
+    loaded.update(ACTUATOR, SWITCH, 0, False, timestamp=103.0)
+    loaded.close()
+    # new records are aligned again
+    reloaded = StateSnapshot(path)
+    assert len(reloaded) == 3
+    assert reloaded.get(ACTUATOR, SWITCH, 1) == SnapshotEntry(50, 102.0)
+    assert reloaded.get(ACTUATOR, SWITCH, 0) == SnapshotEntry(False, 103.0)
+    reloaded.close()
@@ -0,0 +1,127 @@
+import logging
+import re
+from types import SimpleNamespace
+
+import pytest
+from enocean.protocol.constants import PACKET, RORG
+from enocean.protocol.packet import RadioPacket
+
+from enocean4ha_bridge import EO4HATemperatureSensor
+from enocean4ha_bridge.common import EEPInfo
+from enocean4ha_bridge.trace import TRACER, Tracer
+
+SENSOR = [0x01, 0x82, 0x5D, 0xAB]
+OTHER = [0x01, 0x82, 0x5D, 0xAC]
+TEMPERATURE = EEPInfo(0xA5, 0x02, 0x05)
+SWITCH = EEPInfo(0xD2, 0x01, 0x12)
+OPTIONAL = [0x00, 0xFF, 0xFF, 0xFF, 0xFF, 0x40, 0x00]
+
+
+@pytest.fixture
+def tracer():
+    """ The global TRACER, disabled and emptied before and after the test """
+    TRACER.disable()
+    TRACER.dump(clear=True)
+    yield TRACER
+    TRACER.disable()
+    TRACER.dump(clear=True)
+
+
+def events(tracer: Tracer) -> list[tuple]:
+    return [(record.event, record.dev_id, record.eep) for record in tracer.dump()]
+
+
+def test_disabled_by_default():
+    tracer = Tracer()
+    assert not tracer.active
+    tracer.trace("parse", SENSOR, TEMPERATURE)
+    assert len(tracer) == 0
+
+
+def test_enable_device():
+    tracer = Tracer()
+    tracer.enable(dev_id=SENSOR)
+    assert tracer.active
+    tracer.trace("parse", SENSOR, TEMPERATURE, entity="sensor")
+    tracer.trace("parse", OTHER, TEMPERATURE)
+    tracer.trace("esp3_send")
+    assert events(tracer) == [("parse", 0x01825DAB, TEMPERATURE)]
+    assert tracer.dump()[0].details == {"entity": "sensor"}
+    tracer.disable(dev_id=SENSOR)
+    assert not tracer.active
+
+
+def test_enable_eep():
+    tracer = Tracer()
+    tracer.enable(eep=(0xD2, 0x01, 0x12))
+    tracer.enable(dev_id=SENSOR)
+    tracer.trace("parse", OTHER, SWITCH)
+    tracer.trace("parse", OTHER, TEMPERATURE)
+    tracer.trace("parse", SENSOR, TEMPERATURE)
+    assert events(tracer) == [("parse", 0x01825DAC, SWITCH), ("parse", 0x01825DAB, TEMPERATURE)]
+    tracer.disable(eep=SWITCH)
+    # the device is still traced
+    assert tracer.active
+    tracer.disable(dev_id=SENSOR)
+    assert not tracer.active
+
+
+def test_enable_all():
+    tracer = Tracer()
+    tracer.enable(dev_id=SENSOR)
+    tracer.enable()
+    tracer.trace("esp3_receive")
+    tracer.trace("parse", OTHER, TEMPERATURE)
+    assert len(tracer) == 2
+    # disables the devices and EEPs as well
+    tracer.disable()
+    assert not tracer.active
+    tracer.trace("parse", SENSOR, TEMPERATURE)
+    assert len(tracer) == 2
+
+
+def test_ring_buffer_overflow():
+    tracer = Tracer(maxsize=3)
+    tracer.enable()
+    for index in range(5):
+        tracer.trace("parse", SENSOR, TEMPERATURE, index=index)
+    assert tracer.maxsize == 3
+    # the oldest records are dropped
+    assert [record.details["index"] for record in tracer.dump()] == [2, 3, 4]
+
+
+def test_dump():
+    tracer = Tracer()
+    tracer.enable()
+    tracer.trace("parse", SENSOR, TEMPERATURE, entity="sensor", shortcut="TMP")
+    tracer.trace("esp3_send")
+    assert len(tracer.dump()) == 2
+    assert len(tracer.dump(clear=True)) == 2
+    assert tracer.dump() == []
+
+
+def test_dump_to_log(caplog):
+    tracer = Tracer()
+    tracer.enable()
+    tracer.trace("parse", SENSOR, TEMPERATURE, entity="sensor", shortcut="TMP")
+    tracer.trace("esp3_send")
+    with caplog.at_level(logging.INFO, logger="enocean.ha.trace"):
+        tracer.dump_to_log(clear=True)
+    first, second = caplog.messages
+    assert re.fullmatch(r"\d\d:\d\d:\d\d\.\d{3} parse 01:82:5D:AB EEP A5-02-05 entity=sensor, shortcut=TMP", first)
+    assert re.fullmatch(r"\d\d:\d\d:\d\d\.\d{3} esp3_send - - ", second)
+    assert len(tracer) == 0
+
+
+def test_entity_traces_parse(tracer):
+    sensor = EO4HATemperatureSensor.__new__(EO4HATemperatureSensor)
+    sensor.gateway = SimpleNamespace()
+    sensor.dev_id = SENSOR
+    sensor.eep = TEMPERATURE
+    packet = RadioPacket(PACKET.RADIO_ERP1, [RORG.BS4, 0x00, 0x00, 0x80, 0x08] + SENSOR + [0x00], list(OPTIONAL))
+    sensor.parse(packet)
+    assert len(tracer) == 0
+    tracer.enable(eep=TEMPERATURE)
+    sensor.parse(packet)
+    assert events(tracer) == [("parse", 0x01825DAB, TEMPERATURE)]
+    assert tracer.dump()[0].details == {"entity": "temperature_sensor"}